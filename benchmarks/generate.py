@@ -0,0 +1,88 @@
+"""Deterministic synthetic time_entries.csv files for the benchmarks.
+
+    python benchmarks/generate.py 100k time_entries.csv [--seed 1]
+
+The same size and seed always give the same file. Entries have a skewed
+spread over 40 projects (a few busy ones and a long tail), workdays over the
+last five years with a few weekend entries, working-hours start times,
+durations from a few minutes to several hours, and notes that are empty
+about a third of the time. Rows are written in roughly chronological
+order, the way the app appends them, with an occasional back-dated entry.
+"""
+import argparse
+import csv
+import random
+import sys
+from datetime import date
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+
+PROJECTS = [f"{client} {kind}" for client in ("Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark",
+                                               "Wayne", "Tyrell", "Cyberdyne", "Soylent")
+            for kind in ("Website", "Support", "Migration", "Internal")]
+WORDS = ("review", "call", "fix", "deploy", "meeting", "refactor", "docs", "planning", "bug", "release",
+         "client", "invoice", "tests", "design", "research", "standup", "email", "handover", "sprint", "report")
+
+# Entries cover the five years ending on this day
+LAST_DAY = date(2024, 12, 31).toordinal()
+DAYS = 5 * 365
+
+
+def parse_size(text):
+    text = text.lower()
+    return SIZES[text] if text in SIZES else int(text)
+
+
+def rows(count, seed=1):
+    """Yields ``count`` CSV rows in the snapshot layout (with stable entry IDs)."""
+    rng = random.Random(seed)
+    # Zipf-like project popularity
+    weights = [1 / (rank + 1) ** 1.1 for rank in range(len(PROJECTS))]
+    projects = rng.choices(PROJECTS, weights, k=count)
+    first_day = LAST_DAY - DAYS
+    for index in range(count):
+        # Mostly chronological, like entries added day by day
+        day = first_day + index * DAYS // count
+        if rng.random() < 0.02:
+            day -= rng.randrange(1, 60)
+        weekday = date.fromordinal(day).weekday()
+        if weekday >= 5 and rng.random() < 0.9:
+            day -= weekday - 4
+
+        start = rng.randrange(7 * 3600, 18 * 3600, 60)
+        # Median about 40 minutes, capped at midnight
+        end = start + max(60, min(int(rng.lognormvariate(7.8, 0.8)), 24 * 3600 - 1 - start))
+
+        roll = rng.random()
+        if roll < 0.35:
+            note = ""
+        else:
+            note = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 8)))
+            if roll > 0.95:
+                note += ", see ticket #" + str(rng.randrange(10000))
+        yield [projects[index], date.fromordinal(day).isoformat(), clock(start), clock(end), note,
+               f"{seed:08x}{index:024x}"]
+
+
+def clock(seconds):
+    return f"{seconds // 3600:02}:{seconds // 60 % 60:02}:{seconds % 60:02}"
+
+
+def generate(path, count, seed=1):
+    with open(path, "w", newline="") as file:
+        csv.writer(file).writerows(rows(count, seed))
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("size", help="number of entries, or one of " + ", ".join(SIZES))
+    parser.add_argument("path")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    generate(args.path, parse_size(args.size), args.seed)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,286 @@
+"""Benchmarks for the app's hot paths on synthetic data.
+
+    python benchmarks/run.py [--sizes 10k,100k] [--repeat 3] [--storage csv|sqlite|binary|partitioned]
+                             [--threshold 0.25] [--fail-on-regression]
+
+Each size gets a generated time_entries.csv (cached in benchmarks/.data) in a
+scratch directory, and the real TimeEntryApp is driven with tkinter replaced
+by the stubs in tkstub.py, so no display is needed. 1m and 10m entries are
+supported but need several GB of memory and take minutes.
+
+Every run appends one JSON line per size to benchmarks/history.jsonl. A
+benchmark is flagged as a regression when its best time is more than
+``--threshold`` slower than the median best time of the last five runs on
+the same machine, size and storage backend.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS_DIR)
+APP_DIR = os.path.join(ROOT, "source", "app")
+DATA_DIR = os.path.join(BENCHMARKS_DIR, ".data")
+HISTORY_PATH = os.path.join(BENCHMARKS_DIR, "history.jsonl")
+
+sys.path.insert(0, BENCHMARKS_DIR)
+sys.path.insert(0, APP_DIR)
+
+import generate  # noqa: E402
+import tkstub  # noqa: E402
+
+messages = tkstub.install()
+import llamatime  # noqa: E402
+
+# Runs considered when computing the baseline, and changes below this many
+# seconds that are never reported as regressions (timer noise)
+BASELINE_RUNS = 5
+NOISE_FLOOR = 0.005
+
+
+class Skip(Exception):
+    pass
+
+
+def set_text(widget, text):
+    widget.delete(0, tkstub.END)
+    widget.insert(0, text)
+
+
+def busiest_project(app):
+    return max(app.total_time.keys(), key=lambda project: app.total_time.counts[project])
+
+
+def middle_month(app):
+    # A 30-day window in the middle of the data
+    starts = app.date_index.starts
+    middle = starts[len(starts) // 2] // 86400
+    return llamatime.format_day(middle), llamatime.format_day(middle + 29)
+
+
+def bench_load_entries(app):
+    app.load_entries()
+    app.root.run_until(lambda: not app.loading)
+
+
+def bench_write_entries(app):
+    app.write_entries()
+
+
+def bench_update_total_time(app):
+    app.update_total_time()
+
+
+def bench_filter_entries(app):
+    app.filter_combobox.set(busiest_project(app))
+    app.filter_entries(None)
+
+
+def bench_filter_entries_by_date_range(app):
+    start, end = middle_month(app)
+    set_text(app.start_date_filter_entry, start)
+    set_text(app.end_date_filter_entry, end)
+    app.filter_entries_by_date_range()
+
+
+def bench_search_entries(app):
+    # Within the date range filtered by above; the search box is left empty
+    set_text(app.search_entry, "ticket #12*")
+    app.search_entries()
+    set_text(app.search_entry, "")
+
+
+def bench_import_entries(app):
+    # The history file again: every row is read and checked, then dropped as a duplicate
+    del messages.shown[:]
+    app.import_files([os.path.abspath("time_entries.csv")])
+    app.root.run_until(lambda: messages.shown)
+    if "0 rejected" not in messages.shown[-1][2]:
+        raise RuntimeError(messages.shown[-1][2])
+
+
+def bench_generate_report(app):
+    # A full year by month, computed rather than served from the report cache
+    app.report_cache.clear()
+    start, _ = middle_month(app)
+    set_text(app.start_date_entry, start)
+    set_text(app.end_date_entry, f"{int(start[:4]) + 1}{start[4:]}")
+    app.filter_combobox.set("All")
+    app.period_combobox.current(3)
+    app.generate_report()
+
+
+def sort_benchmark(criterion):
+    def bench(app):
+        # Every entry, not just the date range filtered by above
+        app.date_filter = None
+        app.filter_combobox.set("All")
+        app.sort_entries(criterion)
+    return bench
+
+
+def bench_export_to_pdf(app):
+    for module in ("fpdf", "matplotlib"):
+        if importlib.util.find_spec(module) is None:
+            raise Skip(f"{module} is not installed")
+    app.report_cache.clear()
+    app.export_all_dates.set(True)
+    app.filter_combobox.set("All")
+    del messages.shown[:]
+    app.export_to_pdf()
+    app.root.run_until(lambda: app.export is None)
+    errors = [message for kind, _, message in messages.shown if kind == "showerror"]
+    if errors:
+        raise RuntimeError(errors[0])
+
+
+# In order: load first, export (the slowest) last
+BENCHMARKS = [
+    ("load_entries", bench_load_entries),
+    ("write_entries", bench_write_entries),
+    ("update_total_time", bench_update_total_time),
+    ("filter_entries", bench_filter_entries),
+    ("filter_entries_by_date_range", bench_filter_entries_by_date_range),
+    ("search_entries", bench_search_entries),
+    ("import_entries", bench_import_entries),
+    ("generate_report", bench_generate_report),
+    ("sort_entries:project", sort_benchmark("project")),
+    ("sort_entries:date", sort_benchmark("date")),
+    ("sort_entries:total_time", sort_benchmark("total_time")),
+    ("sort_entries:duration", sort_benchmark("duration")),
+    ("export_to_pdf", bench_export_to_pdf),
+]
+
+
+def data_file(size, seed):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f"time_entries-{size}-{seed}.csv")
+    if not os.path.exists(path):
+        print(f"Generating {size} entries...", file=sys.stderr)
+        generate.generate(path + ".tmp", size, seed)
+        os.replace(path + ".tmp", path)
+    return path
+
+
+def run_size(size, args, selected):
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="llamatime-bench-")
+    previous_dir = os.getcwd()
+    try:
+        shutil.copy(data_file(size, args.seed), os.path.join(workdir, "time_entries.csv"))
+        os.chdir(workdir)
+        root = tkstub.Tk()
+        app = llamatime.TimeEntryApp(root)
+        root.run_until(lambda: not app.loading)
+        try:
+            for name, bench in BENCHMARKS:
+                if name not in selected:
+                    continue
+                times = []
+                try:
+                    for _ in range(args.repeat):
+                        start = time.perf_counter()
+                        bench(app)
+                        times.append(time.perf_counter() - start)
+                except Skip as e:
+                    results[name] = {"skipped": str(e)}
+                    continue
+                results[name] = {"min": min(times), "median": statistics.median(times), "runs": len(times)}
+        finally:
+            app.store.close()
+    finally:
+        os.chdir(previous_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def load_history(path):
+    try:
+        with open(path, "r") as file:
+            return [json.loads(line) for line in file if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def find_regressions(record, history, threshold):
+    """Returns ``(name, best, baseline)`` for benchmarks slower than the baseline by ``threshold``."""
+    previous = [item for item in history
+                if (item["machine"], item["size"], item["storage"]) == (record["machine"], record["size"], record["storage"])]
+    regressions = []
+    for name, result in record["results"].items():
+        if "min" not in result:
+            continue
+        baseline_runs = [item["results"][name]["min"] for item in previous[-BASELINE_RUNS:]
+                         if "min" in item["results"].get(name, {})]
+        if not baseline_runs:
+            continue
+        baseline = statistics.median(baseline_runs)
+        if result["min"] > baseline * (1 + threshold) and result["min"] - baseline > NOISE_FLOOR:
+            regressions.append((name, result["min"], baseline))
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the app's hot paths on synthetic data.")
+    parser.add_argument("--sizes", default="10k,100k", help="comma-separated sizes: 10k, 100k, 1m, 10m or a number")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--storage", choices=("csv", "sqlite", "binary", "partitioned"), default="csv")
+    parser.add_argument("--only", help="comma-separated benchmark names")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, as a fraction")
+    parser.add_argument("--history", default=HISTORY_PATH)
+    parser.add_argument("--no-history", action="store_true", help="do not record this run")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    os.environ["LLAMATIME_STORAGE"] = args.storage
+    selected = set(args.only.split(",")) if args.only else {name for name, _ in BENCHMARKS}
+    history = load_history(args.history)
+    commit = git_commit()
+    regressed = False
+
+    for size_name in args.sizes.split(","):
+        size = generate.parse_size(size_name)
+        record = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": commit,
+                  "machine": platform.node(), "python": platform.python_version(),
+                  "storage": args.storage, "size": size, "results": run_size(size, args, selected)}
+        regressions = find_regressions(record, history, args.threshold)
+        record["regressions"] = [name for name, _, _ in regressions]
+
+        print(f"\n{size:,} entries ({args.storage}):")
+        for name, result in record["results"].items():
+            if "skipped" in result:
+                print(f"  {name:<32} skipped: {result['skipped']}")
+            else:
+                print(f"  {name:<32}{result['min'] * 1000:10.1f} ms  (median {result['median'] * 1000:.1f} ms)")
+        for name, best, baseline in regressions:
+            print(f"  REGRESSION {name}: {best * 1000:.1f} ms vs {baseline * 1000:.1f} ms baseline "
+                  f"(+{(best / baseline - 1) * 100:.0f}%)")
+            regressed = True
+
+        if not args.no_history:
+            with open(args.history, "a") as file:
+                file.write(json.dumps(record, sort_keys=True) + "\n")
+        history.append(record)
+
+    return 1 if regressed and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""Stress check for several processes writing the same entry files at once.
+
+    python benchmarks/stress.py [--processes 4] [--operations 2000] [--storage csv|binary]
+                                [--compact-threshold 50] [--size 10k]
+
+Every writer process opens the same time_entries.csv (or .bin) in a scratch
+directory and makes random saves, edits and deletes: of entries it owns, of
+a few entries they all edit, and of entries from the generated history. A
+low compaction threshold makes the writers fold and rotate the journal
+under each other all the time, and they poll for each other's changes as
+the app does.
+
+Afterwards a fresh load must match what every writer did with its own
+entries, which proves no update was lost, and each writer's polled view of
+the entries must match that fresh load. Exits with status 1 otherwise.
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS_DIR)
+APP_DIR = os.path.join(ROOT, "source", "app")
+
+sys.path.insert(0, BENCHMARKS_DIR)
+sys.path.insert(0, APP_DIR)
+
+import generate  # noqa: E402
+from entries import TimeEntry  # noqa: E402
+from entry_file import BinaryJournal  # noqa: E402
+from storage import EntryJournal  # noqa: E402
+
+# Entries every writer edits; the last write wins, so only their presence is checked
+SHARED = [f"shared-{number}" for number in range(10)]
+
+
+def open_store(storage, threshold):
+    if storage == "binary":
+        return BinaryJournal("time_entries.bin", csv_path="time_entries.csv", compact_threshold=threshold)
+    return EntryJournal("time_entries.csv", compact_threshold=threshold)
+
+
+def new_entry(project, entry_id, note, rng):
+    # Entries end on the day they start, as in the app
+    start = rng.randrange(18_000, 20_000) * 86400 + rng.randrange(6 * 3600, 16 * 3600)
+    return TimeEntry(project, start, start + rng.randrange(60, 8 * 3600), note, entry_id)
+
+
+def fingerprint(entries):
+    return sorted(tuple(entry.to_row()) for entry in entries.values())
+
+
+def writer(number, args, barrier, results):
+    rng = random.Random(args.seed * 1000 + number)
+    store = open_store(args.storage, args.compact_threshold)
+    store.load()
+    # Final row of every entry this writer created, None once deleted
+    own = {}
+    history = [entry_id for entry_id in store.entries if not entry_id.startswith("shared-")]
+    # History entries are split between the writers, so their final state is known too
+    history = [entry_id for position, entry_id in enumerate(sorted(history)) if position % args.processes == number]
+    barrier.wait()
+
+    for operation in range(args.operations):
+        choice = rng.random()
+        if choice < 0.35 or not own:
+            entry = store.put(new_entry(f"Writer {number}", f"w{number}-{operation}", f"made {operation}", rng))
+            own[entry.id] = entry.to_row()
+        elif choice < 0.55:
+            entry_id = rng.choice(list(own))
+            if own[entry_id] is not None:
+                entry = store.put(new_entry(f"Writer {number}", entry_id, f"edited {operation}", rng))
+                own[entry_id] = entry.to_row()
+        elif choice < 0.65:
+            entry_id = rng.choice(list(own))
+            if own[entry_id] is not None:
+                store.delete(entry_id)
+                own[entry_id] = None
+        elif choice < 0.8:
+            store.put(new_entry("Shared", rng.choice(SHARED), f"writer {number} at {operation}", rng))
+        elif history:
+            entry_id = history.pop()
+            if rng.random() < 0.5:
+                store.delete(entry_id)
+                own[entry_id] = None
+            else:
+                entry = store.put(new_entry(f"Writer {number}", entry_id, f"took over {operation}", rng))
+                own[entry_id] = entry.to_row()
+        if operation % 20 == 0:
+            store.poll_changes()
+
+    store.sync()
+    barrier.wait()
+    # Every writer is done; the polled view has to be complete now
+    store.poll_changes()
+    results.put((number, own, fingerprint(store.entries)))
+    store.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Several writer processes on the same entry files.")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--operations", type=int, default=2000, help="operations per writer")
+    parser.add_argument("--storage", choices=("csv", "binary"), default="csv")
+    parser.add_argument("--compact-threshold", type=int, default=50)
+    parser.add_argument("--size", default="10k", help="entries in the starting history")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="llamatime-stress-")
+    previous_dir = os.getcwd()
+    try:
+        os.chdir(workdir)
+        generate.generate("time_entries.csv", generate.parse_size(args.size), args.seed)
+        # Give the generated rows their IDs before the writers start
+        store = open_store(args.storage, args.compact_threshold)
+        store.load()
+        rng = random.Random(args.seed)
+        for entry_id in SHARED:
+            store.put(new_entry("Shared", entry_id, "start", rng))
+        store.close()
+
+        barrier = multiprocessing.Barrier(args.processes)
+        results = multiprocessing.Queue()
+        started = time.perf_counter()
+        writers = [multiprocessing.Process(target=writer, args=(number, args, barrier, results))
+                   for number in range(args.processes)]
+        for process in writers:
+            process.start()
+        outcomes = []
+        while len(outcomes) < len(writers):
+            try:
+                outcomes.append(results.get(timeout=1))
+            except queue.Empty:
+                if any(process.exitcode for process in writers):
+                    # The others would wait for it at the barrier forever
+                    for process in writers:
+                        process.terminate()
+                    print("A writer process failed", file=sys.stderr)
+                    return 1
+        for process in writers:
+            process.join()
+        elapsed = time.perf_counter() - started
+
+        store = open_store(args.storage, args.compact_threshold)
+        store.load()
+        final = store.entries
+        store.close()
+
+        failures = []
+        for number, own, view in sorted(outcomes):
+            for entry_id, row in own.items():
+                actual = final[entry_id].to_row() if entry_id in final else None
+                if actual != row:
+                    failures.append(f"writer {number}: {entry_id} is {actual}, expected {row}")
+            if view != fingerprint(final):
+                failures.append(f"writer {number}: polled view differs from a fresh load")
+        failures.extend(f"{entry_id} is missing" for entry_id in SHARED if entry_id not in final)
+
+        operations = args.processes * args.operations
+        print(f"{args.processes} writers, {operations:,} operations in {elapsed:.2f} s "
+              f"({operations / elapsed:,.0f}/s), {len(final):,} entries at the end")
+        for failure in failures[:20]:
+            print(f"  LOST {failure}")
+        print("FAILED" if failures else "OK: no lost updates")
+        return 1 if failures else 0
+    finally:
+        os.chdir(previous_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+"""A minimal stand-in for tkinter, so the app can be benchmarked without a display.
+
+``install()`` registers stub ``tkinter`` modules before ``llamatime`` is
+imported. Widgets remember their text, values and options and otherwise
+accept any call; ``Tk.run_until()`` plays the part of the main loop by
+running ``after()`` callbacks until a condition holds. ``Tk.mainloop()``
+also runs the ``after_idle()`` callbacks, the deferred startup work, and
+returns once ``quit()`` is called.
+"""
+import sys
+import time
+import traceback
+import types
+
+END = "end"
+
+
+class Widget:
+    """Any Tk or ttk widget. Unknown methods are accepted and do nothing."""
+
+    def __init__(self, parent=None, *args, **options):
+        self.options = dict(options)
+        self.text = ""
+        self.items = []
+        self.selected = 0
+        self.children = {}
+        if isinstance(parent, Widget):
+            # Tk names children "!combobox", "!combobox2", ... which the app relies on
+            base = "!" + type(self).__name__.lower()
+            count = sum(1 for name in parent.children if name.rstrip("0123456789") == base)
+            parent.children[base + (str(count + 1) if count else "")] = self
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: None
+
+    def __getitem__(self, key):
+        return self.options.get(key, "")
+
+    def __setitem__(self, key, value):
+        self.options[key] = value
+
+    def config(self, *args, **options):
+        # Style.configure(style, **options) takes a style name first
+        self.options.update(options)
+
+    configure = config
+
+    def cget(self, key):
+        return self.options.get(key, 10)
+
+    # Entry, Combobox and Text
+    def get(self, *args):
+        return self.text
+
+    def set(self, *args):
+        if len(args) == 1:
+            self.text = args[0]
+
+    def insert(self, index, *values):
+        if isinstance(self, Listbox):
+            self.items.extend(values)
+        else:
+            self.text += "".join(str(value) for value in values)
+
+    def delete(self, *args):
+        self.items = []
+        self.text = ""
+
+    def current(self, index=None):
+        if index is None:
+            return self.selected
+        self.selected = index
+        values = self.options.get("values") or []
+        if index < len(values):
+            self.text = values[index]
+
+    # Listbox and geometry
+    def curselection(self):
+        return ()
+
+    def winfo_height(self):
+        return 1
+
+    def winfo_children(self):
+        return list(self.children.values())
+
+
+class Tk(Widget):
+    """The root window; also a fake event loop for ``after`` callbacks."""
+
+    def __init__(self, *args, **options):
+        super().__init__(None, **options)
+        self.pending = []
+        self.idle = []
+        self.sequence = 0
+        self.quitting = False
+
+    def after(self, delay, callback=None, *args):
+        self.sequence += 1
+        self.pending.append((time.perf_counter() + delay / 1000, self.sequence, callback, args))
+        return self.sequence
+
+    def after_idle(self, callback, *args):
+        # Deferred startup work (tray icon, calendars) only runs in mainloop(),
+        # so it is not benchmarked
+        self.idle.append((callback, args))
+        return None
+
+    def mainloop(self):
+        self.quitting = False
+        idle, self.idle = self.idle, []
+        for callback, args in idle:
+            self.run_callback(callback, args)
+        self.run_until(lambda: self.quitting, report_errors=True)
+
+    def quit(self):
+        self.quitting = True
+
+    def run_callback(self, callback, args):
+        # Like Tk, an error in a callback is reported and the loop goes on
+        try:
+            callback(*args)
+        except Exception:
+            traceback.print_exc()
+
+    def after_cancel(self, handle):
+        self.pending = [item for item in self.pending if item[1] != handle]
+
+    def run_until(self, condition, timeout=3600, report_errors=False):
+        """Runs pending callbacks in order until ``condition()`` is true.
+
+        Polling callbacks (due within a minute) run without waiting for their
+        delay, so polling intervals do not add to the timings; callbacks due
+        later, such as the hourly backup, never run. Errors in callbacks are
+        raised, or with ``report_errors`` printed as Tk does.
+        """
+        deadline = time.perf_counter() + timeout
+        while not condition():
+            now = time.perf_counter()
+            if now > deadline:
+                raise TimeoutError("stub event loop timed out")
+            self.pending.sort(key=lambda item: item[:2])
+            if not self.pending or self.pending[0][0] > now + 60:
+                time.sleep(0.001)
+                continue
+            _, _, callback, args = self.pending.pop(0)
+            if report_errors:
+                self.run_callback(callback, args)
+            else:
+                callback(*args)
+            if not condition():
+                # Let worker threads run between polls
+                time.sleep(0.0005)
+
+
+class Listbox(Widget):
+    pass
+
+
+class BooleanVar:
+    def __init__(self, master=None, value=False):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+class Font:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def metrics(self, name):
+        return 15
+
+
+class Messages:
+    """messagebox stand-in that records what would have been shown."""
+
+    def __init__(self):
+        self.shown = []
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return lambda title="", message="", **kwargs: self.shown.append((name, title, message))
+
+
+def widget_class(name):
+    return type(name, (Widget,), {})
+
+
+def install():
+    """Replaces tkinter and its submodules in ``sys.modules`` with the stubs."""
+    tkinter = types.ModuleType("tkinter")
+    tkinter.END = END
+    tkinter.Tk = Tk
+    tkinter.Listbox = Listbox
+    tkinter.BooleanVar = BooleanVar
+    for name in ("Toplevel", "Text", "PhotoImage", "Menu", "Frame", "Label", "Button", "Entry"):
+        setattr(tkinter, name, widget_class(name))
+
+    ttk = types.ModuleType("tkinter.ttk")
+    for name in ("Frame", "Label", "Button", "Entry", "Combobox", "Checkbutton", "LabelFrame", "Scrollbar",
+                 "Progressbar", "Style"):
+        setattr(ttk, name, widget_class(name))
+
+    font = types.ModuleType("tkinter.font")
+    font.Font = Font
+
+    messagebox = Messages()
+    simpledialog = types.SimpleNamespace(askinteger=lambda *args, **kwargs: None,
+                                         askstring=lambda *args, **kwargs: None)
+    filedialog = types.SimpleNamespace(askopenfilenames=lambda *args, **kwargs: ())
+
+    tkinter.ttk = ttk
+    tkinter.font = font
+    tkinter.messagebox = messagebox
+    tkinter.simpledialog = simpledialog
+    tkinter.filedialog = filedialog
+    sys.modules.update({"tkinter": tkinter, "tkinter.ttk": ttk, "tkinter.font": font,
+                        "tkinter.messagebox": messagebox, "tkinter.simpledialog": simpledialog,
+                        "tkinter.filedialog": filedialog})
+    return messagebox
@@ -0,0 +1,238 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import time
+import zlib
+from datetime import date, datetime
+
+from entries import EPOCH_ORDINAL, TimeEntry
+from storage import new_entry_id
+
+# Retention tiers: (name, how far back in seconds, bucket of a snapshot time).
+# Within each tier the newest snapshot of every bucket is kept.
+RETENTION = (
+    ("hourly", 24 * 3600, lambda when: datetime.fromtimestamp(when).strftime("%Y-%m-%d %H")),
+    ("daily", 31 * 24 * 3600, lambda when: datetime.fromtimestamp(when).strftime("%Y-%m-%d")),
+    ("monthly", 366 * 24 * 3600, lambda when: datetime.fromtimestamp(when).strftime("%Y-%m")),
+)
+
+
+class BackupError(Exception):
+    pass
+
+
+def month_of(entry):
+    """Returns the backup chunk ("YYYY-MM") an entry belongs to."""
+    return entry.date[:7]
+
+
+def month_days(month):
+    """Returns the first and last day numbers of a "YYYY-MM" month."""
+    year, number = int(month[:4]), int(month[5:7])
+    first = date(year, number, 1).toordinal() - EPOCH_ORDINAL
+    following = date(year + number // 12, number % 12 + 1, 1).toordinal() - EPOCH_ORDINAL
+    return first, following - 1
+
+
+def encode_chunk(entries):
+    """Serializes entries as CSV rows in (start, id) order, so equal content gives equal bytes."""
+    buffer = io.StringIO(newline="")
+    csv.writer(buffer).writerows(entry.to_row() for entry in sorted(entries, key=lambda entry: (entry.start, entry.id)))
+    return buffer.getvalue().encode("utf-8")
+
+
+def write_file(path, data):
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+
+class BackupStore:
+    """Incremental point-in-time backups of the entries.
+
+    Entries are backed up in chunks, one per month of entries. Each chunk is
+    stored compressed under the SHA-256 of its content in ``objects/``, so a
+    chunk that did not change is stored once however many snapshots refer to
+    it. A snapshot is a small manifest in ``snapshots/`` mapping each month
+    to its chunk; writing one only costs the months that changed since the
+    previous snapshot. Chunks are verified against their hash when read.
+
+    A CSV backup from before snapshots existed can be imported as a snapshot
+    of its own. It is marked as imported: later snapshots do not build on
+    it, and pruning keeps it.
+    """
+
+    def __init__(self, root="backups"):
+        self.root = root
+        self.objects_path = os.path.join(root, "objects")
+        self.snapshots_path = os.path.join(root, "snapshots")
+
+    def snapshots(self):
+        """Returns ``(time, path)`` for every snapshot, oldest first."""
+        try:
+            names = os.listdir(self.snapshots_path)
+        except FileNotFoundError:
+            return []
+        snapshots = []
+        for name in names:
+            if name.endswith(".json"):
+                snapshots.append((int(name[:-5]) / 1000, os.path.join(self.snapshots_path, name)))
+        return sorted(snapshots)
+
+    def read_manifest(self, path):
+        try:
+            with open(path, "rb") as file:
+                manifest = json.load(file)
+        except (OSError, ValueError) as e:
+            raise BackupError(f"Unreadable snapshot {path}: {e}")
+        if not isinstance(manifest, dict) or manifest.get("checksum") != self.manifest_checksum(manifest.get("chunks")):
+            raise BackupError(f"Snapshot {path} failed its checksum")
+        return manifest
+
+    @staticmethod
+    def manifest_checksum(chunks):
+        return hashlib.sha256(json.dumps(chunks, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def is_imported(self, path):
+        try:
+            return bool(self.read_manifest(path).get("imported"))
+        except BackupError:
+            return False
+
+    def own_snapshots(self):
+        """Returns ``(time, path)`` for the snapshots that were not imported."""
+        return [snapshot for snapshot in self.snapshots() if not self.is_imported(snapshot[1])]
+
+    def latest_chunks(self):
+        snapshots = self.own_snapshots()
+        if not snapshots:
+            return {}
+        return dict(self.read_manifest(snapshots[-1][1])["chunks"])
+
+    def write_snapshot(self, changed, when=None):
+        """Writes a snapshot that differs from the latest one in the ``changed`` months.
+
+        ``changed`` maps a month ("YYYY-MM") to all of its entries; an empty
+        list drops the month. Returns the path of the new snapshot.
+        """
+        return self._write_snapshot(self.latest_chunks(), changed, when)
+
+    def import_csv(self, path):
+        """Imports a CSV file of entries as a snapshot from the time it was last written.
+
+        Rows without an ID, as written before entries had one, are given one.
+        Returns the path of the new snapshot.
+        """
+        changed = {}
+        with open(path, "r", newline="") as file:
+            for row in csv.reader(file):
+                if row:
+                    entry = TimeEntry.from_row(row)
+                    if not entry.id:
+                        entry.id = new_entry_id()
+                    changed.setdefault(month_of(entry), []).append(entry)
+        return self._write_snapshot({}, changed, os.path.getmtime(path), imported=os.path.basename(path))
+
+    def _write_snapshot(self, chunks, changed, when=None, **details):
+        os.makedirs(self.objects_path, exist_ok=True)
+        os.makedirs(self.snapshots_path, exist_ok=True)
+        for month, entries in changed.items():
+            if not entries:
+                chunks.pop(month, None)
+                continue
+            data = encode_chunk(entries)
+            digest = hashlib.sha256(data).hexdigest()
+            object_path = os.path.join(self.objects_path, digest + ".z")
+            if not os.path.exists(object_path):
+                write_file(object_path, zlib.compress(data, 6))
+            chunks[month] = digest
+
+        when = time.time() if when is None else when
+        manifest = {"time": when, "created": datetime.fromtimestamp(when).isoformat(timespec="seconds"),
+                    "chunks": chunks, "checksum": self.manifest_checksum(chunks), **details}
+        path = os.path.join(self.snapshots_path, f"{int(when * 1000)}.json")
+        write_file(path, json.dumps(manifest, sort_keys=True).encode("utf-8"))
+        return path
+
+    def read_chunk(self, digest):
+        try:
+            with open(os.path.join(self.objects_path, digest + ".z"), "rb") as file:
+                data = zlib.decompress(file.read())
+        except (OSError, zlib.error) as e:
+            raise BackupError(f"Unreadable backup chunk {digest}: {e}")
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise BackupError(f"Backup chunk {digest} failed its checksum")
+        return [TimeEntry.from_row(row) for row in csv.reader(io.StringIO(data.decode("utf-8"), newline="")) if row]
+
+    def restore_entries(self, at=None):
+        """Returns the entries of the newest snapshot taken at or before ``at`` (default: now)."""
+        candidates = [snapshot for snapshot in self.snapshots() if at is None or snapshot[0] <= at]
+        if not candidates:
+            raise BackupError("There is no backup from before that time")
+        manifest = self.read_manifest(candidates[-1][1])
+        entries = []
+        for month in sorted(manifest["chunks"]):
+            entries.extend(self.read_chunk(manifest["chunks"][month]))
+        return entries
+
+    def verify(self):
+        """Checks every snapshot and chunk; returns a list of problems (empty if all is well)."""
+        problems = []
+        checked = set()
+        for _, path in self.snapshots():
+            try:
+                manifest = self.read_manifest(path)
+            except BackupError as e:
+                problems.append(str(e))
+                continue
+            for digest in manifest["chunks"].values():
+                if digest in checked:
+                    continue
+                checked.add(digest)
+                try:
+                    self.read_chunk(digest)
+                except BackupError as e:
+                    problems.append(str(e))
+        return problems
+
+    def prune(self, now=None):
+        """Applies the RETENTION rules, then deletes chunks no snapshot refers to.
+
+        The newest snapshot and imported ones are always kept. Returns the
+        number of snapshots removed.
+        """
+        now = time.time() if now is None else now
+        snapshots = self.snapshots()
+        keep = {snapshots[-1][1]} if snapshots else set()
+        for _, span, bucket in RETENTION:
+            seen = set()
+            for when, path in reversed(snapshots):
+                if now - when > span:
+                    break
+                key = bucket(when)
+                if key not in seen:
+                    seen.add(key)
+                    keep.add(path)
+
+        removed = 0
+        referenced = set()
+        for _, path in snapshots:
+            if path not in keep and not self.is_imported(path):
+                os.remove(path)
+                removed += 1
+                continue
+            try:
+                referenced.update(self.read_manifest(path)["chunks"].values())
+            except BackupError:
+                # Keep every chunk while a snapshot cannot be read
+                return removed
+        if removed:
+            for name in os.listdir(self.objects_path):
+                if name.endswith(".z") and name[:-2] not in referenced:
+                    os.remove(os.path.join(self.objects_path, name))
+        return removed
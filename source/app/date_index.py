@@ -0,0 +1,87 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from heapq import merge
+
+from entries import SECONDS_PER_DAY
+
+
+class DateIndex:
+    """Entry IDs ordered by start time, for date-range queries.
+
+    ``starts`` is a compact array of epoch seconds kept sorted, with ``ids``
+    holding the matching entry IDs at the same positions, so a range query is
+    two bisections plus a slice: O(log n + k).
+    """
+
+    # Above this many changes in one batch, a linear merge beats single inserts
+    MERGE_THRESHOLD = 64
+
+    def __init__(self):
+        self.starts = array("q")
+        self.ids = []
+
+    def rebuild(self, entries):
+        ordered = sorted((entry.start, entry.id) for entry in entries)
+        self.starts = array("q", (start for start, _ in ordered))
+        self.ids = [entry_id for _, entry_id in ordered]
+
+    def add(self, entry):
+        position = bisect_right(self.starts, entry.start)
+        self.starts.insert(position, entry.start)
+        self.ids.insert(position, entry.id)
+
+    def remove(self, entry):
+        position = bisect_left(self.starts, entry.start)
+        while position < len(self.starts) and self.starts[position] == entry.start:
+            if self.ids[position] == entry.id:
+                del self.starts[position]
+                del self.ids[position]
+                return True
+            position += 1
+        return False
+
+    def replace(self, old_entry, new_entry):
+        self.remove(old_entry)
+        self.add(new_entry)
+
+    def apply(self, removed, added):
+        """Applies a batch of removed and added entries, e.g. after a restore."""
+        if len(removed) + len(added) <= self.MERGE_THRESHOLD:
+            for entry in removed:
+                self.remove(entry)
+            for entry in added:
+                self.add(entry)
+            return
+
+        new = sorted((entry.start, entry.id) for entry in added)
+        if not removed:
+            # Only the part of the index that overlaps the additions is merged,
+            # which is a plain append for entries loaded in date order.
+            position = bisect_right(self.starts, new[0][0])
+            tail = list(zip(self.starts[position:], self.ids[position:]))
+            del self.starts[position:]
+            del self.ids[position:]
+            for start, entry_id in merge(tail, new):
+                self.starts.append(start)
+                self.ids.append(entry_id)
+            return
+
+        # Drop the removed IDs and merge the sorted additions in a single pass
+        removed_ids = {entry.id for entry in removed}
+        kept = ((start, entry_id) for start, entry_id in zip(self.starts, self.ids) if entry_id not in removed_ids)
+        starts = array("q")
+        ids = []
+        for start, entry_id in merge(kept, new):
+            starts.append(start)
+            ids.append(entry_id)
+        self.starts = starts
+        self.ids = ids
+
+    def range(self, start_day, end_day):
+        """Returns the IDs of entries starting on days ``start_day``..``end_day``."""
+        low = bisect_left(self.starts, start_day * SECONDS_PER_DAY)
+        high = bisect_left(self.starts, (end_day + 1) * SECONDS_PER_DAY)
+        return self.ids[low:high]
+
+    def __len__(self):
+        return len(self.ids)
@@ -0,0 +1,172 @@
+import functools
+import io
+import json
+import os
+import time
+from collections import deque
+
+
+class Stat:
+    """Counters for one instrumented path."""
+
+    __slots__ = ("count", "latencies", "total", "max", "rows", "bytes")
+
+    def __init__(self, samples):
+        self.count = 0
+        # The most recent latencies, for the percentiles
+        self.latencies = deque(maxlen=samples)
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.bytes = 0
+
+    def percentile(self, fraction):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Instrumentation:
+    """Lightweight timing of the app's hot paths.
+
+    Every measured call records its latency, and optionally the rows it
+    processed and the bytes it read or wrote, under a name such as "load" or
+    "filter.project". Percentiles are over the last ``samples`` calls of each
+    name. While disabled, instrumented functions cost one attribute check.
+
+    ``profile_next()`` arms a one-off cProfile capture of the next top-level
+    profileable action, whether or not timing is enabled. Measurements are
+    only taken on the Tk thread; work done by worker threads is measured from
+    the call that starts it to the poll that sees it finish.
+    """
+
+    def __init__(self, enabled=False, samples=1024):
+        self.enabled = enabled
+        self.samples = samples
+        self.stats = {}
+        # Rows and bytes of the measurements in progress, innermost last
+        self._active = []
+        # A pending profile capture: (directory, on_profile) or None
+        self.armed = None
+
+    def stat(self, name):
+        stat = self.stats.get(name)
+        if stat is None:
+            stat = self.stats[name] = Stat(self.samples)
+        return stat
+
+    def record(self, name, seconds, rows=0, bytes=0):
+        stat = self.stat(name)
+        stat.count += 1
+        stat.latencies.append(seconds)
+        stat.total += seconds
+        stat.max = max(stat.max, seconds)
+        stat.rows += rows
+        stat.bytes += bytes
+
+    def note(self, rows=0, bytes=0):
+        """Adds rows processed and bytes read or written to the innermost measurement."""
+        if self._active:
+            counts = self._active[-1]
+            counts[0] += rows
+            counts[1] += bytes
+
+    def begin(self, name):
+        """Starts measuring work that finishes in a later callback; pass the result to ``end()``."""
+        if not self.enabled:
+            return None
+        return name, time.perf_counter()
+
+    def end(self, token, rows=0, bytes=0):
+        if token is not None and self.enabled:
+            name, start = token
+            self.record(name, time.perf_counter() - start, rows, bytes)
+
+    def call(self, name, func, args, kwargs, profileable=True):
+        profiler = None
+        if self.armed is not None and profileable and not self._active:
+            # Imported here as profiling is rare, and pstats is slow to import
+            import cProfile
+            profiler = cProfile.Profile()
+        counts = [0, 0]
+        self._active.append(counts)
+        start = time.perf_counter()
+        try:
+            if profiler is not None:
+                return profiler.runcall(func, *args, **kwargs)
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            self._active.pop()
+            if self.enabled:
+                self.record(name, elapsed, counts[0], counts[1])
+            if profiler is not None:
+                self._save_profile(name, profiler)
+
+    def profile_next(self, directory=".", on_profile=None):
+        """Profiles the next top-level action; ``on_profile(name, path, summary)`` is called after it."""
+        self.armed = (directory, on_profile)
+
+    def _save_profile(self, name, profiler):
+        directory, on_profile = self.armed
+        self.armed = None
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"profile-{name}-{time.strftime('%Y%m%d-%H%M%S')}.prof")
+        profiler.dump_stats(path)
+        summary = io.StringIO()
+        import pstats
+        pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(30)
+        if on_profile is not None:
+            on_profile(name, path, summary.getvalue())
+
+    def reset(self):
+        self.stats = {}
+
+    def snapshot(self):
+        """Returns the counters as plain data, by name."""
+        return {name: {"count": stat.count,
+                       "p50_ms": stat.percentile(0.5) * 1000,
+                       "p95_ms": stat.percentile(0.95) * 1000,
+                       "max_ms": stat.max * 1000,
+                       "total_ms": stat.total * 1000,
+                       "rows": stat.rows,
+                       "bytes": stat.bytes}
+                for name, stat in sorted(self.stats.items())}
+
+    def dump(self, path):
+        with open(path, "w") as file:
+            json.dump({"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "enabled": self.enabled,
+                       "stats": self.snapshot()}, file, indent=2)
+        return path
+
+    def report(self):
+        if not self.stats:
+            if not self.enabled:
+                return "Instrumentation is off. Turn it on from the Tools menu or with LLAMATIME_DIAGNOSTICS=1."
+            return "Nothing measured yet."
+        lines = [f"{'Path':<22}{'Calls':>7}{'p50 ms':>10}{'p95 ms':>10}{'Max ms':>10}{'Rows':>11}{'Bytes':>13}"]
+        for name, stat in self.snapshot().items():
+            lines.append(f"{name:<22}{stat['count']:>7}{stat['p50_ms']:>10.2f}{stat['p95_ms']:>10.2f}"
+                         f"{stat['max_ms']:>10.2f}{stat['rows']:>11,}{stat['bytes']:>13,}")
+        return "\n".join(lines)
+
+
+# Shared by the app; LLAMATIME_DIAGNOSTICS=1 turns timing on from the start
+instruments = Instrumentation(enabled=os.environ.get("LLAMATIME_DIAGNOSTICS") == "1")
+
+
+def instrumented(name, profileable=True):
+    """Decorator measuring every call of a function under ``name``.
+
+    Frequent background calls such as timer ticks pass ``profileable=False``
+    so that they are not what an armed profile capture picks up.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not instruments.enabled and instruments.armed is None:
+                return func(*args, **kwargs)
+            return instruments.call(name, func, args, kwargs, profileable)
+        return wrapper
+    return decorate
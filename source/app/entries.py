@@ -0,0 +1,113 @@
+import sys
+from datetime import date as date_cls
+from functools import lru_cache
+
+# Entries store naive local times as seconds since 1970-01-01 00:00, without
+# any timezone conversion, so that durations are plain integer arithmetic.
+EPOCH_ORDINAL = date_cls(1970, 1, 1).toordinal()
+SECONDS_PER_DAY = 86400
+
+
+@lru_cache(maxsize=8192)
+def parse_day(date_str):
+    """Converts "YYYY-MM-DD" to a day number (days since 1970-01-01)."""
+    fields = date_str[0:4], date_str[5:7], date_str[8:10]
+    # int() alone would also take signs and spaces, as in "2024-+1-05"
+    if (len(date_str) != 10 or date_str[4] != "-" or date_str[7] != "-"
+            or not all(field.isascii() and field.isdigit() for field in fields)):
+        raise ValueError(f"Invalid date: {date_str!r}")
+    # date() rejects the out of range values, such as month 00
+    return date_cls(*map(int, fields)).toordinal() - EPOCH_ORDINAL
+
+
+@lru_cache(maxsize=8192)
+def format_day(day):
+    return date_cls.fromordinal(day + EPOCH_ORDINAL).isoformat()
+
+
+def parse_clock(time_str):
+    """Converts "HH:MM:SS" to seconds since midnight."""
+    fields = time_str[0:2], time_str[3:5], time_str[6:8]
+    if (len(time_str) != 8 or time_str[2] != ":" or time_str[5] != ":"
+            or not all(field.isascii() and field.isdigit() for field in fields)):
+        raise ValueError(f"Invalid time: {time_str!r}")
+    hours, minutes, seconds = map(int, fields)
+    if not (0 <= hours <= 23 and 0 <= minutes <= 59 and 0 <= seconds <= 59):
+        raise ValueError(f"Invalid time: {time_str!r}")
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def format_clock(seconds):
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours:02}:{minutes:02}:{seconds:02}"
+
+
+class TimeEntry:
+    """One time entry, parsed once when it is loaded.
+
+    ``start`` and ``end`` are integer epoch seconds, project names are interned
+    so that entries of the same project share one string, and empty notes all
+    share the same empty string.
+    """
+
+    __slots__ = ("id", "project", "start", "end", "note")
+
+    def __init__(self, project, start, end, note="", entry_id=""):
+        self.id = entry_id
+        self.project = sys.intern(project)
+        self.start = start
+        self.end = end
+        self.note = note or ""
+
+    @classmethod
+    def parse(cls, project, date, start_time, end_time, note="", entry_id=""):
+        """Builds an entry from the text fields used in the UI and CSV files.
+
+        Raises ValueError if the date or a time is malformed.
+        """
+        base = parse_day(date) * SECONDS_PER_DAY
+        return cls(project, base + parse_clock(start_time), base + parse_clock(end_time), note, entry_id)
+
+    @classmethod
+    def from_row(cls, row):
+        # CSV rows are [project, date, start, end, note, id]; the last two may be missing
+        row = (list(row) + [""] * 6)[:6]
+        return cls.parse(*row)
+
+    def to_row(self):
+        return [self.project, self.date, self.start_time, self.end_time, self.note, self.id]
+
+    def copy(self, **changes):
+        fields = dict(project=self.project, start=self.start, end=self.end, note=self.note, entry_id=self.id)
+        fields.update(changes)
+        return TimeEntry(**fields)
+
+    @property
+    def day(self):
+        return self.start // SECONDS_PER_DAY
+
+    @property
+    def date(self):
+        return format_day(self.day)
+
+    @property
+    def start_time(self):
+        return format_clock(self.start % SECONDS_PER_DAY)
+
+    @property
+    def end_time(self):
+        return format_clock(self.end - self.day * SECONDS_PER_DAY)
+
+    @property
+    def seconds(self):
+        return self.end - self.start
+
+    def __eq__(self, other):
+        if not isinstance(other, TimeEntry):
+            return NotImplemented
+        return (self.id, self.project, self.start, self.end, self.note) == \
+            (other.id, other.project, other.start, other.end, other.note)
+
+    def __repr__(self):
+        return f"TimeEntry({self.project!r}, {self.date} {self.start_time}-{self.end_time}, id={self.id!r})"
@@ -0,0 +1,350 @@
+"""Compact binary entry files.
+
+    python -m llamatime convert time_entries.csv time_entries.bin
+    python -m llamatime convert time_entries.bin time_entries.csv
+
+Layout (all integers little-endian):
+
+    header    64 bytes: magic "LLTB", version, record size, record count and
+              the offsets of the three sections below
+    records   one fixed-width RECORD per entry, in file order: start and end
+              (epoch seconds), offset of the entry's ID and note in the heap,
+              index of its project in the string table, note and ID lengths
+    strings   the project names, each a 4-byte length and UTF-8 bytes, in
+              the order they first appear in the records
+    heap      entry IDs and notes as UTF-8, each ID followed by its note
+
+The file is opened with ``mmap``, so loading decodes records straight from
+the page cache without parsing text, and the start, end and project columns
+can be scanned in place through ``memoryview`` (or NumPy ``frombuffer``)
+without building entry objects. Converting to CSV and back is lossless.
+"""
+import csv
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+
+from entries import SECONDS_PER_DAY, TimeEntry
+from reports import load_numpy
+from storage import EntryJournal, journal_entries, write_csv
+
+MAGIC = b"LLTB"
+VERSION = 1
+# magic, version, record size, count, and offsets of the records, strings and heap
+HEADER = struct.Struct("<4sHHQQQQ")
+HEADER_SIZE = 64
+# start, end, heap offset, project index, note length, ID length, reserved
+RECORD = struct.Struct("<qqQIIII")
+# The same record as a NumPy structured dtype
+RECORD_FIELDS = [("start", "<i8"), ("end", "<i8"), ("heap", "<u8"), ("project", "<u4"),
+                 ("note_length", "<u4"), ("id_length", "<u4"), ("reserved", "<u4")]
+# Records are 40 bytes: five 8-byte or ten 4-byte words
+QWORDS = RECORD.size // 8
+DWORDS = RECORD.size // 4
+
+
+class FormatError(ValueError):
+    pass
+
+
+def is_entry_file(path):
+    """Tells a binary entry file from a CSV file by its magic number."""
+    try:
+        with open(path, "rb") as file:
+            return file.read(len(MAGIC)) == MAGIC
+    except FileNotFoundError:
+        return False
+
+
+def write_entry_file(path, entries, batch_size=10000):
+    """Writes ``entries`` to ``path`` atomically; returns the size of the file.
+
+    The heap is spooled to a temporary file while the records are written,
+    so memory use does not grow with the size of the notes.
+    """
+    temp_path = path + ".tmp"
+    projects = {}
+    count = 0
+    with open(temp_path, "wb") as file, tempfile.TemporaryFile(dir=os.path.dirname(path) or ".") as heap:
+        file.write(bytes(HEADER_SIZE))
+        heap_size = 0
+        batch = []
+        for entry in entries:
+            project = projects.setdefault(entry.project, len(projects))
+            entry_id = entry.id.encode("utf-8")
+            note = entry.note.encode("utf-8")
+            batch.append(RECORD.pack(entry.start, entry.end, heap_size, project, len(note), len(entry_id), 0))
+            heap.write(entry_id)
+            heap.write(note)
+            heap_size += len(entry_id) + len(note)
+            count += 1
+            if len(batch) >= batch_size:
+                file.write(b"".join(batch))
+                batch = []
+        file.write(b"".join(batch))
+
+        strings_offset = file.tell()
+        for name in projects:
+            encoded = name.encode("utf-8")
+            file.write(struct.pack("<I", len(encoded)))
+            file.write(encoded)
+        heap_offset = file.tell()
+        heap.seek(0)
+        shutil.copyfileobj(heap, file)
+
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, count, HEADER_SIZE, strings_offset, heap_offset))
+        file.flush()
+        os.fsync(file.fileno())
+        size = heap_offset + heap_size
+    os.replace(temp_path, path)
+    return size
+
+
+class EntryFile:
+    """Read-only, memory-mapped view of a binary entry file.
+
+    ``starts``, ``ends`` and ``project_codes`` are zero-copy views of the
+    record columns; ``projects`` maps a project code to its name. Close the
+    file (or use it as a context manager) before the file is replaced.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            self.size = os.fstat(file.fileno()).st_size
+            if self.size < HEADER_SIZE:
+                raise FormatError(f"{path} is not a binary entry file")
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size, self.count, self.records_offset, strings_offset, self.heap_offset = \
+            HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            self.close()
+            raise FormatError(f"{path} is not a version {VERSION} binary entry file")
+
+        self.projects = []
+        offset = strings_offset
+        while offset < self.heap_offset:
+            (length,) = struct.unpack_from("<I", self._mmap, offset)
+            self.projects.append(sys.intern(self._mmap[offset + 4:offset + 4 + length].decode("utf-8")))
+            offset += 4 + length
+
+        records = memoryview(self._mmap)[self.records_offset:self.records_offset + self.count * RECORD.size]
+        self.records = records
+        if sys.byteorder == "little":
+            qwords = records.cast("q")
+            dwords = records.cast("I")
+        else:
+            # Columns are copied and byte-swapped on big-endian machines
+            qwords = array("q")
+            qwords.frombytes(records)
+            qwords.byteswap()
+            dwords = array("I")
+            dwords.frombytes(records)
+            dwords.byteswap()
+        self.starts = qwords[0::QWORDS]
+        self.ends = qwords[1::QWORDS]
+        self.project_codes = dwords[6::DWORDS]
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for chunk, _ in self.chunks():
+            yield from chunk
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        # Views of the map have to be released before the map itself
+        for name in ("starts", "ends", "project_codes", "records"):
+            view = self.__dict__.pop(name, None)
+            if isinstance(view, memoryview):
+                view.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def entry(self, position):
+        """Decodes the entry at ``position`` (0-based, in file order)."""
+        return self._entry(*RECORD.unpack_from(self._mmap, self.records_offset + position * RECORD.size))
+
+    def _entry(self, start, end, heap, project, note_length, id_length, reserved=0):
+        heap += self.heap_offset
+        text = self._mmap[heap:heap + id_length + note_length]
+        return TimeEntry(self.projects[project], start, end,
+                         text[id_length:].decode("utf-8") if note_length else "",
+                         text[:id_length].decode("utf-8"))
+
+    def chunks(self, chunk_size=5000):
+        """Yields ``(entries, fraction read)`` in file order."""
+        entry = self._entry
+        step = chunk_size * RECORD.size
+        for offset in range(0, len(self.records), step):
+            chunk = [entry(*fields) for fields in RECORD.iter_unpack(self.records[offset:offset + step])]
+            yield chunk, min(1.0, (offset + step) / len(self.records))
+
+    def columns(self, np):
+        """Returns the records as a NumPy structured array over the map, without copying.
+
+        The array has to be dropped before the file is closed.
+        """
+        return np.frombuffer(self._mmap, dtype=np.dtype(RECORD_FIELDS), count=self.count,
+                             offset=self.records_offset)
+
+    def positions_with_ids(self, ids):
+        """Returns the positions of the records whose entry ID is in ``ids``."""
+        positions = []
+        if not ids:
+            return positions
+        for position, (_, _, heap, _, _, id_length, _) in enumerate(RECORD.iter_unpack(self.records)):
+            heap += self.heap_offset
+            if self._mmap[heap:heap + id_length].decode("utf-8") in ids:
+                positions.append(position)
+        return positions
+
+    def daily_totals(self, start_day=None, end_day=None, project=None, skip=()):
+        """Returns ``(project, day, seconds, count)`` rows, scanning the columns in place.
+
+        ``skip`` lists record positions to leave out, e.g. entries that a
+        journal has since replaced or deleted.
+        """
+        if project is not None and project not in self.projects:
+            return []
+        code = None if project is None else self.projects.index(project)
+        np = load_numpy()
+        if np is not None:
+            return self._daily_totals_numpy(np, start_day, end_day, code, skip)
+
+        totals = {}
+        skip = set(skip)
+        for position, (start, end, project_code) in enumerate(zip(self.starts, self.ends, self.project_codes)):
+            if code is not None and project_code != code:
+                continue
+            day = start // SECONDS_PER_DAY
+            if (start_day is not None and day < start_day) or (end_day is not None and day > end_day):
+                continue
+            if position in skip:
+                continue
+            key = (project_code, day)
+            seconds, count = totals.get(key, (0, 0))
+            totals[key] = (seconds + end - start, count + 1)
+        return [(self.projects[project_code], day, seconds, count)
+                for (project_code, day), (seconds, count) in sorted(totals.items())]
+
+    def _daily_totals_numpy(self, np, start_day, end_day, code, skip):
+        records = self.columns(np)
+        days = records["start"] // SECONDS_PER_DAY
+        mask = np.ones(self.count, dtype=bool)
+        if code is not None:
+            mask &= records["project"] == code
+        if start_day is not None:
+            mask &= days >= start_day
+        if end_day is not None:
+            mask &= days <= end_day
+        if len(skip):
+            mask[np.asarray(skip, dtype=np.int64)] = False
+        if not mask.any():
+            return []
+        days = days[mask]
+        first_day = int(days.min())
+        width = int(days.max()) - first_day + 1
+        cells = records["project"][mask].astype(np.int64) * width + (days - first_day)
+        keys, inverse = np.unique(cells, return_inverse=True)
+        durations = (records["end"][mask] - records["start"][mask]).astype(np.float64)
+        seconds = np.bincount(inverse, weights=durations)
+        counts = np.bincount(inverse)
+        return [(self.projects[int(key) // width], first_day + int(key) % width, int(round(total)), int(count))
+                for key, total, count in zip(keys, seconds, counts)]
+
+
+class BinaryJournal(EntryJournal):
+    """EntryJournal whose snapshot is a binary entry file instead of CSV.
+
+    Saves and deletes still go to the journal; only loading and compaction
+    use the binary format. On first use an existing ``csv_path`` (with its
+    journal) is converted. Backups stay CSV.
+    """
+
+    def __init__(self, path="time_entries.bin", csv_path="time_entries.csv", **options):
+        super().__init__(path, **options)
+        self.csv_path = csv_path
+
+    def _prepare_snapshot(self):
+        # The CSV file is converted with the compaction lock held exclusively,
+        # so that no other process converts or compacts at the same time; one
+        # that got there first has already written the binary file
+        if os.path.exists(self.path) or not os.path.exists(self.csv_path):
+            return
+        with self._compaction_lock:
+            if not os.path.exists(self.path):
+                self.bytes_written += write_entry_file(self.path, read_entries(self.csv_path))
+
+    def _read_snapshot(self, chunk_size):
+        try:
+            entry_file = EntryFile(self.path)
+        except FileNotFoundError:
+            return
+        with entry_file:
+            yield from entry_file.chunks(chunk_size)
+            self.bytes_read += entry_file.size
+
+    def _write_snapshot_file(self, path, entries):
+        return write_entry_file(path, entries)
+
+
+def read_entries(path):
+    """Returns the entries of a CSV or binary snapshot with its journal applied, without changing any file."""
+    if is_entry_file(path):
+        with EntryFile(path) as entry_file:
+            entries = list(entry_file)
+    else:
+        with open(path, "r", newline="") as file:
+            entries = [TimeEntry.from_row(row) for row in csv.reader(file) if row]
+
+    changes = journal_entries(path)
+    if not changes:
+        return entries
+    # Changed entries keep their place and new ones go last, as when the app loads them
+    merged = []
+    for entry in entries:
+        if entry.id and entry.id in changes:
+            entry = changes.pop(entry.id)
+        if entry is not None:
+            merged.append(entry)
+    merged.extend(entry for entry in changes.values() if entry is not None)
+    return merged
+
+
+def convert(source, destination):
+    """Converts a CSV snapshot to a binary entry file or back; returns the number of entries."""
+    entries = read_entries(source)
+    if is_entry_file(source):
+        write_csv(destination, entries)
+    else:
+        write_entry_file(destination, entries)
+    return len(entries)
+
+
+def add_arguments(parser):
+    parser.add_argument("source", help="time_entries.csv or a binary entry file")
+    parser.add_argument("destination", help="file to write in the other format")
+
+
+def run(args, parser):
+    if not os.path.exists(args.source):
+        parser.error(f"No such file: {args.source}")
+    try:
+        count = convert(args.source, args.destination)
+    except (ValueError, UnicodeDecodeError) as e:
+        parser.error(f"Cannot convert {args.source}: {e}")
+    print(f"Converted {count} entries to {args.destination}")
+    return 0
@@ -0,0 +1,471 @@
+"""Bulk import of time entries from other trackers' CSV, JSON Lines and iCalendar files.
+
+    python -m llamatime import [--format csv|jsonl|ics] [--project NAME] [--jobs N]
+        [--rejected PATH] [--dry-run] FILE ...
+
+Files are read as a stream of raw records, which are validated in chunks,
+in a process pool when the input is large, so memory use follows the
+number of new entries and not the size of the files. Every valid row gets a
+hash of its project, times and note; a row with the hash of an existing
+entry or of an earlier row is a duplicate and skipped, so importing the
+same file twice adds nothing. Rejected rows are reported with the reason.
+The new entries are saved with a single ``put_many()``.
+
+CSV files are either in the time_entries.csv layout or have a header row
+naming the columns: project, date (or start date), start and end (times, or
+dates and times), note or description. JSON Lines objects use the same
+names. iCalendar events use DTSTART, DTEND or DURATION, SUMMARY as the note
+and CATEGORIES as the project. Times without a UTC offset are local times,
+as in the app; all-day events and entries that end on a later day are
+rejected.
+
+This module does not import tkinter and can also be run on its own.
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+
+from entries import EPOCH_ORDINAL, SECONDS_PER_DAY, TimeEntry, parse_clock, parse_day
+
+FORMATS = ("csv", "jsonl", "ics")
+# Records validated per task
+CHUNK_SIZE = 5000
+# Inputs smaller than this are validated in this process, as starting a pool costs more
+POOL_MINIMUM_SIZE = 8 * 1024 * 1024
+
+# Header names used by other trackers, mapped to the fields read here
+COLUMNS = {
+    "project": "project", "client project": "project",
+    "date": "date", "start date": "date", "day": "date",
+    "start": "start", "start time": "start", "from": "start",
+    "end": "end", "end time": "end", "to": "end", "stop": "end",
+    "end date": "end_date",
+    "duration": "duration",
+    "note": "note", "notes": "note", "description": "note", "task": "note",
+}
+# The time_entries.csv layout; an ID column is ignored, imported entries get new IDs
+APP_COLUMNS = ("project", "date", "start", "end", "note")
+
+DATETIME = re.compile(r"(\d{4})-?(\d\d)-?(\d\d)[T ](\d\d):?(\d\d)(?::?(\d\d))?(?:\.\d+)?(Z|[+-]\d\d:?\d\d)?$")
+CLOCK = re.compile(r"(\d{1,2}):(\d\d)(?::(\d\d))?$")
+DURATION = re.compile(r"(?:P(?:(\d+)W)?(?:(\d+)D)?)?(?:T?(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$")
+
+
+class Rejected:
+    """A row that could not be imported, with where it came from and why."""
+
+    __slots__ = ("path", "line", "reason", "text")
+
+    def __init__(self, path, line, reason, text):
+        self.path = path
+        self.line = line
+        self.reason = reason
+        self.text = text
+
+    def __repr__(self):
+        return f"{self.path}:{self.line}: {self.reason}"
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if extension in (".ics", ".ical", ".ifb"):
+        return "ics"
+    return "csv"
+
+
+def column_name(name):
+    return COLUMNS.get(re.sub(r"[\s_-]+", " ", str(name).strip().casefold()))
+
+
+def read_csv(path):
+    """Yields ``(line, fields, row)`` for every row of a CSV file."""
+    with open(path, "r", newline="", encoding="utf-8-sig") as file:
+        reader = csv.reader(file)
+        columns = None
+        for row in reader:
+            if not any(field.strip() for field in row):
+                continue
+            if columns is None:
+                names = [column_name(name) for name in row]
+                if "project" in names and ("start" in names or "date" in names):
+                    columns = names
+                    continue
+                columns = APP_COLUMNS
+            fields = {name: value for name, value in zip(columns, row) if name is not None}
+            # The row is only turned back into text if it is rejected
+            yield reader.line_num, fields, row
+
+
+def read_jsonl(path):
+    """Yields ``(line, fields, text)`` for every line of a JSON Lines file.
+
+    A line that is not a JSON object yields None as its fields.
+    """
+    with open(path, "r", encoding="utf-8-sig") as file:
+        for number, line in enumerate(file, 1):
+            text = line.strip()
+            if not text:
+                continue
+            try:
+                document = json.loads(text)
+            except ValueError:
+                document = None
+            if not isinstance(document, dict):
+                yield number, None, text
+                continue
+            fields = {}
+            for name, value in document.items():
+                name = column_name(name)
+                if name is not None and value is not None:
+                    fields[name] = value if isinstance(value, str) else str(value)
+            yield number, fields, text
+
+
+def read_ics(path):
+    """Yields ``(line, fields, text)`` for every VEVENT of an iCalendar file, ``line`` being its BEGIN."""
+    event = None
+    for number, name, params, value in ics_properties(path):
+        if name == "BEGIN" and value.upper() == "VEVENT":
+            event = {"line": number, "lines": []}
+            fields = {}
+        elif event is None:
+            continue
+        elif name == "END" and value.upper() == "VEVENT":
+            yield event["line"], fields, "\n".join(event["lines"])
+            event = None
+            continue
+        else:
+            if name in ("DTSTART", "DTEND"):
+                if params.get("VALUE", "").upper() == "DATE" or len(value) == 8:
+                    fields["all_day"] = "1"
+                fields["start" if name == "DTSTART" else "end"] = value
+            elif name == "DURATION":
+                fields["duration"] = value
+            elif name == "SUMMARY":
+                fields["note"] = ics_text(value)
+            elif name == "DESCRIPTION":
+                fields.setdefault("note", ics_text(value))
+            elif name == "CATEGORIES":
+                fields["project"] = ics_text(re.split(r"(?<!\\),", value)[0])
+        event["lines"].append(f"{name}:{value}")
+
+
+def ics_properties(path):
+    # Yields (line, name, params, value) with folded lines joined back together
+    with open(path, "r", encoding="utf-8-sig", newline="") as file:
+        pending = None
+        for number, line in enumerate(file, 1):
+            line = line.rstrip("\r\n")
+            if line[:1] in (" ", "\t") and pending is not None:
+                pending[1] += line[1:]
+                continue
+            if pending is not None:
+                yield ics_property(*pending)
+            pending = [number, line]
+        if pending is not None:
+            yield ics_property(*pending)
+
+
+def ics_property(number, line):
+    head, _, value = line.partition(":")
+    name, *parts = head.split(";")
+    params = {}
+    for part in parts:
+        key, _, param = part.partition("=")
+        params[key.upper()] = param.strip('"')
+    return number, name.upper(), params, value
+
+
+def ics_text(value):
+    return re.sub(r"\\([\\;,nN])", lambda match: "\n" if match.group(1) in "nN" else match.group(1), value).strip()
+
+
+def csv_text(row):
+    out = io.StringIO()
+    csv.writer(out, lineterminator="").writerow(row)
+    return out.getvalue()
+
+
+READERS = {"csv": read_csv, "jsonl": read_jsonl, "ics": read_ics}
+
+
+def parse_datetime(text):
+    """Converts "YYYY-MM-DD HH:MM[:SS]" or an ISO 8601 / iCalendar date-time to local epoch seconds."""
+    match = DATETIME.match(text.strip())
+    if match is None:
+        raise ValueError(f"invalid date and time {text!r}")
+    year, month, day, hours, minutes, seconds, offset = match.groups()
+    try:
+        moment = datetime(int(year), int(month), int(day), int(hours), int(minutes), int(seconds or 0))
+    except ValueError:
+        raise ValueError(f"invalid date and time {text!r}")
+    if offset:
+        if offset == "Z":
+            zone = timezone.utc
+        else:
+            sign = -1 if offset[0] == "-" else 1
+            zone = timezone(sign * timedelta(hours=int(offset[1:3]), minutes=int(offset[-2:])))
+        # Entries keep local wall-clock times
+        moment = moment.replace(tzinfo=zone).astimezone().replace(tzinfo=None)
+    return ((moment.toordinal() - EPOCH_ORDINAL) * SECONDS_PER_DAY
+            + moment.hour * 3600 + moment.minute * 60 + moment.second)
+
+
+def parse_time(text):
+    """Converts "H:MM" or "HH:MM:SS" to seconds since midnight."""
+    if len(text) == 8 and text[2] == ":" and text[5] == ":":
+        try:
+            return parse_clock(text)
+        except ValueError:
+            raise ValueError(f"invalid time {text!r}")
+    match = CLOCK.match(text.strip())
+    if match is None:
+        raise ValueError(f"invalid time {text!r}")
+    hours, minutes, seconds = match.groups()
+    try:
+        return parse_clock(f"{int(hours):02}:{minutes}:{seconds or '00'}")
+    except ValueError:
+        raise ValueError(f"invalid time {text!r}")
+
+
+def parse_duration(text):
+    """Converts "HH:MM[:SS]" or an ISO 8601 duration such as "PT1H30M" to seconds."""
+    text = text.strip()
+    if CLOCK.match(text):
+        hours, minutes, seconds = CLOCK.match(text).groups()
+        return int(hours) * 3600 + int(minutes) * 60 + int(seconds or 0)
+    match = DURATION.match(text.upper())
+    if not text or match is None or not any(match.groups()):
+        raise ValueError(f"invalid duration {text!r}")
+    weeks, days, hours, minutes, seconds = (int(value or 0) for value in match.groups())
+    return (weeks * 7 + days) * SECONDS_PER_DAY + hours * 3600 + minutes * 60 + seconds
+
+
+def parse_moment(value, date):
+    # A time on ``date`` (at most "HH:MM:SS"), or a full date and time
+    if date and len(value) <= 8:
+        try:
+            day = parse_day(date)
+        except ValueError:
+            raise ValueError(f"invalid date {date!r}")
+        return day * SECONDS_PER_DAY + parse_time(value)
+    return parse_datetime(value)
+
+
+def validate(fields, default_project=None):
+    """Checks one record's fields like the entry form does.
+
+    Returns ``(project, start, end, note)``, or raises ValueError with the
+    reason the row is rejected.
+    """
+    if fields is None:
+        raise ValueError("not a JSON object")
+    if fields.get("all_day"):
+        raise ValueError("all-day event")
+    project = (fields.get("project") or "").strip() or default_project
+    if not project:
+        raise ValueError("no project")
+    start_text = (fields.get("start") or "").strip()
+    if not start_text:
+        raise ValueError("no start time")
+    date = (fields.get("date") or "").strip()
+    start = parse_moment(start_text, date)
+    end_text = (fields.get("end") or "").strip()
+    if end_text:
+        end = parse_moment(end_text, (fields.get("end_date") or "").strip() or date)
+    elif (fields.get("duration") or "").strip():
+        end = start + parse_duration(fields["duration"])
+    else:
+        raise ValueError("no end time")
+    if end <= start:
+        raise ValueError("end time is not after the start time")
+    if end >= (start // SECONDS_PER_DAY + 1) * SECONDS_PER_DAY:
+        raise ValueError("ends on a later day")
+    return project, start, end, (fields.get("note") or "").strip()
+
+
+def content_hash(project, start, end, note):
+    """Identifies an entry by its content, whatever its ID."""
+    return hashlib.blake2b(f"{project}\x1f{start}\x1f{end}\x1f{note}".encode("utf-8"), digest_size=16).digest()
+
+
+def validate_chunk(path, records, default_project):
+    """Worker: returns ``(valid, rejected)`` for a chunk of ``(line, fields, text or CSV row)`` records.
+
+    ``valid`` holds ``(hash, project, start, end, note)`` tuples.
+    """
+    valid = []
+    rejected = []
+    for line, fields, text in records:
+        try:
+            values = validate(fields, default_project)
+        except ValueError as e:
+            rejected.append(Rejected(path, line, str(e), text if isinstance(text, str) else csv_text(text)))
+            continue
+        valid.append((content_hash(*values),) + values)
+    return valid, rejected
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def validated_chunks(paths, file_format=None, default_project=None, jobs=None, chunk_size=CHUNK_SIZE):
+    """Yields ``(valid, rejected)`` per chunk of every file, in file order.
+
+    With ``jobs`` above 1 chunks are validated in that many processes, a few
+    chunks ahead of the reader; by default only for inputs of at least
+    ``POOL_MINIMUM_SIZE`` bytes.
+    """
+    tasks = ((path, chunk) for path in paths
+             for chunk in chunks(READERS[file_format or detect_format(path)](path), chunk_size))
+    if jobs is None:
+        large = sum(os.path.getsize(path) for path in paths) >= POOL_MINIMUM_SIZE
+        jobs = (os.cpu_count() or 1) if large else 1
+    if jobs <= 1:
+        for path, chunk in tasks:
+            yield validate_chunk(path, chunk, default_project)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending = deque()
+        for path, chunk in tasks:
+            pending.append(pool.submit(validate_chunk, path, chunk, default_project))
+            if len(pending) >= 2 * jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class ImportBatch:
+    """The new entries from one import, before they are saved.
+
+    Rows repeating an earlier row are dropped while the files are read;
+    ``drop_existing()`` drops those that are already saved.
+    """
+
+    def __init__(self):
+        self.entries = []
+        self.hashes = set()
+        self.rows = 0
+        self.duplicates = 0
+        self.rejected = []
+
+    def add(self, valid, rejected):
+        self.rows += len(valid) + len(rejected)
+        self.rejected.extend(rejected)
+        for digest, project, start, end, note in valid:
+            if digest in self.hashes:
+                self.duplicates += 1
+                continue
+            self.hashes.add(digest)
+            self.entries.append(TimeEntry(project, start, end, note))
+
+    def day_range(self):
+        """First and last day of the new entries, or None if there are none."""
+        if not self.entries:
+            return None
+        return (min(entry.start for entry in self.entries) // SECONDS_PER_DAY,
+                max(entry.start for entry in self.entries) // SECONDS_PER_DAY)
+
+    def drop_existing(self, entries):
+        """Drops the new entries that ``entries`` (ID -> TimeEntry) already has."""
+        starts = {entry.start for entry in self.entries}
+        existing = {content_hash(entry.project, entry.start, entry.end, entry.note)
+                    for entry in entries.values() if entry.start in starts}
+        if not existing:
+            return
+        kept = [entry for entry in self.entries
+                if content_hash(entry.project, entry.start, entry.end, entry.note) not in existing]
+        self.duplicates += len(self.entries) - len(kept)
+        self.entries = kept
+
+    def summary(self, verb="Imported"):
+        return (f"{verb} {len(self.entries):,} of {self.rows:,} rows: "
+                f"{self.duplicates:,} duplicates, {len(self.rejected):,} rejected.")
+
+
+def read_batch(paths, file_format=None, default_project=None, jobs=None, chunk_size=CHUNK_SIZE):
+    """Reads and validates ``paths`` into an ImportBatch; does not touch the store."""
+    batch = ImportBatch()
+    for valid, rejected in validated_chunks(paths, file_format, default_project, jobs, chunk_size):
+        batch.add(valid, rejected)
+    return batch
+
+
+def write_rejected(path, rejected):
+    """Writes the rejected rows to a CSV file: file, line, reason and the row as read."""
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["file", "line", "reason", "row"])
+        writer.writerows([item.path, item.line, item.reason, item.text] for item in rejected)
+
+
+def add_arguments(parser):
+    parser.add_argument("--format", choices=FORMATS, help="format of the files (default: from the extension)")
+    parser.add_argument("--project", help="project for rows that do not name one")
+    parser.add_argument("--jobs", type=int, help="worker processes (default: one per CPU for large inputs)")
+    parser.add_argument("--rejected", metavar="PATH", help="write the rejected rows and reasons to this CSV file")
+    parser.add_argument("--dry-run", action="store_true", help="check the files without saving anything")
+    parser.add_argument("--store", default="time_entries.csv", metavar="FILE",
+                        help="entry file to import into (default: %(default)s)")
+    parser.add_argument("files", nargs="+", metavar="FILE")
+
+
+def run(args, parser, out=None):
+    from storage import open_store
+
+    missing = [path for path in args.files if not os.path.exists(path)]
+    if missing:
+        parser.error(f"No such file: {missing[0]}")
+    out = out or sys.stdout
+
+    batch = read_batch(args.files, args.format, args.project, args.jobs)
+    store = open_store(args.store)
+    try:
+        store.load()
+        days = batch.day_range()
+        if days is not None and hasattr(store, "load_partitions"):
+            # Older months are not loaded by default; duplicates may be there
+            store.load_partitions(store.unloaded_months(*days))
+        batch.drop_existing(store.entries)
+        if batch.entries and not args.dry_run:
+            store.put_many(batch.entries)
+            store.sync()
+    finally:
+        store.close()
+
+    out.write(batch.summary("Would import" if args.dry_run else "Imported") + "\n")
+    for item in batch.rejected[:10]:
+        out.write(f"  {item}\n")
+    if len(batch.rejected) > 10:
+        out.write(f"  ... and {len(batch.rejected) - 10:,} more\n")
+    if args.rejected:
+        write_rejected(args.rejected, batch.rejected)
+    out.flush()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="llamatime import", description="Bulk import of time entries.")
+    add_arguments(parser)
+    return run(parser.parse_args(argv), parser)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
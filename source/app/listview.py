@@ -0,0 +1,141 @@
+import tkinter as tk
+from tkinter import font as tkfont
+from tkinter import ttk
+
+
+class VirtualListbox(ttk.Frame):
+    """A listbox that only formats and renders the rows in view.
+
+    The list is a sequence of entry IDs; ``format_row(entry_id)`` is called
+    for the visible window plus ``buffer`` rows when the view scrolls, so the
+    cost of showing a list does not grow with its length. The selection is
+    tracked by entry ID rather than by listbox row. ``on_top()`` is called
+    when the view is scrolled up while already showing the first row.
+    """
+
+    def __init__(self, parent, format_row, on_select=None, on_top=None, buffer=2, **listbox_options):
+        super().__init__(parent)
+        self.format_row = format_row
+        self.on_select = on_select
+        self.on_top = on_top
+        self.buffer = buffer
+
+        # Entry IDs in display order and the index of the first rendered one
+        self.ids = []
+        self.top = 0
+        self.selected_id = None
+        # Text shown instead of format_row() for rows being edited
+        self.previews = {}
+
+        self.listbox = tk.Listbox(self, exportselection=False, **listbox_options)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.scrollbar.pack(side="right", fill="y")
+        self.listbox.pack(side="left", fill="both", expand=True)
+        self.line_height = tkfont.Font(font=self.listbox["font"]).metrics("linespace") + 1
+
+        self.listbox.bind("<<ListboxSelect>>", self._on_listbox_select)
+        self.listbox.bind("<Configure>", lambda event: self.render())
+        self.listbox.bind("<MouseWheel>", self._on_mousewheel)
+        self.listbox.bind("<Button-4>", lambda event: self.scroll(-3))
+        self.listbox.bind("<Button-5>", lambda event: self.scroll(3))
+        self.listbox.bind("<Up>", lambda event: self.move_selection(-1))
+        self.listbox.bind("<Down>", lambda event: self.move_selection(1))
+        self.listbox.bind("<Prior>", lambda event: self.scroll(-self.visible_rows()))
+        self.listbox.bind("<Next>", lambda event: self.scroll(self.visible_rows()))
+
+    def set_ids(self, ids):
+        """Shows ``ids`` (in order), keeping the selection if it is still listed."""
+        self.ids = ids
+        self.previews.clear()
+        self.top = min(self.top, max(0, len(ids) - self.visible_rows()))
+        self.render()
+
+    def refresh(self):
+        self.previews.clear()
+        self.render()
+
+    def preview(self, entry_id, text):
+        self.previews[entry_id] = text
+        self.render()
+
+    def visible_rows(self):
+        height = self.listbox.winfo_height()
+        if height <= 1:
+            # Not mapped yet
+            return int(self.listbox.cget("height"))
+        return max(1, height // self.line_height)
+
+    def render(self):
+        rows = self.visible_rows()
+        window = self.ids[self.top:self.top + rows + self.buffer]
+        self.listbox.delete(0, tk.END)
+        self.listbox.insert(tk.END, *[self.previews.get(entry_id) or self.format_row(entry_id) for entry_id in window])
+        self.listbox.yview_moveto(0)
+        if self.selected_id is not None and self.selected_id in window:
+            self.listbox.selection_set(window.index(self.selected_id))
+
+        if self.ids:
+            self.scrollbar.set(self.top / len(self.ids), min(1.0, (self.top + rows) / len(self.ids)))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def scroll(self, rows):
+        if rows < 0 and self.top == 0 and self.on_top:
+            self.on_top()
+        top = max(0, min(self.top + rows, len(self.ids) - self.visible_rows()))
+        if top != self.top:
+            self.top = top
+            self.render()
+        return "break"
+
+    def yview(self, *args):
+        # Scrollbar protocol: ("moveto", fraction) or ("scroll", n, "units"|"pages")
+        if args[0] == "moveto":
+            self.scroll(int(float(args[1]) * len(self.ids)) - self.top)
+        elif args[0] == "scroll":
+            step = int(args[1])
+            self.scroll(step * self.visible_rows() if args[2] == "pages" else step)
+
+    def see(self, entry_id):
+        try:
+            position = self.ids.index(entry_id)
+        except ValueError:
+            return
+        rows = self.visible_rows()
+        if not self.top <= position < self.top + rows:
+            self.scroll(position - rows // 2 - self.top)
+
+    def select(self, entry_id):
+        self.selected_id = entry_id
+        self.render()
+        if self.on_select:
+            self.on_select()
+
+    def clear_selection(self):
+        self.selected_id = None
+        self.listbox.selection_clear(0, tk.END)
+
+    def move_selection(self, step):
+        if not self.ids:
+            return "break"
+        try:
+            position = self.ids.index(self.selected_id) + step
+        except ValueError:
+            position = self.top
+        position = max(0, min(position, len(self.ids) - 1))
+        self.selected_id = self.ids[position]
+        self.see(self.selected_id)
+        self.render()
+        if self.on_select:
+            self.on_select()
+        return "break"
+
+    def _on_listbox_select(self, event):
+        selection = self.listbox.curselection()
+        position = self.top + selection[0] if selection else None
+        self.selected_id = self.ids[position] if position is not None and position < len(self.ids) else None
+        if self.on_select:
+            self.on_select()
+
+    def _on_mousewheel(self, event):
+        return self.scroll(-3 if event.delta > 0 else 3)
@@ -1,72 +1,216 @@
+from startup import profile
+import argparse
+import sys
 import tkinter as tk
 from tkinter import messagebox
 from tkinter import ttk
 from tkinter import Menu
-import csv
 from datetime import datetime, timedelta
-from collections import defaultdict
-from fpdf import FPDF
-import pystray
-from PIL import Image, ImageDraw, ImageFont
-from tkcalendar import DateEntry
 import threading
 import time
-import shutil
-import matplotlib.pyplot as plt
 import os
-import tempfile
-from threading import Timer
+import queue
 from tkinter import simpledialog
-import winsound
+from tkinter import filedialog
+from entries import SECONDS_PER_DAY, TimeEntry, format_clock, format_day, parse_day
+from backups import BackupStore, month_days, month_of
+from date_index import DateIndex
+from diagnostics import instrumented, instruments
+from listview import VirtualListbox
+from pdf_export import PdfExport
+from reports import PERIODS, Breakdown, ReportCache, ReportEngine, breakdown_size, format_duration, format_report
+from scheduler import Pomodoro, Scheduler
+from search_index import SearchIndex
+from sorted_views import FIELDS as SORT_FIELDS, SortedViews
+from storage import open_store
+from sync import SyncState
+from timers import TimerEngine
+from totals import ProjectTotals
+from undo import UndoLog
+
+# fpdf, matplotlib, PIL, pystray, tkcalendar and winsound, and the modules
+# for importing files and the sync client, are imported through
+# profile.import_module() when the feature that needs them is first used;
+# the command line subcommands only import their own module.
+profile.mark("imports")
 
 
 class ReminderSystem:
+    """Reminders and Pomodoro cycles, all driven by one Scheduler on the Tk loop."""
+
+    # Minutes a snoozed reminder or Pomodoro phase is put off by
+    SNOOZE_MINUTES = 5
+
     def __init__(self, app):
         self.app = app
-        self.reminder_timer = None
         self.reminder_interval = 30 * 60  # 30 minutes
+        self.scheduler = Scheduler(app.root.after, app.root.after_cancel)
+        self.pomodoro = Pomodoro(self.scheduler, self.on_pomodoro_phase)
 
     def start_reminder(self):
         self.stop_reminder()  # Cancel any existing reminder
-        self.reminder_timer = Timer(self.reminder_interval, self.show_reminder)
-        self.reminder_timer.start()
+        self.scheduler.schedule(self.reminder_interval, self.show_reminder,
+                                interval=self.reminder_interval, name="timer reminder")
 
     def stop_reminder(self):
-        if self.reminder_timer:
-            self.reminder_timer.cancel()
+        self.scheduler.cancel_named("timer reminder")
 
-    def show_reminder(self):
-        # Play a sound when the reminder is shown
-        winsound.PlaySound("SystemHand", winsound.SND_ALIAS)
+    def add_reminder(self, message, delay):
+        """Shows ``message`` once after ``delay`` seconds."""
+        return self.scheduler.schedule(delay, lambda: self.notify("Reminder", message, snooze=message),
+                                       name="reminder")
 
-        if not self.app.is_timer_running:
-            messagebox.showinfo("Reminder", "Don't forget to start your timer!")
+    def show_reminder(self):
+        if not self.app.timers.running():
+            self.notify("Reminder", "Don't forget to start your timer!")
         else:
-            messagebox.showinfo("Reminder", "Remember to stop your timer if you're done working!")
-        self.start_reminder()  # Schedule the next reminder
+            self.notify("Reminder", "Remember to stop your timer if you're done working!")
+
+    def on_pomodoro_phase(self, ended, started):
+        minutes = self.pomodoro.durations[started] // 60
+        self.notify("Pomodoro", f"{ended.capitalize()} is over. {started.capitalize()} for {minutes} minutes.",
+                    on_snooze=lambda: self.pomodoro.snooze(self.SNOOZE_MINUTES * 60))
+
+    def notify(self, title, message, snooze=None, on_snooze=None):
+        """Plays a sound and shows ``message``; ``snooze`` re-schedules it as a reminder."""
+        self.play_sound()
+        window = tk.Toplevel(self.app.root)
+        window.title(title)
+        window.attributes("-topmost", True)
+        ttk.Label(window, text=message, wraplength=300).pack(padx=10, pady=10)
+        buttons = ttk.Frame(window)
+        buttons.pack(padx=10, pady=(0, 10))
+        if snooze is not None:
+            on_snooze = lambda: self.add_reminder(snooze, self.SNOOZE_MINUTES * 60)
+        if on_snooze is not None:
+            ttk.Button(buttons, text=f"Snooze {self.SNOOZE_MINUTES} min",
+                       command=lambda: (on_snooze(), window.destroy())).pack(side="left", padx=5)
+        ttk.Button(buttons, text="Dismiss", command=window.destroy).pack(side="left", padx=5)
+
+    def play_sound(self):
+        # The Windows system sound where there is one, the Tk bell elsewhere
+        try:
+            winsound = profile.import_module("winsound")
+        except ImportError:
+            self.app.root.bell()
+            return
+        winsound.PlaySound("SystemHand", winsound.SND_ALIAS | winsound.SND_ASYNC)
+
+
+class DatePlaceholder(ttk.Entry):
+    """Plain entry shown in place of a calendar DateEntry until tkcalendar is loaded."""
+
+    def __init__(self, parent, width=30):
+        super().__init__(parent, width=width)
+        self.set_date(datetime.now())
+
+    def set_date(self, date):
+        if not isinstance(date, str):
+            date = date.strftime("%Y-%m-%d")
+        self.delete(0, tk.END)
+        self.insert(0, date)
 
 
 class TimeEntryApp:
 
-    def __init__(self, root):
+    # Date fields that become calendar pickers once the first frame is shown
+    DATE_FIELDS = ("date_entry", "start_date_filter_entry", "end_date_filter_entry",
+                   "start_date_entry", "end_date_entry")
+    # Seconds between automatic backups (skipped when nothing changed)
+    AUTO_BACKUP_INTERVAL = 60 * 60
+    # What Backup Data wrote before point-in-time backups; imported as a snapshot
+    LEGACY_BACKUP = "time_entries_backup.csv"
+    # Seconds between checks for entries changed by other instances using the same files
+    CHANGE_POLL_INTERVAL = 2
+    # Seconds between automatic syncs once a sync server is set up
+    SYNC_INTERVAL = 5 * 60
+    # Milliseconds of typing pause before the search box runs its query
+    SEARCH_DELAY = 250
+    # Report "Group By" choices, matching reports.PERIODS
+    PERIOD_NAMES = ("Project", "Day", "Week", "Month")
+    # Sorting button labels by sort field
+    SORT_LABELS = {"project": "Sort by Project", "date": "Sort by Date",
+                   "duration": "Sort by Duration", "total_time": "Sort by Total Time"}
+
+    def __init__(self, root, startup_budget=None):
         self.root = root
         self.root.title("Llama Time")
         self.apply_light_style()
         self.tray_icon_created = False
+        # Fail the cold start check when the first frame takes longer than this
+        self.startup_budget = startup_budget
+        self.exit_code = 0
         self.reminder_system = ReminderSystem(self)
-
-       # List to store time entries
-        self.entries = []
-        # Index of the currently selected entry in the listbox
-        self.selected_entry_index = None
-        # Dictionary to store total time spent on each project
-        self.total_time = defaultdict(timedelta)
-        # Flag to track if the timer is running
-        self.is_timer_running = False
-        # Start time of the timer
-        self.start_time = None
-        # Elapsed time of the timer
-        self.elapsed_time = timedelta()
+        # Incremental point-in-time backups; months of entries changed since
+        # the last one are the only ones written again
+        self.backups = BackupStore("backups")
+        self.backup_months = set()
+        self.backup_running = False
+        self.reminder_system.scheduler.schedule(self.AUTO_BACKUP_INTERVAL, lambda: self.backup_data(quiet=True),
+                                                interval=self.AUTO_BACKUP_INTERVAL, name="backup")
+        self.reminder_system.scheduler.schedule(self.CHANGE_POLL_INTERVAL, self.apply_store_changes,
+                                                interval=self.CHANGE_POLL_INTERVAL, name="changes")
+        # Delta sync through a sync server, once one is set up with Tools >
+        # Sync Now or LLAMATIME_SYNC_URL; until then sync_state.json does not exist
+        self.sync_state = SyncState("sync_state.json")
+        self.sync_running = False
+        sync_url = os.environ.get("LLAMATIME_SYNC_URL")
+        if sync_url or os.path.exists(self.sync_state.path):
+            self.sync_state.load()
+            if sync_url and sync_url != self.sync_state.url:
+                self.sync_state.configure(sync_url)
+        if self.sync_state.enabled:
+            self.schedule_sync()
+
+        # Storage for the time entries: the append-only journal over
+        # time_entries.csv, or SQLite when LLAMATIME_STORAGE=sqlite
+        self.store = open_store("time_entries.csv")
+        # Time entries by ID (the store's own dictionary) and their display order
+        self.entries = {}
+        self.entry_order = []
+        # Total time spent on each project, kept up to date incrementally.
+        # LLAMATIME_CHECK_TOTALS=1 compares it to a full recompute on every change.
+        self.total_time = ProjectTotals(check=os.environ.get("LLAMATIME_CHECK_TOTALS") == "1")
+        # Entry IDs ordered by date for range filters and reports
+        self.date_index = DateIndex()
+        # Columnar copy of the entries for report breakdowns
+        self.report_engine = ReportEngine()
+        # Entry IDs in each sort order used so far, kept up to date on every
+        # change so switching orders needs no re-sort; sort_order is the one
+        # shown as (field, descending) pairs, None for the display order
+        self.sorted_views = SortedViews()
+        self.sort_order = None
+        # Word index over notes and project names for the search box. It is
+        # built on a worker thread once the entries are loaded; changes made
+        # meanwhile are kept in search_backlog and applied when it is ready.
+        self.search_index = None
+        self.search_backlog = None
+        self.search_job = None
+        # Day range last applied with "Filter by Date Range", which searches keep to
+        self.date_filter = None
+        # Saves and deletes for Edit > Undo and Redo; kept across restarts in
+        # undo_history.journal when LLAMATIME_UNDO_HISTORY=1
+        undo_path = "undo_history.journal" if os.environ.get("LLAMATIME_UNDO_HISTORY") == "1" else None
+        self.undo_log = UndoLog(path=undo_path).load()
+        # Report results and charts by (kind, range, filter, data version);
+        # the version changes with every change to the entries
+        self.report_cache = ReportCache()
+        self.data_version = 0
+        # Running PDF export, if any
+        self.export = None
+        # Entries are parsed on a worker thread and handed over in chunks;
+        # changes made while that runs are queued until it has finished
+        self.loading = False
+        self.load_queue = queue.Queue()
+        self.pending_changes = []
+        # Named timers, one per project; they survive restarts via timers.json
+        self.timers = TimerEngine("timers.json")
+        self.timers.load()
+        # What the timer button and tray last showed, and the pending tick
+        self.timer_display = None
+        self.timer_tick = None
+        self.timers_window = None
+        self.diagnostics_window = None
         
         # Set the icon
         icon = tk.PhotoImage(file="no-problama-master/source/app/llama-icon.gif")
@@ -78,7 +222,7 @@ class TimeEntryApp:
         # Create UI components
         self.create_widgets()
 
-        # Load existing entries from the CSV file
+        # Load existing entries from the CSV file in the background
         self.load_entries()
 
         # Configure grid layout
@@ -93,15 +237,19 @@ class TimeEntryApp:
         menu_bar.add_cascade(label="File", menu=file_menu)
         file_menu.add_command(label="New")
         file_menu.add_command(label="Open")
-        file_menu.add_command(label="Save")
+        file_menu.add_command(label="Import...", command=self.import_entries)
+        file_menu.add_command(label="Save", command=self.write_entries)
         file_menu.add_separator()
         file_menu.add_command(label="Exit", command=root.quit)
 
         # Create the edit report bar items
-        edit_menu = Menu(menu_bar, tearoff=0)
-        menu_bar.add_cascade(label="Edit", menu=edit_menu)
-        edit_menu.add_command(label="Undo")
-        edit_menu.add_command(label="Redo")
+        self.edit_menu = Menu(menu_bar, tearoff=0)
+        menu_bar.add_cascade(label="Edit", menu=self.edit_menu)
+        self.edit_menu.add_command(label="Undo", command=self.undo, accelerator="Ctrl+Z")
+        self.edit_menu.add_command(label="Redo", command=self.redo, accelerator="Ctrl+Y")
+        root.bind("<Control-z>", lambda event: self.undo())
+        root.bind("<Control-y>", lambda event: self.redo())
+        self.refresh_undo_menu()
 
         # Create the help report bar items
         reports_menu = Menu(menu_bar, tearoff=0)
@@ -110,6 +258,8 @@ class TimeEntryApp:
         reports_menu.add_separator()
         reports_menu.add_command(label="Docs")
         reports_menu.add_command(label="Support")
+        reports_menu.add_separator()
+        reports_menu.add_command(label="Cache Statistics", command=self.show_cache_stats)
         
         # Create the views menu bar items
         view_menu = Menu(menu_bar, tearoff=0)
@@ -121,9 +271,21 @@ class TimeEntryApp:
         tools_menu = Menu(menu_bar, tearoff=0)
         menu_bar.add_cascade(label="Tools", menu=tools_menu)
         tools_menu.add_command(label="Set Reminder Interval", command=self.set_reminder_interval)
+        tools_menu.add_command(label="Add Reminder...", command=self.add_reminder)
+        tools_menu.add_command(label="Start Pomodoro", command=self.reminder_system.pomodoro.start)
+        tools_menu.add_command(label="Stop Pomodoro", command=self.reminder_system.pomodoro.stop)
+        tools_menu.add_command(label="Pause/Resume Timer", command=self.pause_timer)
+        tools_menu.add_command(label="Timers...", command=self.show_timers)
         tools_menu.add_separator()
         tools_menu.add_command(label="Backup Data", command=self.backup_data)
         tools_menu.add_command(label="Restore Data", command=self.restore_data)
+        tools_menu.add_command(label="Verify Backups", command=self.verify_backups)
+        tools_menu.add_command(label="Sync Now", command=self.sync_now)
+        tools_menu.add_separator()
+        self.instrumentation_enabled = tk.BooleanVar(value=instruments.enabled)
+        tools_menu.add_checkbutton(label="Enable Instrumentation", variable=self.instrumentation_enabled,
+                                   command=self.toggle_instrumentation)
+        tools_menu.add_command(label="Diagnostics...", command=self.show_diagnostics)
 
         # Create the help menu bar items
         help_menu = Menu(menu_bar, tearoff=0)
@@ -132,11 +294,57 @@ class TimeEntryApp:
         help_menu.add_command(label="Update")
         help_menu.add_command(label="Documents")
 
-        # Create the system tray icon
-        self.create_system_tray()
+        profile.mark("window built")
 
-        # Update timer in system tray
-        self.update_timer_in_tray()
+        # The tray icon and the calendars are set up once the first frame is on screen
+        self.root.after_idle(lambda: self.root.after(0, self.finish_startup))
+
+    def finish_startup(self):
+        profile.mark("first frame")
+        try:
+            # Swap the plain date fields for calendar pickers
+            self.create_calendars()
+
+            # Create the system tray icon
+            self.create_system_tray()
+
+            # Show the running timers (possibly restored from the last session)
+            self.refresh_timer_display()
+            if self.timers.running():
+                self.reminder_system.start_reminder()
+            profile.mark("deferred setup done")
+        finally:
+            # The budget is checked even if the deferred setup failed, e.g.
+            # without tkcalendar, so that --startup-budget always quits
+            self.report_startup()
+
+    def report_startup(self):
+        if os.environ.get("LLAMATIME_STARTUP_REPORT") == "1" or self.startup_budget is not None:
+            print(profile.report(), file=sys.stderr)
+        if self.startup_budget is not None:
+            first_frame = profile.elapsed("first frame")
+            if first_frame > self.startup_budget:
+                print(f"Cold start took {first_frame:.3f}s, over the {self.startup_budget:.3f}s budget", file=sys.stderr)
+                self.exit_code = 1
+            self.exit_app()
+
+    def create_date_entry(self):
+        return DatePlaceholder(self.root, width=30)
+
+    def create_calendars(self):
+        DateEntry = profile.import_module("tkcalendar").DateEntry
+        for name in self.DATE_FIELDS:
+            placeholder = getattr(self, name)
+            calendar = DateEntry(self.root, width=30, background='darkblue',
+                    foreground='white', borderwidth=2, year=datetime.now().year,
+                    month=datetime.now().month, day=datetime.now().day, date_pattern='yyyy-mm-dd')
+            try:
+                calendar.set_date(placeholder.get().strip())
+            except ValueError:
+                pass
+            calendar.grid(**placeholder.grid_info())
+            placeholder.destroy()
+            setattr(self, name, calendar)
 
     def apply_light_style(self):
         self.root.configure(bg="#f0f0f0")
@@ -163,35 +371,435 @@ class TimeEntryApp:
         style.configure("Danger.TButton", background="red", foreground="white")
 
         # Create backup data
-    def backup_data(self):
-        try:
-            shutil.copy("time_entries.csv", "time_entries_backup.csv")
-            messagebox.showinfo("Backup Success", "Data backup created successfully.")
-        except Exception as e:
+    def backup_data(self, quiet=False):
+        if self.loading:
+            self.pending_changes.append(lambda: self.backup_data(quiet))
+            return
+        if self.backup_running:
+            if not quiet:
+                messagebox.showinfo("Backup", "A backup is already running.")
+            return
+        if quiet and not self.backup_months:
+            # Nothing changed since the last backup
+            return
+
+        changed = self.changed_backup_months()
+        self.backup_running = True
+
+        def work():
+            path = self.backups.write_snapshot(changed)
+            self.backups.prune()
+            return path
+
+        def done(path):
+            self.backup_running = False
+            if not quiet:
+                messagebox.showinfo("Backup Success", "Data backup created successfully.")
+
+        def failed(e):
+            self.backup_running = False
+            self.backup_months.update(changed)
             messagebox.showerror("Backup Error", f"An error occurred while creating the backup: {str(e)}")
 
+        self.run_in_background(work, done, failed)
+
+    def changed_backup_months(self):
+        # All entries of every month changed since the last backup
+        months, self.backup_months = self.backup_months, set()
+        changed = {}
+        unloaded = set(self.store.unloaded_months()) if hasattr(self.store, "load_partitions") else set()
+        for month in months:
+            if month in unloaded:
+                changed[month] = self.store.read_partition(month)
+                continue
+            first_day, last_day = month_days(month)
+            changed[month] = [self.entries[entry_id] for entry_id in self.date_index.range(first_day, last_day)]
+        return changed
+
         # Restore data from backup
     def restore_data(self):
-        try:
-            shutil.copy("time_entries_backup.csv", "time_entries.csv")
+        if self.loading:
+            self.pending_changes.append(self.restore_data)
+            return
+        if os.path.exists(self.LEGACY_BACKUP):
+            self.import_legacy_backup()
+        else:
+            self.choose_snapshot()
+
+    def choose_snapshot(self):
+        snapshots = self.backups.snapshots()
+        if not snapshots:
+            messagebox.showinfo("Restore", "There are no backups yet.")
+            return
+
+        window = tk.Toplevel(self.root)
+        window.title("Restore Data")
+        ttk.Label(window, text="Restore the entries as they were at:").pack(padx=10, pady=5)
+        times = [when for when, _ in reversed(snapshots)]
+        labels = [datetime.fromtimestamp(when).strftime("%Y-%m-%d %H:%M:%S")
+                  + (" (earlier backup file)" if self.backups.is_imported(path) else "")
+                  for when, path in reversed(snapshots)]
+        listbox = tk.Listbox(window, width=40, height=12, exportselection=False)
+        listbox.insert(tk.END, *labels)
+        listbox.selection_set(0)
+        listbox.pack(fill="both", expand=True, padx=10, pady=5)
+
+        def restore():
+            selection = listbox.curselection()
+            if selection:
+                window.destroy()
+                self.restore_snapshot(times[selection[0]])
+
+        ttk.Button(window, text="Restore", command=restore).pack(side="left", expand=True, fill="x", padx=10, pady=5)
+        ttk.Button(window, text="Cancel", command=window.destroy).pack(side="left", expand=True, fill="x", padx=10, pady=5)
+
+    def import_legacy_backup(self):
+        # The backup file of earlier versions becomes a snapshot from the time
+        # it was written, then the restore list is shown
+        if self.backup_running:
+            messagebox.showinfo("Restore", "A backup is running; try again when it has finished.")
+            return
+        self.backup_running = True
+
+        def work():
+            self.backups.import_csv(self.LEGACY_BACKUP)
+            os.replace(self.LEGACY_BACKUP, self.LEGACY_BACKUP + ".imported")
+
+        def done(_):
+            self.backup_running = False
+            self.choose_snapshot()
+
+        def failed(e):
+            self.backup_running = False
+            messagebox.showerror("Restore Error", f"Could not read the backup file {self.LEGACY_BACKUP}: {str(e)}")
+            self.choose_snapshot()
+
+        self.run_in_background(work, done, failed)
+
+    def restore_snapshot(self, when):
+        if self.backup_running:
+            messagebox.showinfo("Restore", "A backup is running; try again when it has finished.")
+            return
+        changed = self.changed_backup_months()
+        self.backup_running = True
+
+        def work():
+            # Back up unsaved changes first, so the restore itself can be undone
+            if changed:
+                self.backups.write_snapshot(changed)
+            return self.backups.restore_entries(at=when)
+
+        def done(restored):
+            self.backup_running = False
+            self.apply_store_changes()
+            old_entries = self.entries
+            self.store.replace_all(restored)
+            self.entries = self.store.entries
             messagebox.showinfo("Restore Success", "Data restored from backup successfully.")
-            self.load_entries()
-        except Exception as e:
+
+            # Only entries that differ from the backup touch the totals and the date index
+            removed = [entry for entry_id, entry in old_entries.items() if self.entries.get(entry_id) != entry]
+            added = [entry for entry_id, entry in self.entries.items() if old_entries.get(entry_id) != entry]
+            self.apply_entry_changes(removed, added)
+            self.queue_sync_changes(removed, added)
+            # Edits from before the restore no longer apply
+            self.undo_log.clear()
+            self.refresh_undo_menu()
+            if hasattr(self.store, "load_partitions"):
+                # Months that were not loaded were counted from the manifest
+                self.update_total_time()
+            self.refresh_total_time()
+            self.display_entries()
+
+        def failed(e):
+            self.backup_running = False
+            self.backup_months.update(changed)
             messagebox.showerror("Restore Error", f"An error occurred while restoring the backup: {str(e)}")
 
+        self.run_in_background(work, done, failed)
+
+    def verify_backups(self):
+        def done(problems):
+            if problems:
+                messagebox.showwarning("Verify Backups", "Damaged backups:\n" + "\n".join(problems[:10]))
+            else:
+                messagebox.showinfo("Verify Backups", f"All {len(self.backups.snapshots())} backups are intact.")
+
+        self.run_in_background(self.backups.verify, done,
+                               lambda e: messagebox.showerror("Verify Backups", f"Could not verify the backups: {str(e)}"))
+
+    def schedule_sync(self):
+        self.reminder_system.scheduler.cancel_named("sync")
+        self.reminder_system.scheduler.schedule(self.SYNC_INTERVAL, lambda: self.sync_now(quiet=True),
+                                                interval=self.SYNC_INTERVAL, name="sync")
+
+    def queue_sync_changes(self, removed, added):
+        # Changes made here are queued for the next sync; changes received
+        # from the sync server are not sent back
+        if not self.sync_state.enabled:
+            return
+        saved = {entry.id for entry in added}
+        self.sync_state.local_changes(added)
+        for entry in removed:
+            if entry.id not in saved:
+                self.sync_state.local_change(entry.id, day=entry.day)
+
+    def sync_now(self, quiet=False):
+        if self.loading:
+            self.pending_changes.append(lambda: self.sync_now(quiet))
+            return
+        if self.sync_running:
+            return
+        if not self.sync_state.enabled:
+            if quiet:
+                return
+            url = simpledialog.askstring("Sync", "Sync server address (http://host:port or unix:/path/to/socket):")
+            if not url:
+                return
+            if self.sync_state.device is None:
+                self.sync_state.load()
+            self.sync_state.configure(url.strip())
+            self.schedule_sync()
+        if not self.sync_state.seeded:
+            # Entries from before sync was set up are sent once
+            self.load_history()
+            self.sync_state.seed(self.entries.values())
+
+        self.sync_running = True
+        SyncClient = profile.import_module("sync_client").SyncClient
+        self.sync_round(SyncClient(self.sync_state.url), quiet, {"sent": 0, "received": 0},
+                        instruments.begin("sync"))
+
+    def sync_round(self, client, quiet, counts, measure):
+        # One request: a batch of local changes up, the next page of remote changes down
+        state = self.sync_state
+        sent = state.batch()
+        device, cursor = state.device, state.cursor
+
+        def work():
+            return client.exchange(device, cursor, sent)
+
+        def done(response):
+            # Remote changes are stored before the cursor moves past them
+            self.apply_remote_changes(response["changes"])
+            state.acknowledge(sent, response["cursor"])
+            counts["sent"] += len(sent)
+            counts["received"] += len(response["changes"])
+            if state.pending or response["more"]:
+                self.sync_round(client, quiet, counts, measure)
+                return
+            self.sync_running = False
+            instruments.end(measure, rows=counts["sent"] + counts["received"],
+                            bytes=client.bytes_sent + client.bytes_received)
+            if not quiet:
+                messagebox.showinfo("Sync", f"Sent {counts['sent']} and received {counts['received']} changes "
+                                            f"({(client.bytes_sent + client.bytes_received) / 1024:.1f} KiB).")
+
+        def failed(e):
+            self.sync_running = False
+            if not quiet:
+                messagebox.showerror("Sync Error", f"An error occurred while syncing: {str(e)}")
+
+        self.run_in_background(work, done, failed)
+
+    def apply_remote_changes(self, changes):
+        self.apply_store_changes()
+        # The last accepted change of every entry; saves are written in one batch
+        accepted = {}
+        # Entries this device has, or had, that are not loaded
+        unloaded = set()
+        for change in changes:
+            known = change["id"] in self.sync_state.versions
+            if self.sync_state.remote_change(change):
+                accepted[change["id"]] = change
+                if known and change["id"] not in self.entries:
+                    unloaded.add(change["id"])
+            # Otherwise this device already has the same or a later change
+        if unloaded and not self.loading and hasattr(self.store, "load_partitions"):
+            # An edit can move an entry out of a month that is not loaded; that
+            # month is loaded too, so the old row is replaced rather than kept
+            months = self.store.months_of(unloaded)
+            if months:
+                self.load_partitions(months)
+        removed = []
+        added = []
+        for change in accepted.values():
+            if change["day"] is not None:
+                self.load_history(change["day"], change["day"])
+            old_entry = self.entries.get(change["id"])
+            if change["row"] is not None:
+                added.append(TimeEntry.from_row(change["row"]))
+            elif old_entry is not None:
+                self.store.delete(old_entry.id)
+            else:
+                continue
+            if old_entry is not None:
+                removed.append(old_entry)
+        if added:
+            self.store.put_many(added)
+        if removed or added:
+            self.apply_entry_changes(removed, added)
+            self.display_entries()
+            self.refresh_total_time()
+
+    def import_entries(self):
+        if self.loading:
+            self.pending_changes.append(self.import_entries)
+            return
+        paths = filedialog.askopenfilenames(
+            title="Import Time Entries",
+            filetypes=[("Timesheets", "*.csv *.jsonl *.ndjson *.ics"), ("All files", "*")])
+        if paths:
+            self.import_files(list(paths))
+
+    def import_files(self, paths):
+        # Files are read and checked on a worker thread (and in a process pool
+        # when they are large); the new entries are saved in one batch
+        importer = profile.import_module("importer")
+
+        def work():
+            return importer.read_batch(paths)
+
+        def done(batch):
+            self.apply_store_changes()
+            days = batch.day_range()
+            if days is not None:
+                # Duplicates of older entries may be in months not loaded yet
+                self.load_history(*days)
+            batch.drop_existing(self.entries)
+            if batch.entries:
+                self.save_imported(batch.entries)
+            message = batch.summary()
+            if batch.rejected:
+                report_path = os.path.splitext(paths[0])[0] + "_rejected.csv"
+                try:
+                    importer.write_rejected(report_path, batch.rejected)
+                    message += f"\nThe rejected rows and the reasons are listed in {report_path}."
+                except OSError as e:
+                    message += f"\nThe rejected rows could not be listed: {str(e)}"
+            messagebox.showinfo("Import", message)
+
+        def failed(e):
+            messagebox.showerror("Import Error", f"An error occurred while importing: {str(e)}")
+
+        self.run_in_background(work, done, failed)
+
+    @instrumented("write.import")
+    def save_imported(self, entries):
+        written = getattr(self.store, "bytes_written", 0)
+        self.store.put_many(entries)
+        instruments.note(rows=len(entries), bytes=getattr(self.store, "bytes_written", 0) - written)
+        self.apply_entry_changes([], entries)
+        self.queue_sync_changes([], entries)
+        self.display_entries()
+        self.refresh_total_time()
+
+    def apply_store_changes(self):
+        # Saves and deletes made by other instances, or scripts, using the same
+        # files. Called before every change made here, so that the entry being
+        # replaced is the one the totals and indexes counted.
+        if self.loading or not hasattr(self.store, "poll_changes"):
+            return
+        removed, added = self.store.poll_changes()
+        if removed or added:
+            self.apply_entry_changes(removed, added)
+            self.display_entries()
+            self.refresh_total_time()
+
+    def run_in_background(self, work, on_done, on_error):
+        # Runs work() on a worker thread, then on_done(result) or on_error(exception) on the Tk thread
+        results = queue.Queue()
+
+        def run():
+            try:
+                results.put((on_done, work()))
+            except Exception as e:
+                results.put((on_error, e))
+
+        def poll():
+            try:
+                callback, value = results.get_nowait()
+            except queue.Empty:
+                self.root.after(50, poll)
+                return
+            callback(value)
+
+        threading.Thread(target=run, daemon=True).start()
+        self.root.after(50, poll)
+
+    @instrumented("aggregate.apply")
+    def apply_entry_changes(self, removed, added, modified=True):
+        # Brings the totals, the date index and the display order in line with
+        # a batch of changes that self.entries already reflects. An edited entry
+        # appears in both lists and keeps its place in the display order.
+        # Older history loaded from storage is not modified and needs no backup.
+        instruments.note(rows=len(removed) + len(added))
+        self.data_version += 1
+        if modified:
+            self.backup_months.update(month_of(entry) for entry in removed)
+            self.backup_months.update(month_of(entry) for entry in added)
+        for entry in removed:
+            self.total_time.remove(entry)
+        for entry in added:
+            self.total_time.add(entry)
+        self.date_index.apply(removed, added)
+        self.report_engine.apply(removed, added)
+        self.sorted_views.apply(removed, added, self.entries)
+        if self.search_index is not None:
+            self.search_index.apply(removed, added)
+        elif self.search_backlog is not None:
+            self.search_backlog.append((removed, added))
+
+        replaced = {entry.id for entry in removed}
+        gone = {entry_id for entry_id in replaced if entry_id not in self.entries}
+        if gone:
+            self.entry_order = [entry_id for entry_id in self.entry_order if entry_id not in gone]
+        self.entry_order.extend(entry.id for entry in added if entry.id not in replaced)
+
+    def load_history(self, start_day=None, end_day=None, project=None):
+        # With partitioned storage only recent months are loaded at startup;
+        # this loads the older ones that a filter, report or export reaches
+        if self.loading or not hasattr(self.store, "load_partitions"):
+            return []
+        months = self.store.unloaded_months(start_day, end_day, project)
+        return self.load_partitions(months) if months else []
+
+    @instrumented("load.history")
+    def load_partitions(self, months):
+        totals, added = self.store.load_partitions(months)
+        # The totals already counted these months from the manifest
+        self.total_time.remove_daily(totals)
+        self.apply_entry_changes([], added, modified=False)
+        # Keep the display order by month, older history first
+        entries = self.entries
+        self.entry_order.sort(key=lambda entry_id: entries[entry_id].date[:7])
+        instruments.note(rows=len(added))
+        return added
+
+    def load_older_history(self):
+        # Scrolling up past the first entry brings in the month before it
+        if self.loading or not hasattr(self.store, "load_partitions") or self.entries_view.ids is not self.entry_order:
+            return
+        loaded = self.store.loaded_months()
+        older = [month for month in self.store.unloaded_months() if not loaded or month < loaded[0]]
+        if older:
+            added = self.load_partitions(older[-1:])
+            self.entries_view.top += len(added)
+            self.display_entries()
+
     def create_widgets(self):
         # Project Name
         self.project_label = ttk.Label(self.root, text="Project Name:")
         self.project_label.grid(column=0, row=0, padx=5, pady=5, sticky="w")
         self.project_entry = ttk.Entry(self.root, width=30)
         self.project_entry.grid(column=1, row=0, padx=5, pady=5, sticky="ew")
+        # The timer button follows the project being entered
+        self.project_entry.bind("<KeyRelease>", lambda event: self.refresh_timer_display())
 
         # Date
         self.date_label = ttk.Label(self.root, text="Date (YYYY-MM-DD):")
         self.date_label.grid(column=0, row=1, padx=5, pady=5, sticky="w")
-        self.date_entry = DateEntry(self.root, width=30, background='darkblue',
-                foreground='white', borderwidth=2, year=datetime.now().year,
-                month=datetime.now().month, day=datetime.now().day, date_pattern='yyyy-mm-dd')
+        self.date_entry = self.create_date_entry()
         self.date_entry.grid(column=1, row=1, padx=5, pady=5, sticky="ew")
 
         # Start Time
@@ -227,20 +835,23 @@ class TimeEntryApp:
         self.filter_combobox.grid(column=1, row=7, padx=10, pady=5, sticky="ew")
         self.filter_combobox.bind("<<ComboboxSelected>>", self.filter_entries)
 
+        # Search Notes; runs as you type
+        self.search_label = ttk.Label(self.root, text="Search Notes:")
+        self.search_label.grid(column=0, row=8, padx=10, pady=5, sticky="w")
+        self.search_entry = ttk.Entry(self.root, width=30)
+        self.search_entry.grid(column=1, row=8, padx=10, pady=5, sticky="ew")
+        self.search_entry.bind("<KeyRelease>", self.schedule_search)
+
         # Start Date Filter
         self.start_date_filter_label = ttk.Label(self.root, text="Start Date (YYYY-MM-DD):")
         self.start_date_filter_label.grid(column=0, row=9, padx=10, pady=5, sticky="w")
-        self.start_date_filter_entry = DateEntry(self.root, width=30, background='darkblue',
-                    foreground='white', borderwidth=2, year=datetime.now().year,
-                    month=datetime.now().month, day=datetime.now().day, date_pattern='yyyy-mm-dd')
+        self.start_date_filter_entry = self.create_date_entry()
         self.start_date_filter_entry.grid(column=1, row=9, padx=10, pady=5, sticky="ew")
 
         # End Date Filter
         self.end_date_filter_label = ttk.Label(self.root, text="End Date (YYYY-MM-DD):")
         self.end_date_filter_label.grid(column=0, row=10, padx=10, pady=5, sticky="w")
-        self.end_date_filter_entry = DateEntry(self.root, width=30, background='darkblue',
-                    foreground='white', borderwidth=2, year=datetime.now().year,
-                    month=datetime.now().month, day=datetime.now().day, date_pattern='yyyy-mm-dd')
+        self.end_date_filter_entry = self.create_date_entry()
         self.end_date_filter_entry.grid(column=1, row=10, padx=10, pady=5, sticky="ew")
 
         self.filter_date_range_button = ttk.Button(self.root, text="Filter by Date Range", command=self.filter_entries_by_date_range)
@@ -250,9 +861,10 @@ class TimeEntryApp:
         self.entries_frame = ttk.LabelFrame(self.root, text="Entries")
         self.entries_frame.grid(column=0, row=11, columnspan=2, padx=10, pady=10, sticky="nsew")
         
-        self.entries_listbox = tk.Listbox(self.entries_frame, height=10, width=60, bg="#3e3e3e", fg="white")
-        self.entries_listbox.pack(padx=10, pady=11, fill="both", expand=True)
-        self.entries_listbox.bind('<<ListboxSelect>>', self.on_select)
+        # Only the rows in view are formatted and inserted into the listbox
+        self.entries_view = VirtualListbox(self.entries_frame, self.format_entry, on_select=self.on_select,
+                                           on_top=self.load_older_history, height=10, width=60, bg="#3e3e3e", fg="white")
+        self.entries_view.pack(padx=10, pady=11, fill="both", expand=True)
 
         # Edit and Delete Buttons
         self.edit_button = ttk.Button(self.root, text="Save Edit", command=self.edit_entry, state='enabled')
@@ -267,15 +879,13 @@ class TimeEntryApp:
         self.total_time_text = tk.Text(self.root, height=5, width=60, state='disabled', bg="#3e3e3e", fg="white")
         self.total_time_text.grid(column=0, row=13, columnspan=2, padx=10, pady=5, sticky="nsew")
 
-        # Sorting Buttons
-        self.sort_project_button = ttk.Button(self.root, text="Sort by Project", command=lambda: self.sort_entries("project"))
-        self.sort_project_button.grid(column=0, row=14, padx=10, pady=5, sticky="ew")
-
-        self.sort_date_button = ttk.Button(self.root, text="Sort by Date", command=lambda: self.sort_entries("date"))
-        self.sort_date_button.grid(column=1, row=14, padx=10, pady=5, sticky="ew")
-
-        self.sort_total_time_button = ttk.Button(self.root, text="Sort by Total Time", command=lambda: self.sort_entries("total_time"))
-        self.sort_total_time_button.grid(column=0, row=15, columnspan=2, padx=10, pady=5, sticky="ew")
+        # Sorting Buttons; Shift+click adds a field to the current order
+        self.sort_buttons = {}
+        for field, column, row in (("project", 0, 14), ("date", 1, 14), ("total_time", 0, 15), ("duration", 1, 15)):
+            button = ttk.Button(self.root, text=self.SORT_LABELS[field], command=lambda field=field: self.sort_entries(field))
+            button.bind("<Shift-Button-1>", lambda event, field=field: self.sort_entries(field, then=True) or "break")
+            button.grid(column=column, row=row, padx=10, pady=5, sticky="ew")
+            self.sort_buttons[field] = button
 
         # Report Generation
         self.report_label = ttk.Label(self.root, text="Generate Report:")
@@ -283,24 +893,35 @@ class TimeEntryApp:
         
         self.start_date_label = ttk.Label(self.root, text="Start Date (YYYY-MM-DD):")
         self.start_date_label.grid(column=0, row=17, padx=10, pady=5, sticky="w")
-        self.start_date_entry = DateEntry(self.root, width=30, background='darkblue',
-                    foreground='white', borderwidth=2, year=datetime.now().year,
-                    month=datetime.now().month, day=datetime.now().day, date_pattern='yyyy-mm-dd')
+        self.start_date_entry = self.create_date_entry()
         self.start_date_entry.grid(column=1, row=17, padx=10, pady=5, sticky="ew")
 
         self.end_date_label = ttk.Label(self.root, text="End Date (YYYY-MM-DD):")
         self.end_date_label.grid(column=0, row=18, padx=10, pady=5, sticky="w")
-        self.end_date_entry = DateEntry(self.root, width=30, background='darkblue',
-                    foreground='white', borderwidth=2, year=datetime.now().year,
-                    month=datetime.now().month, day=datetime.now().day, date_pattern='yyyy-mm-dd')
+        self.end_date_entry = self.create_date_entry()
         self.end_date_entry.grid(column=1, row=18, padx=10, pady=5, sticky="ew")
 
+        self.period_label = ttk.Label(self.root, text="Group By:")
+        self.period_label.grid(column=0, row=19, padx=10, pady=5, sticky="w")
+        self.period_combobox = ttk.Combobox(self.root, values=self.PERIOD_NAMES, state="readonly")
+        self.period_combobox.grid(column=1, row=19, padx=10, pady=5, sticky="ew")
+        self.period_combobox.current(0)
+
         self.report_button = ttk.Button(self.root, text="Generate Report", command=self.generate_report)
-        self.report_button.grid(column=0, row=19, columnspan=2, padx=10, pady=5, sticky="ew")
+        self.report_button.grid(column=0, row=20, columnspan=2, padx=10, pady=5, sticky="ew")
 
-        # Export to PDF Button
+        # Export to PDF Button; the whole history unless "All dates" is cleared,
+        # as the date fields always hold a date
+        self.export_all_dates = tk.BooleanVar(value=True)
+        self.export_all_dates_check = ttk.Checkbutton(self.root, text="All dates", variable=self.export_all_dates)
+        self.export_all_dates_check.grid(column=0, row=21, padx=10, pady=5, sticky="w")
         self.export_button = ttk.Button(self.root, text="Export to PDF", command=self.export_to_pdf)
-        self.export_button.grid(column=0, row=20, columnspan=2, padx=10, pady=5, sticky="ew")
+        self.export_button.grid(column=1, row=21, padx=10, pady=5, sticky="ew")
+
+        # Progress of loading the entries file, hidden once it is loaded
+        self.loading_progress = ttk.Progressbar(self.root, mode="determinate", maximum=100)
+        self.loading_progress.grid(column=0, row=22, columnspan=2, padx=10, pady=5, sticky="ew")
+        self.loading_progress.grid_remove()
         
     
     def create_time_picker(self, parent):
@@ -325,38 +946,48 @@ class TimeEntryApp:
         return frame
     
     def update_time_entry(self, event):
-        if self.selected_entry_index is not None:
+        entry_id = self.entries_view.selected_id
+        if entry_id is not None:
             # Get the updated time values from the time pickers
             start_time = self.get_time_from_picker(self.start_time_entry)
             end_time = self.get_time_from_picker(self.end_time_entry)
 
-            # Update the corresponding entry in the list
-            self.entries[self.selected_entry_index][2] = start_time
-            self.entries[self.selected_entry_index][3] = end_time
-
-            # Update the listbox display (you might need to adjust the formatting)
-            self.entries_listbox.delete(self.selected_entry_index)
-            self.entries_listbox.insert(self.selected_entry_index,
-                                        f"Project: {self.entries[self.selected_entry_index][0]}, "
-                                        f"Date: {self.entries[self.selected_entry_index][1]}, "
-                                        f"Start Time: {start_time}, "
-                                        f"End Time: {end_time}, "
-                                        f"Note: {self.entries[self.selected_entry_index][4]}")
+            # Preview the change in the list; it is stored on "Save Edit"
+            entry = self.entries[entry_id]
+            self.entries_view.preview(entry_id,
+                                      f"Project: {entry.project}, "
+                                      f"Date: {entry.date}, "
+                                      f"Start Time: {start_time}, "
+                                      f"End Time: {end_time}, "
+                                      f"Note: {entry.note}")
 
     def get_time_from_picker(self, frame):
         hours, minutes, seconds = frame.winfo_children()
         return f"{hours.get()}:{minutes.get()}:{seconds.get()}"
     
+    @instrumented("aggregate.rebuild")
     def update_total_time(self):
-        self.total_time.clear()
-        for entry in self.entries:
-            start_time = datetime.strptime(f"{entry[1]} {entry[2]}", "%Y-%m-%d %H:%M:%S")
-            end_time = datetime.strptime(f"{entry[1]} {entry[3]}", "%Y-%m-%d %H:%M:%S")
-            self.total_time[entry[0]] += (end_time - start_time)
+        # Full recompute, only needed when the whole entry set is replaced
+        if hasattr(self.store, "daily_totals"):
+            self.total_time.load_daily(self.store.daily_totals())
+        else:
+            self.total_time.rebuild(self.entries.values())
+        instruments.note(rows=len(self.entries))
+        self.display_total_time()
+
+    def refresh_total_time(self):
+        # Totals of older, unloaded history cannot be checked against the entries
+        if self.total_time.check_mode and not (hasattr(self.store, "load_partitions") and self.store.unloaded_months()):
+            mismatches = self.total_time.check(self.entries.values())
+            if mismatches:
+                details = "\n".join(f"{name}: {incremental}s incremental, {recomputed}s recomputed"
+                                    for name, incremental, recomputed in mismatches[:10])
+                messagebox.showwarning("Totals Check", f"Project totals were out of sync:\n{details}")
+                self.total_time.rebuild(self.entries.values())
         self.display_total_time()
 
     def configure_grid(self):
-        for i in range(21):
+        for i in range(23):
             self.root.rowconfigure(i, weight=1)
         self.root.columnconfigure(0, weight=1)
         self.root.columnconfigure(1, weight=1)
@@ -373,57 +1004,198 @@ class TimeEntryApp:
             return
 
         try:
-            datetime.strptime(date, "%Y-%m-%d")
-            start_time_obj = datetime.strptime(start_time, "%H:%M:%S")
-            end_time_obj = datetime.strptime(end_time, "%H:%M:%S")
+            new_entry = TimeEntry.parse(project, date, start_time, end_time, note)
         except ValueError:
             messagebox.showerror("Input Error", "Invalid date or time format. Use YYYY-MM-DD for date and HH:MM:SS for time.")
             return
 
-        if end_time_obj <= start_time_obj:
+        if new_entry.end <= new_entry.start:
             messagebox.showerror("Input Error", "End time must be after start time.")
             return
 
-        new_entry = [project, date, start_time, end_time, note]
-
-        if self.selected_entry_index is None:
-            self.entries.append(new_entry)
+        entry_id = self.entries_view.selected_id
+        if self.loading:
+            self.pending_changes.append(lambda: self.commit_entry(new_entry, entry_id))
         else:
-            self.entries[self.selected_entry_index] = new_entry
-            self.selected_entry_index = None
-
-        self.write_entries()
-        self.load_entries()
-        self.update_total_time()
+            self.commit_entry(new_entry, entry_id)
+        self.entries_view.clear_selection()
         self.clear_fields()
 
+    @instrumented("write.put")
+    def commit_entry(self, new_entry, entry_id=None, record=True):
+        # Only the changed entry is appended to the journal. Undo and redo
+        # come through here too, with record=False.
+        self.apply_store_changes()
+        self.load_history(new_entry.day, new_entry.day)
+        old_entry = self.entries.get(entry_id)
+        if old_entry is not None:
+            new_entry.id = entry_id
+        written = getattr(self.store, "bytes_written", 0)
+        self.store.put(new_entry)
+        instruments.note(rows=1, bytes=getattr(self.store, "bytes_written", 0) - written)
+        self.apply_entry_changes([old_entry] if old_entry is not None else [], [new_entry])
+        self.queue_sync_changes([], [new_entry])
+        if record:
+            self.undo_log.record("Edit" if old_entry is not None else "Add", [(old_entry, new_entry)])
+            self.refresh_undo_menu()
+
+        self.display_entries()
+        self.refresh_total_time()
+
     def load_entries(self):
-        self.entries_listbox.delete(0, tk.END)
-        self.total_time.clear()
-        self.update_project_filter()
-        self.update_total_time()
-        self.entries = []
-        
+        self.loading = True
+        # Measured from here until finish_loading()
+        self.load_measure = instruments.begin("load")
+        self.load_bytes = getattr(self.store, "bytes_read", 0)
+        self.entries = {}
+        self.entry_order = []
+        self.total_time.rebuild([])
+        self.date_index.rebuild([])
+        self.report_engine.rebuild([])
+        self.sorted_views.clear()
+        self.search_index = None
+        self.search_backlog = None
+        self.loading_progress["value"] = 0
+        self.loading_progress.grid()
+        threading.Thread(target=self.load_worker, daemon=True).start()
+        self.root.after(50, self.poll_loading)
+
+    def load_worker(self):
+        # Runs on the worker thread; only talks to the UI through load_queue
         try:
-            with open("time_entries.csv", "r") as file:
-                reader = csv.reader(file)
-                self.entries = list(reader)
-        except FileNotFoundError:
-            pass
-
-        for entry in self.entries:
-            self.entries_listbox.insert(tk.END, f"Project: {entry[0]}, Date: {entry[1]}, Start Time: {entry[2]}, End Time: {entry[3]}, Note: {entry[4]}")
-            start_time = datetime.strptime(f"{entry[1]} {entry[2]}", "%Y-%m-%d %H:%M:%S")
-            end_time = datetime.strptime(f"{entry[1]} {entry[3]}", "%Y-%m-%d %H:%M:%S")
-            self.total_time[entry[0]] += (end_time - start_time)
-
+            for chunk in self.store.load_chunks():
+                self.load_queue.put(("chunk", chunk))
+            self.load_queue.put(("done", None))
+        except Exception as e:
+            self.load_queue.put(("error", e))
+
+    def poll_loading(self):
+        # Apply parsed chunks for at most ~30 ms per tick to keep the UI responsive
+        deadline = time.perf_counter() + 0.03
+        changed = False
+        while time.perf_counter() < deadline:
+            try:
+                kind, payload = self.load_queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "chunk":
+                removed, added, progress = payload
+                for entry in removed:
+                    self.entries.pop(entry.id, None)
+                for entry in added:
+                    self.entries[entry.id] = entry
+                self.apply_entry_changes(removed, added)
+                self.loading_progress["value"] = progress * 100
+                self.entries_frame.config(text=f"Entries (loading {progress:.0%})")
+                changed = True
+            else:
+                if kind == "error":
+                    messagebox.showerror("Load Error", f"An error occurred while loading entries: {str(payload)}")
+                self.finish_loading()
+                return
+
+        if changed:
+            self.display_entries()
+            self.display_total_time()
+        self.root.after(50, self.poll_loading)
+
+    def finish_loading(self):
+        self.loading = False
+        # Same entries as the ones handed over in chunks; from now on the store's dictionary is used
+        self.entries = self.store.entries
+        if hasattr(self.store, "load_partitions"):
+            # Totals cover older history too, from the partition manifest
+            self.total_time.load_daily(self.store.daily_totals())
+            if not self.backups.own_snapshots():
+                # The first backup has to include the months not loaded
+                self.backup_months.update(self.store.unloaded_months())
+        instruments.end(self.load_measure, rows=len(self.entries),
+                        bytes=getattr(self.store, "bytes_read", 0) - self.load_bytes)
+        self.loading_progress.grid_remove()
+        self.entries_frame.config(text="Entries")
+        profile.mark("entries loaded")
+        self.display_entries()
+        self.refresh_total_time()
+        self.build_search_index()
+
+        pending, self.pending_changes = self.pending_changes, []
+        for change in pending:
+            change()
+
+    def build_search_index(self):
+        # Tokenizing every note takes a while with a large history, so it is
+        # done off the Tk thread; entries are not modified once stored
+        self.search_backlog = []
+        backlog = self.search_backlog
+        entries = list(self.entries.values())
+
+        def work():
+            index = SearchIndex()
+            index.rebuild(entries)
+            return index
+
+        def done(index):
+            # A search may have built the index meanwhile, or the entries been reloaded
+            if self.search_index is not None or self.search_backlog is not backlog:
+                return
+            for removed, added in backlog:
+                index.apply(removed, added)
+            self.search_index = index
+            self.search_backlog = None
+
+        self.run_in_background(work, done, lambda e: None)
+
+    def ensure_search_index(self):
+        if self.search_index is None:
+            index = SearchIndex()
+            index.rebuild(self.entries.values())
+            self.search_index = index
+            self.search_backlog = None
+        return self.search_index
+
+    def display_entries(self):
         self.update_project_filter()
-        self.display_total_time()
+        if self.loading:
+            # The filters apply once everything is loaded
+            self.show_entries()
+        else:
+            self.show_filtered()
+
+    def show_filtered(self):
+        # Lists the entries within the filter and search in effect
+        if self.search_entry.get().strip() or self.date_filter is not None:
+            self.search_entries()
+        elif self.filter_combobox.get() not in ("", "All"):
+            self.filter_entries(None)
+        else:
+            self.show_entries()
+
+    def show_entries(self, ids=None):
+        # Lists ``ids`` (every entry if None) in the sort order chosen, or
+        # as given when there is none
+        if self.sort_order is None:
+            self.entries_view.set_ids(self.entry_order if ids is None else ids)
+            return
+        view = self.sorted_views.view(self.sort_order, self.entries)
+        totals = self.total_time.seconds
+        if ids is None:
+            self.entries_view.set_ids(view.ordered(self.entries, totals))
+        else:
+            self.entries_view.set_ids(view.arrange(ids, self.entries, totals))
 
+    def format_entry(self, entry_id):
+        entry = self.entries[entry_id]
+        return f"Project: {entry.project}, Date: {entry.date}, Start Time: {entry.start_time}, End Time: {entry.end_time}, Note: {entry.note}"
+
+    @instrumented("write.compact")
     def write_entries(self):
-        with open("time_entries.csv", "w", newline="") as file:
-            writer = csv.writer(file)
-            writer.writerows(self.entries)
+        if self.loading:
+            self.pending_changes.append(self.write_entries)
+            return
+        # Fold the journal into a fresh time_entries.csv
+        written = getattr(self.store, "bytes_written", 0)
+        self.store.compact(background=False)
+        instruments.note(rows=len(self.entries), bytes=getattr(self.store, "bytes_written", 0) - written)
 
     def clear_fields(self):
         self.project_entry.delete(0, tk.END)
@@ -437,28 +1209,28 @@ class TimeEntryApp:
         self.note_entry.delete("1.0", tk.END)
         self.edit_button.config(state='disabled')
         self.delete_button.config(state='disabled')
+        self.refresh_timer_display()
 
-    def on_select(self, event=None):  # Allow the method to be called without an event
-        selection = self.entries_listbox.curselection()
-        if selection:
-            self.selected_entry_index = selection[0]
-            entry = self.entries[self.selected_entry_index]
+    def on_select(self):
+        entry_id = self.entries_view.selected_id
+        if entry_id is not None:
+            entry = self.entries[entry_id]
 
             # Update input fields only if they are empty or the date is different
-            if not self.project_entry.get() or self.date_entry.get() != entry[1]:
+            if not self.project_entry.get() or self.date_entry.get() != entry.date:
                 self.project_entry.delete(0, tk.END)
-                self.project_entry.insert(0, entry[0])
-                self.date_entry.set_date(entry[1])
-                self.set_time_picker(self.start_time_entry, entry[2])
-                self.set_time_picker(self.end_time_entry, entry[3])
+                self.project_entry.insert(0, entry.project)
+                self.date_entry.set_date(entry.date)
+                self.set_time_picker(self.start_time_entry, entry.start_time)
+                self.set_time_picker(self.end_time_entry, entry.end_time)
                 self.note_entry.delete("1.0", tk.END)
-                self.note_entry.insert("1.0", entry[4])
+                self.note_entry.insert("1.0", entry.note)
 
             self.edit_button.config(state='normal')
             self.delete_button.config(state='normal')
+            self.refresh_timer_display()
         else:
-            self.selected_entry_index = None
-            self.clear_fields() 
+            self.clear_fields()
 
     def set_time_picker(self, frame, time_str):
         hours, minutes, seconds = time_str.split(':')
@@ -470,12 +1242,71 @@ class TimeEntryApp:
         self.save_entry()
 
     def delete_entry(self):
-        if self.selected_entry_index is not None:
-            del self.entries[self.selected_entry_index]
-            self.write_entries()
-            self.load_entries()
-            self.update_total_time()
-            self.clear_fields()
+        entry_id = self.entries_view.selected_id
+        if entry_id is None:
+            return
+        if self.loading:
+            self.pending_changes.append(lambda: self.remove_entry(entry_id))
+        else:
+            self.remove_entry(entry_id)
+        self.entries_view.clear_selection()
+        self.clear_fields()
+
+    @instrumented("write.delete")
+    def remove_entry(self, entry_id, record=True):
+        self.apply_store_changes()
+        if entry_id in self.entries:
+            entry = self.entries[entry_id]
+            written = getattr(self.store, "bytes_written", 0)
+            self.store.delete(entry_id)
+            instruments.note(rows=1, bytes=getattr(self.store, "bytes_written", 0) - written)
+            self.apply_entry_changes([entry], [])
+            self.queue_sync_changes([entry], [])
+            if record:
+                self.undo_log.record("Delete", [(entry, None)])
+                self.refresh_undo_menu()
+            self.display_entries()
+            self.refresh_total_time()
+
+    def undo(self):
+        if self.loading:
+            self.pending_changes.append(self.undo)
+            return
+        self.apply_undo_step(self.undo_log.undo())
+
+    def redo(self):
+        if self.loading:
+            self.pending_changes.append(self.redo)
+            return
+        self.apply_undo_step(self.undo_log.redo())
+
+    def apply_undo_step(self, step):
+        # Writes the entries back one by one, like the saves and deletes they reverse
+        if step is None:
+            return
+        _, changes = step
+        for entry_id, current, target in changes:
+            if current is not None:
+                # With partitioned storage the entry's month may not be loaded;
+                # it has to be, so the entry is replaced or removed there rather
+                # than kept next to a copy in the target's month
+                day = TimeEntry.from_row(current).day
+                self.load_history(day, day)
+            if target is not None:
+                self.commit_entry(TimeEntry.from_row(target), entry_id, record=False)
+            elif current is not None:
+                self.remove_entry(entry_id, record=False)
+        self.entries_view.clear_selection()
+        self.clear_fields()
+        self.refresh_undo_menu()
+
+    def refresh_undo_menu(self):
+        undo_label = self.undo_log.undo_label()
+        redo_label = self.undo_log.redo_label()
+        self.edit_menu.entryconfig(0, label=f"Undo {undo_label}" if undo_label else "Undo",
+                                   state="normal" if undo_label else "disabled")
+        self.edit_menu.entryconfig(1, label=f"Redo {redo_label}" if redo_label else "Redo",
+                                   state="normal" if redo_label else "disabled")
 
     def display_total_time(self):
         self.total_time_text.config(state='normal')
@@ -487,48 +1318,123 @@ class TimeEntryApp:
         self.total_time_text.config(state='disabled')
 
     def update_project_filter(self):
-        projects = sorted(set(entry[0] for entry in self.entries))
+        projects = sorted(self.total_time.keys())
         self.filter_combobox['values'] = ["All"] + projects
-        self.filter_combobox.set("All")
-
+        # Keep the project filtered by while it has entries; once it has none,
+        # the date filter is cleared along with it
+        selected = self.filter_combobox.get()
+        if not selected or (selected != "All" and selected not in projects and not self.loading):
+            self.filter_combobox.set("All")
+            self.date_filter = None
+
+    @instrumented("filter.project")
     def filter_entries(self, event):
+        self.date_filter = None
+        if self.search_entry.get().strip():
+            self.search_entries()
+            return
         filter_value = self.filter_combobox.get()
-        self.entries_listbox.delete(0, tk.END)
-        for entry in self.entries:
-            if filter_value == "All" or entry[0] == filter_value:
-                self.entries_listbox.insert(tk.END, f"Project: {entry[0]}, Date: {entry[1]}, Start Time: {entry[2]}, End Time: {entry[3]}")
+        if filter_value != "All":
+            self.load_history(project=filter_value)
+        if filter_value == "All":
+            self.show_entries()
+        elif hasattr(self.store, "filter_ids"):
+            self.show_entries(self.store.filter_ids(project=filter_value))
+        else:
+            entries = self.entries
+            self.show_entries([entry_id for entry_id in self.entry_order if entries[entry_id].project == filter_value])
+        instruments.note(rows=len(self.entries_view.ids))
 
+    @instrumented("filter.dates")
     def filter_entries_by_date_range(self):
         start_date = self.start_date_filter_entry.get().strip()
         end_date = self.end_date_filter_entry.get().strip()
 
         try:
-            start_date_obj = datetime.strptime(start_date, "%Y-%m-%d")
-            end_date_obj = datetime.strptime(end_date, "%Y-%m-%d")
+            start_day = parse_day(start_date)
+            end_day = parse_day(end_date)
         except ValueError:
             messagebox.showerror("Input Error", "Invalid date format. Use YYYY-MM-DD.")
             return
 
-        if end_date_obj < start_date_obj:
+        if end_day < start_day:
             messagebox.showerror("Input Error", "End date must be after start date.")
             return
 
-        self.entries_listbox.delete(0, tk.END)
-        for entry in self.entries:
-            entry_date = datetime.strptime(entry[1], "%Y-%m-%d")
-            if start_date_obj <= entry_date <= end_date_obj:
-                self.entries_listbox.insert(tk.END, f"Project: {entry[0]}, Date: {entry[1]}, Start Time: {entry[2]}, End Time: {entry[3]}, Note: {entry[4]}")
-
-    def sort_entries(self, criterion):
-        if criterion == "project":
-            self.entries.sort(key=lambda x: x[0])
-        elif criterion == "date":
-            self.entries.sort(key=lambda x: x[1])
-        elif criterion == "total_time":
-            self.entries.sort(key=lambda x: self.total_time[x[0]], reverse=True)
-
-        self.load_entries()
+        self.date_filter = (start_day, end_day)
+        if self.search_entry.get().strip():
+            self.search_entries()
+            return
+        self.load_history(start_day, end_day)
+        self.show_entries(self.date_index.range(start_day, end_day))
+        instruments.note(rows=len(self.entries_view.ids))
+
+    def schedule_search(self, event=None):
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+        self.search_job = self.root.after(self.SEARCH_DELAY, self.search_entries)
+
+    @instrumented("filter.search")
+    def search_entries(self):
+        # Notes and project names matching the search box, within the project
+        # selected in the filter and the date range last filtered by
+        self.search_job = None
+        if self.loading:
+            self.pending_changes.append(self.search_entries)
+            return
+        query = self.search_entry.get().strip()
+        if not query:
+            if self.date_filter is not None:
+                self.show_entries(self.date_index.range(*self.date_filter))
+            else:
+                self.filter_entries(None)
+            return
 
+        project = self.filter_combobox.get()
+        project = None if project in ("", "All") else project
+        start_day, end_day = self.date_filter or (None, None)
+        self.load_history(start_day, end_day, project)
+        entries = self.entries
+        matches = self.ensure_search_index().search(query, entries)
+        if project is not None:
+            matches = [entry_id for entry_id in matches if entries[entry_id].project == project]
+        if start_day is not None:
+            matches = [entry_id for entry_id in matches if start_day <= entries[entry_id].day <= end_day]
+        if self.sort_order is None:
+            matches.sort(key=lambda entry_id: entries[entry_id].start)
+        self.show_entries(matches)
+        instruments.note(rows=len(matches))
+
+    @instrumented("sort")
+    def sort_entries(self, criterion, then=False):
+        # A click sorts by one field, or turns it around when the entries are
+        # sorted by it already; with ``then`` (Shift+click) the field breaks
+        # ties in the current order instead. Total time can only come first.
+        order = list(self.sort_order or ())
+        fields = [field for field, _ in order]
+        if criterion in fields and (then or fields[0] == criterion):
+            position = fields.index(criterion)
+            order[position] = (criterion, not order[position][1])
+        elif then and order and criterion != "total_time":
+            order.append((criterion, SORT_FIELDS[criterion]))
+        else:
+            order = [(criterion, SORT_FIELDS[criterion])]
+        self.sort_order = tuple(order)
+        self.update_sort_buttons()
+
+        # The sorted view is kept up to date, so this only lists it again,
+        # within the filter and search in effect
+        self.show_filtered()
+        instruments.note(rows=len(self.entries_view.ids))
+
+    def update_sort_buttons(self):
+        # Arrows on the buttons of the fields sorted by
+        directions = dict(self.sort_order or ())
+        for field, button in self.sort_buttons.items():
+            arrow = "" if field not in directions else " \u25bc" if directions[field] else " \u25b2"
+            button.config(text=self.SORT_LABELS[field] + arrow)
+
+    @instrumented("report.generate")
     def generate_report(self):
         """Generates a time report based on user input."""
         
@@ -539,108 +1445,213 @@ class TimeEntryApp:
 
         # Validate the date format.
         try:
-            start_date_obj = datetime.strptime(start_date, "%Y-%m-%d")
-            end_date_obj = datetime.strptime(end_date, "%Y-%m-%d")
+            start_day = parse_day(start_date)
+            end_day = parse_day(end_date)
         except ValueError:
             messagebox.showerror("Input Error", "Invalid date format. Use YYYY-MM-DD.")
             return
 
         # Validate that the end date is after the start date.
-        if end_date_obj < start_date_obj:
+        if end_day < start_day:
             messagebox.showerror("Input Error", "End date must be after start date.")
             return
 
-        # Filter the time entries based on the selected date range and project.
-        filtered_entries = [entry for entry in self.entries if start_date <= entry[1] <= end_date and (filter_project == "All" or entry[0] == filter_project)]
-        
-        # Calculate the total time spent on each project.
-        total_time = defaultdict(timedelta)
-        for entry in filtered_entries:
-            start_time = datetime.strptime(f"{entry[1]} {entry[2]}", "%Y-%m-%d %H:%M:%S")
-            end_time = datetime.strptime(f"{entry[1]} {entry[3]}", "%Y-%m-%d %H:%M:%S")
-            total_time[entry[0]] += (end_time - start_time)
-
-        # Format the report text.
-        report_text = ""
-        for project, time in total_time.items():
-            hours, remainder = divmod(time.total_seconds(), 3600)
-            minutes, _ = divmod(remainder, 60)
-            report_text += f"Project: {project}, Total Time: {int(hours)}h {int(minutes)}m\n"
-        
-        # Display the report in a message box.
-        messagebox.showinfo("Report", report_text)
-
-    def export_to_pdf(self):
-        # Generate the pie chart
-        labels = list(self.total_time.keys())
-        values = [total_time.total_seconds() / 3600 for total_time in self.total_time.values()]
-        # Convert to hours
-        
-        fig, ax = plt.subplots(figsize=(6, 6))
-        ax.pie(values, labels=labels, autopct='%1.1f%%')
-        ax.axis('equal')  # Ensure the pie chart is circular
-        ax.set_title('Time Spent on Projects')
-
-        # Save the chart as a temporary PNG file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as temp_file:
-            temp_file_path = temp_file.name
-            plt.savefig(temp_file_path, format='png')
-
-        # Create the PDF
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Courier", size=12)
-        
-        # Add the chart image to the PDF
-        pdf.image(temp_file_path, x=10, y=10, w=180)
+        project = None if filter_project == "All" else filter_project
+        period = PERIODS[self.period_combobox.current()]
+
+        # Calculate the total time spent on each project in the date range,
+        # broken down by day, week or month when one is selected.
+        breakdown = self.report(start_day, end_day, period, project)
+        self.show_report("Report", format_report(breakdown))
+
+    def show_report(self, title, text):
+        # A scrollable window rather than a message box, as breakdowns can be long
+        window = tk.Toplevel(self.root)
+        window.title(title)
+        text_widget = tk.Text(window, width=60, height=20, wrap="none")
+        scrollbar = ttk.Scrollbar(window, orient="vertical", command=text_widget.yview)
+        text_widget.config(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        text_widget.pack(side="left", fill="both", expand=True)
+        text_widget.insert("1.0", text)
+        text_widget.config(state="disabled")
+
+    @instrumented("report.query")
+    def report(self, start_day, end_day, period=None, project=None):
+        """Returns a (cached) Breakdown of the time per project between two day numbers."""
+        if period is not None or not hasattr(self.store, "report"):
+            self.load_history(start_day, end_day, project)
+        key = ("report", start_day, end_day, period, project, self.data_version)
+        breakdown = self.report_cache.get(key)
+        if breakdown is not None:
+            return breakdown
+
+        if period is None and hasattr(self.store, "report"):
+            # Indexed aggregate query in the database
+            totals = self.store.report(start_day, end_day, project)
+            breakdown = Breakdown(None, ["total"], {name: [seconds] for name, seconds in totals.items()})
+        else:
+            breakdown = self.report_engine.breakdown(start_day, end_day, period, project)
+        return self.report_cache.put(key, breakdown, breakdown_size(breakdown))
 
-        # Add the rest of the report content
-        pdf.set_xy(10, 180)  # Set the cursor position below the chart
-        pdf.cell(200, 10, txt="Project Time Entries", ln=True, align="C")
+    def show_cache_stats(self):
+        stats = self.report_cache.stats()
+        messagebox.showinfo("Report Cache",
+                            f"Hits: {stats['hits']}\nMisses: {stats['misses']}\n"
+                            f"Cached results: {stats['items']} ({stats['bytes'] / 1024:.1f} KiB)\n"
+                            f"Data version: {self.data_version}")
 
-        pdf.cell(200, 10, txt="Entries:", ln=True, align="L")
-        for entry in self.entries:
-            pdf.cell(200, 10, txt=f"Project: {entry[0]}, Date: {entry[1]}, Start Time: {entry[2]}, End Time: {entry[3]}", ln=True)
+    def report_totals(self, start_day, end_day, project=None):
+        """Returns the seconds spent per project between two day numbers."""
+        return self.report(start_day, end_day, None, project).totals()
 
-        pdf.cell(200, 10, txt="Total Time Spent on Projects:", ln=True, align="L")
-        for project, total_time in self.total_time.items():
-            hours, remainder = divmod(total_time.total_seconds(), 3600)
-            minutes, _ = divmod(remainder, 60)
-            pdf.cell(200, 10, txt=f"Project: {entry[0]}, Date: {entry[1]}, Start Time: {entry[2]}, End Time: {entry[3]}, Note: {entry[4]}", ln=True)
+    def export_to_pdf(self):
+        if self.loading:
+            self.pending_changes.append(self.export_to_pdf)
+            return
+        if self.export is not None:
+            return
 
-        # Remove the temporary file
-        os.remove(temp_file_path)
-        
-        pdf.output("project_time_entries.pdf")
-        messagebox.showinfo("Export Success", "Entries exported to project_time_entries.pdf successfully!")
+        # Export the project of the filter, over the range of the report
+        # fields once "All dates" is cleared
+        filter_project = self.filter_combobox.get()
+        project = None if filter_project in ("", "All") else filter_project
+        if not self.export_all_dates.get():
+            try:
+                start_day = parse_day(self.start_date_entry.get().strip())
+                end_day = parse_day(self.end_date_entry.get().strip())
+            except ValueError:
+                messagebox.showerror("Input Error", "Invalid date format. Use YYYY-MM-DD.")
+                return
+            if end_day < start_day:
+                messagebox.showerror("Input Error", "End date must be after start date.")
+                return
+            self.load_history(start_day, end_day, project)
+        else:
+            self.load_history(project=project)
+            if self.date_index.starts:
+                start_day = self.date_index.starts[0] // SECONDS_PER_DAY
+                end_day = self.date_index.starts[-1] // SECONDS_PER_DAY
+            else:
+                start_day = end_day = 0
+
+        # The worker gets its own list of the (immutable) entry records
+        entries = [self.entries[entry_id] for entry_id in self.date_index.range(start_day, end_day)]
+        if project is not None:
+            entries = [entry for entry in entries if entry.project == project]
+        title = f"Project Time Entries {format_day(start_day)} - {format_day(end_day)}"
+        if project is not None:
+            title += f" ({project})"
+        self.export_chart_key = ("chart", start_day, end_day, None, project, self.data_version)
+        self.export = PdfExport("project_time_entries.pdf", entries,
+                                self.report(start_day, end_day, "month", project), title,
+                                chart=self.report_cache.get(self.export_chart_key))
+
+        self.export_window = tk.Toplevel(self.root)
+        self.export_window.title("Exporting to PDF")
+        self.export_window.protocol("WM_DELETE_WINDOW", self.export.cancel)
+        ttk.Label(self.export_window, text=f"Exporting {len(entries)} entries...").pack(padx=10, pady=5)
+        self.export_progress = ttk.Progressbar(self.export_window, mode="determinate", maximum=100, length=300)
+        self.export_progress.pack(padx=10, pady=5)
+        ttk.Button(self.export_window, text="Cancel", command=self.export.cancel).pack(padx=10, pady=5)
+        self.export_button.config(state="disabled")
+
+        self.export_measure = instruments.begin("export")
+        self.export.start()
+        self.root.after(100, self.poll_export)
+
+    def poll_export(self):
+        export = self.export
+        while True:
+            try:
+                kind, payload = export.messages.get_nowait()
+            except queue.Empty:
+                self.root.after(100, self.poll_export)
+                return
+            if kind == "progress":
+                self.export_progress["value"] = payload * 100
+            else:
+                break
+
+        self.export = None
+        self.export_window.destroy()
+        self.export_button.config(state="normal")
+        if kind == "done":
+            instruments.end(self.export_measure, rows=len(export.entries),
+                            bytes=sum(os.path.getsize(path) for path in export.paths))
+            if payload is not None:
+                self.report_cache.put(self.export_chart_key, payload, len(payload))
+            messagebox.showinfo("Export Success", f"Entries exported to {', '.join(export.paths)} successfully!")
+        elif kind == "error":
+            messagebox.showerror("Export Error", f"An error occurred while exporting: {str(payload)}")
+
+    def current_timer_name(self):
+        return self.project_entry.get().strip() or "Untitled"
 
     def toggle_timer(self):
-        if self.is_timer_running:
-            # Stop the timer
-            self.stop_time = datetime.now()
-            self.elapsed_time += self.stop_time - self.start_time
-            self.set_time_picker(self.end_time_entry, self.stop_time.strftime("%H:%M:%S"))
-            self.start_stop_button.config(text="Start", style="TButton")
-            self.is_timer_running = False
-            self.reminder_system.stop_reminder()
+        name = self.current_timer_name()
+        timer = self.timers.get(name)
+        if timer is not None and timer.running:
+            self.stop_project_timer(name)
         else:
-            # Start the timer
-            self.start_time = datetime.now()
-            self.set_time_picker(self.start_time_entry, self.start_time.strftime("%H:%M:%S"))
-            self.start_stop_button.config(text="Stop", style="Danger.TButton")
-            self.is_timer_running = True
-            self.elapsed_time = timedelta()
+            # Start the timer, or resume it if it was paused
+            timer = self.timers.start(name)
+            if timer.elapsed == 0:
+                self.set_time_picker(self.start_time_entry, datetime.now().strftime("%H:%M:%S"))
             self.reminder_system.start_reminder()
+        self.refresh_timer_display()
+
+    def pause_timer(self, name=None):
+        name = name or self.current_timer_name()
+        timer = self.timers.get(name)
+        if timer is None:
+            return
+        if timer.running:
+            self.timers.pause(name)
+        else:
+            self.timers.start(name)
+        if not self.timers.running():
+            self.reminder_system.stop_reminder()
+        self.refresh_timer_display()
+
+    def stop_project_timer(self, name):
+        # Stop the timer and fill in the entry form for its project
+        started_at, elapsed = self.timers.stop(name)
+        self.project_entry.delete(0, tk.END)
+        if name != "Untitled":
+            self.project_entry.insert(0, name)
+        started = datetime.fromtimestamp(started_at)
+        self.date_entry.set_date(started)
+        self.set_time_picker(self.start_time_entry, started.strftime("%H:%M:%S"))
+        # The end time is the start plus the time counted, which leaves out paused time
+        end = started + timedelta(seconds=int(elapsed))
+        self.set_time_picker(self.end_time_entry, end.strftime("%H:%M:%S"))
+        if not self.timers.running():
+            self.reminder_system.stop_reminder()
+        self.refresh_timer_display()
+
+    def add_reminder(self):
+        message = simpledialog.askstring("Add Reminder", "Remind me about:")
+        if not message:
+            return
+        minutes = simpledialog.askinteger("Add Reminder", "In how many minutes?", minvalue=1, maxvalue=24 * 60)
+        if minutes:
+            self.reminder_system.add_reminder(message, minutes * 60)
 
     def set_reminder_interval(self):
         interval = simpledialog.askinteger("Set Reminder Interval", "Enter reminder interval in minutes:", 
                                        minvalue=1, maxvalue=120)
         if interval:
             self.reminder_system.reminder_interval = interval * 60
+            if self.reminder_system.scheduler.pending("timer reminder"):
+                self.reminder_system.start_reminder()
             messagebox.showinfo("Reminder Interval", f"Reminder interval set to {interval} minutes.")       
 
     def create_system_tray(self):
         """Creates the system tray icon and menu."""
+        pystray = profile.import_module("pystray")
+        Image = profile.import_module("PIL.Image")
+        ImageDraw = profile.import_module("PIL.ImageDraw")
         image = Image.new('RGB', (64, 64), color=(73, 109, 137))  # Create a blank image
         draw = ImageDraw.Draw(image)
         draw.rectangle((0, 0, 64, 64), fill=(0, 0, 0))  # Draw a black rectangle
@@ -662,31 +1673,180 @@ class TimeEntryApp:
         self.root.deiconify()
 
     def exit_app(self):
-        self.tray_icon.stop()
+        if self.tray_icon_created:
+            self.tray_icon.stop()
+        # main() closes the store once the main loop has returned
         self.root.quit()
 
     def start_timer(self):
-        self.toggle_timer()
+        # Called from the tray icon's thread; hand over to the Tk loop
+        self.root.after(0, self.toggle_timer)
 
     def stop_timer(self):
-        self.toggle_timer()
-
-    def update_timer_in_tray(self):
-        if self.is_timer_running:
-            elapsed_time = datetime.now() - self.start_time + self.elapsed_time
-            hours, remainder = divmod(elapsed_time.total_seconds(), 3600)
-            minutes, seconds = divmod(remainder, 60)
-            elapsed_time_str = f"{int(hours):02}:{int(minutes):02}:{int(seconds):02}"
-            self.start_stop_button.config(text=elapsed_time_str, style="Danger.TButton")
-            self.tray_icon.title = f"Timer: {elapsed_time_str}"
+        self.root.after(0, self.toggle_timer)
+
+    @instrumented("timer.tick", profileable=False)
+    def refresh_timer_display(self):
+        """Updates the timer button, tray title and timers window if what they show changed.
+
+        While a timer runs this reschedules itself for the moment the shown
+        seconds change; with no timer running nothing is scheduled at all.
+        """
+        if self.timer_tick is not None:
+            self.root.after_cancel(self.timer_tick)
+            self.timer_tick = None
+
+        timer = self.timers.get(self.current_timer_name())
+        if timer is None:
+            button = ("Start", "TButton")
+        elif timer.running:
+            button = (format_clock(int(self.timers.elapsed(timer.name))), "Danger.TButton")
         else:
-            self.start_stop_button.config(text="Start", style="TButton")
-            self.tray_icon.title = "Timer: Stopped"
-        self.root.after(1000, self.update_timer_in_tray)
-
+            button = (f"Resume {format_clock(int(self.timers.elapsed(timer.name)))}", "TButton")
+        running = self.timers.running()
+        if running:
+            tray_title = f"Timer: {running[0].name} {format_clock(int(self.timers.elapsed(running[0].name)))}"
+            if len(running) > 1:
+                tray_title += f" (+{len(running) - 1})"
+        else:
+            tray_title = "Timer: Stopped"
+        timer_rows = self.timer_rows() if self.timers_window is not None else None
+
+        display = (button, tray_title, timer_rows)
+        if display != self.timer_display:
+            self.timer_display = display
+            self.start_stop_button.config(text=button[0], style=button[1])
+            if self.tray_icon_created:
+                self.tray_icon.title = tray_title
+            if timer_rows is not None:
+                selection = self.timers_list.curselection()
+                self.timers_list.delete(0, tk.END)
+                self.timers_list.insert(tk.END, *timer_rows)
+                if selection and selection[0] < len(timer_rows):
+                    self.timers_list.selection_set(selection[0])
+
+        if running:
+            # Wake up just after the next whole second of the soonest timer
+            delay = min(1000 - int(self.timers.elapsed(timer.name) * 1000) % 1000 for timer in running)
+            self.timer_tick = self.root.after(delay + 5, self.refresh_timer_display)
+
+    def toggle_instrumentation(self):
+        instruments.enabled = self.instrumentation_enabled.get()
+        self.refresh_diagnostics()
+
+    def show_diagnostics(self):
+        if self.diagnostics_window is not None:
+            self.diagnostics_window.lift()
+            self.refresh_diagnostics()
+            return
+        self.diagnostics_window = tk.Toplevel(self.root)
+        self.diagnostics_window.title("Diagnostics")
+        self.diagnostics_window.protocol("WM_DELETE_WINDOW", self.close_diagnostics)
+        self.diagnostics_text = tk.Text(self.diagnostics_window, width=83, height=16, wrap="none")
+        self.diagnostics_text.pack(fill="both", expand=True, padx=5, pady=5)
+        buttons = ttk.Frame(self.diagnostics_window)
+        buttons.pack(fill="x", padx=5, pady=5)
+        ttk.Button(buttons, text="Refresh", command=self.refresh_diagnostics).pack(side="left")
+        ttk.Button(buttons, text="Reset", command=self.reset_diagnostics).pack(side="left")
+        ttk.Button(buttons, text="Save JSON", command=self.save_diagnostics).pack(side="left")
+        ttk.Button(buttons, text="Profile Next Action", command=self.profile_next_action).pack(side="left")
+        self.refresh_diagnostics()
+
+    def refresh_diagnostics(self):
+        if self.diagnostics_window is None:
+            return
+        self.diagnostics_text.config(state="normal")
+        self.diagnostics_text.delete("1.0", tk.END)
+        self.diagnostics_text.insert("1.0", instruments.report())
+        self.diagnostics_text.config(state="disabled")
+
+    def reset_diagnostics(self):
+        instruments.reset()
+        self.refresh_diagnostics()
+
+    def save_diagnostics(self):
+        path = instruments.dump(f"diagnostics-{time.strftime('%Y%m%d-%H%M%S')}.json")
+        messagebox.showinfo("Diagnostics", f"Diagnostics saved to {path}")
+
+    def profile_next_action(self):
+        def done(name, path, summary):
+            self.show_report(f"Profile of {name}", f"Saved to {path}\n\n{summary}")
+        instruments.profile_next(".", done)
+        # Background work (loading, the PDF itself) runs on other threads and is not included
+        messagebox.showinfo("Diagnostics", "The next save, filter, sort or report will be profiled.")
+
+    def close_diagnostics(self):
+        self.diagnostics_window.destroy()
+        self.diagnostics_window = None
+
+    def timer_rows(self):
+        return [f"{timer.name}: {format_clock(int(self.timers.elapsed(timer.name)))}"
+                f"{'' if timer.running else ' (paused)'}" for timer in self.timers.timers.values()]
+
+    def show_timers(self):
+        if self.timers_window is not None:
+            self.timers_window.lift()
+            return
+        self.timers_window = tk.Toplevel(self.root)
+        self.timers_window.title("Timers")
+        self.timers_window.protocol("WM_DELETE_WINDOW", self.close_timers)
+        self.timers_list = tk.Listbox(self.timers_window, width=40, height=8, exportselection=False)
+        self.timers_list.pack(fill="both", expand=True, padx=10, pady=5)
+        buttons = ttk.Frame(self.timers_window)
+        buttons.pack(fill="x", padx=10, pady=5)
+        ttk.Button(buttons, text="Pause/Resume",
+                   command=lambda: self.on_timers_window(self.pause_timer)).pack(side="left", expand=True, fill="x")
+        ttk.Button(buttons, text="Stop",
+                   command=lambda: self.on_timers_window(self.stop_project_timer)).pack(side="left", expand=True, fill="x")
+        self.timer_display = None
+        self.refresh_timer_display()
+
+    def on_timers_window(self, action):
+        selection = self.timers_list.curselection()
+        if selection:
+            action(list(self.timers.timers)[selection[0]])
+
+    def close_timers(self):
+        self.timers_window.destroy()
+        self.timers_window = None
+        self.timer_display = None
+
+# Subcommand -> (module with add_arguments() and run(), help)
+SUBCOMMANDS = {
+    "report": ("report_cli", "print a report without starting the UI"),
+    "convert": ("entry_file", "convert between time_entries.csv and a binary entry file"),
+    "import": ("importer", "import time entries from CSV, JSON Lines or iCalendar files"),
+    "sync-server": ("sync_server", "run the reference sync server"),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="llamatime")
+    parser.add_argument("--startup-budget", type=float, metavar="SECONDS",
+                        help="print the startup timing report, quit after the first frame and "
+                             "exit with status 1 if it took longer than SECONDS")
+    subcommands = parser.add_subparsers(dest="command")
+    # Only the module of the subcommand given is imported, and only its
+    # arguments are added; starting the UI imports none of them
+    argv = sys.argv[1:] if argv is None else argv
+    command = next((arg for arg in argv if arg in SUBCOMMANDS), None)
+    for name, (module_name, help_text) in SUBCOMMANDS.items():
+        subparser = subcommands.add_parser(name, help=help_text)
+        if name == command:
+            module = profile.import_module(module_name)
+            module.add_arguments(subparser)
+            command_parser = subparser
+    args = parser.parse_args(argv)
+    if args.command is not None:
+        return module.run(args, command_parser)
 
-if __name__ == "__main__":
     root = tk.Tk()
-    app = TimeEntryApp(root)
+    app = TimeEntryApp(root, startup_budget=args.startup_budget)
     root.protocol("WM_DELETE_WINDOW", lambda: (root.withdraw(), app.create_system_tray()))
     root.mainloop()
+    app.store.close()
+    return app.exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """Advisory lock on ``path``, shared by every process that opens the same file.
+
+    Uses ``flock()`` where available, so separate FileLock objects exclude
+    each other even within one process, and ``msvcrt.locking()`` on Windows,
+    where shared locks are exclusive too. Within one process the lock has
+    a single owner thread, which may take it again; other threads wait, even
+    for a shared lock, since they would share its file lock. The lock file is
+    created on first use and left in place.
+    """
+
+    # Seconds between attempts while waiting for a Windows lock
+    RETRY_INTERVAL = 0.01
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        # Thread holding the lock in this process, and how often it took it
+        self._owner = None
+        self._depth = 0
+        self._owner_changed = threading.Condition()
+
+    def acquire(self, blocking=True, shared=False):
+        """Takes the lock; returns False instead of waiting when ``blocking`` is false and it is held."""
+        current = threading.current_thread()
+        with self._owner_changed:
+            if self._owner is current:
+                self._depth += 1
+                return True
+            while self._owner is not None:
+                if not blocking:
+                    return False
+                self._owner_changed.wait()
+            # Claimed for this thread while it waits for the file lock
+            self._owner = current
+            if self._file is None:
+                self._file = open(self.path, "a+b")
+        if not self._lock_file(blocking, shared):
+            with self._owner_changed:
+                self._owner = None
+                self._owner_changed.notify_all()
+            return False
+        self._depth = 1
+        return True
+
+    def _lock_file(self, blocking, shared):
+        if fcntl is not None:
+            flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+            try:
+                fcntl.flock(self._file.fileno(), flags if blocking else flags | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+        else:
+            while True:
+                try:
+                    self._file.seek(0)
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    if not blocking:
+                        return False
+                    time.sleep(self.RETRY_INTERVAL)
+        return True
+
+    def hand_over(self, thread):
+        """Passes the lock, taken once by the calling thread, to ``thread``, which releases it."""
+        with self._owner_changed:
+            if self._owner is not threading.current_thread() or self._depth != 1:
+                raise RuntimeError("can only hand over a lock taken once by this thread")
+            self._owner = thread
+
+    def release(self):
+        with self._owner_changed:
+            if self._owner is not threading.current_thread():
+                raise RuntimeError("release of a lock held by another thread")
+            self._depth -= 1
+            if self._depth:
+                return
+            self._unlock_file()
+            self._owner = None
+            self._owner_changed.notify_all()
+
+    def _unlock_file(self):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def close(self):
+        with self._owner_changed:
+            if self._file is not None:
+                if self._depth:
+                    self._unlock_file()
+                    self._owner = None
+                    self._depth = 0
+                    self._owner_changed.notify_all()
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def same_file(file, path):
+    """Whether the open ``file`` is still the file at ``path``, i.e. it was not replaced or removed."""
+    try:
+        return os.path.samestat(os.fstat(file.fileno()), os.stat(path))
+    except FileNotFoundError:
+        return False
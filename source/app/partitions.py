@@ -0,0 +1,320 @@
+import csv
+import json
+import os
+import re
+import threading
+
+from backups import month_days, month_of
+from entries import TimeEntry
+from entry_file import read_entries
+from storage import new_entry_id, write_csv
+
+MANIFEST_VERSION = 1
+
+# The ID at the end of a partition row. A note spanning lines can match too,
+# which only makes months_of() return a month more.
+ROW_ID = re.compile(rb",([^,\r\n]+)\r?$", re.M)
+
+
+def partition_totals(entries):
+    """Returns ``[project, day, seconds, count]`` rows for a month's entries, in order of first appearance."""
+    totals = {}
+    for entry in entries:
+        key = (entry.project, entry.day)
+        seconds, count = totals.get(key, (0, 0))
+        totals[key] = (seconds + entry.seconds, count + 1)
+    return [[project, day, seconds, count] for (project, day), (seconds, count) in totals.items()]
+
+
+class PartitionedStore:
+    """Entry store with one CSV file per month of entries.
+
+    ``<path>/YYYY-MM.csv`` holds a month's entries in the usual
+    time_entries.csv layout and ``<path>/manifest.json`` the size of every
+    file with its (project, day) totals. ``load_chunks()`` only loads the
+    ``recent_months`` newest partitions; older ones are loaded on request
+    with ``load_partitions()``, while project totals and plain reports over
+    the whole history are answered from the manifest. A save or delete
+    rewrites only the month it touches, then the manifest.
+
+    Callers load a month before writing to it; ``put()`` loads it otherwise.
+    On first use an existing ``csv_path`` (with its journal) is split up.
+    """
+
+    def __init__(self, path="time_entries", csv_path="time_entries.csv", recent_months=3):
+        self.path = path
+        self.csv_path = csv_path
+        self.manifest_path = os.path.join(path, "manifest.json")
+        self.recent_months = recent_months
+        # Loaded TimeEntry records by ID, and the same records by month
+        self.entries = {}
+        self.partitions = {}
+        # Month -> {"bytes": file size, "totals": [[project, day, seconds, count], ...]}
+        self.manifest = None
+        # Running totals of file I/O, for diagnostics
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+        self._lock = threading.RLock()
+
+    def load(self):
+        for _ in self.load_chunks():
+            pass
+        return list(self.entries.values())
+
+    def load_chunks(self, chunk_size=5000):
+        """Generator form of load() for the recent partitions; see ``EntryJournal.load_chunks``.
+
+        Yields one chunk per month, whatever ``chunk_size`` is.
+        """
+        with self._lock:
+            self._open()
+            recent = sorted(self.manifest)[-self.recent_months:] if self.recent_months else []
+        entries = {}
+        partitions = {}
+        for number, month in enumerate(recent, 1):
+            chunk = self._read_partition(month)
+            partitions[month] = {entry.id: entry for entry in chunk}
+            entries.update(partitions[month])
+            yield [], chunk, number / len(recent)
+        with self._lock:
+            self.entries = entries
+            self.partitions = partitions
+
+    def loaded_months(self):
+        return sorted(self.partitions)
+
+    def unloaded_months(self, start_day=None, end_day=None, project=None):
+        """Returns the months not loaded yet that may hold entries in the day range and project."""
+        with self._lock:
+            self._open()
+            months = []
+            for month in sorted(self.manifest):
+                if month in self.partitions:
+                    continue
+                first_day, last_day = month_days(month)
+                if (start_day is not None and last_day < start_day) or (end_day is not None and first_day > end_day):
+                    continue
+                if project is not None and not any(row[0] == project for row in self.manifest[month]["totals"]):
+                    continue
+                months.append(month)
+            return months
+
+    def load_partitions(self, months):
+        """Loads more months into ``entries``.
+
+        Returns ``(totals, added)``: the manifest totals of those months,
+        which callers counting the new entries one by one take back out, and
+        the entries themselves.
+        """
+        totals = []
+        added = []
+        with self._lock:
+            for month in sorted(months):
+                if month in self.partitions or month not in self.manifest:
+                    continue
+                chunk = self._read_partition(month)
+                self.partitions[month] = {entry.id: entry for entry in chunk}
+                self.entries.update(self.partitions[month])
+                totals.extend(tuple(row) for row in self.manifest[month]["totals"])
+                added.extend(chunk)
+        return totals, added
+
+    def months_of(self, entry_ids):
+        """Returns the months that hold any of ``entry_ids``, loaded or not.
+
+        Months not loaded are searched, so this reads every one of them
+        unless all the IDs are found earlier.
+        """
+        wanted = set(entry_ids)
+        with self._lock:
+            self._open()
+            months = {month_of(self.entries[entry_id]) for entry_id in wanted if entry_id in self.entries}
+            wanted.difference_update(self.entries)
+            for month in reversed(self.unloaded_months()):
+                if not wanted:
+                    break
+                with open(self._partition_path(month), "rb") as file:
+                    data = file.read()
+                self.bytes_read += len(data)
+                found = wanted.intersection(entry_id.decode("utf-8") for entry_id in ROW_ID.findall(data))
+                if found:
+                    months.add(month)
+                    wanted -= found
+        return sorted(months)
+
+    def read_partition(self, month):
+        """Returns a month's entries without loading them, e.g. for a backup."""
+        with self._lock:
+            if month in self.partitions:
+                return list(self.partitions[month].values())
+            return self._read_partition(month) if month in self.manifest else []
+
+    def daily_totals(self):
+        """Returns ``(project, day, seconds, count)`` rows for all entries, loaded or not."""
+        with self._lock:
+            self._open()
+            return [tuple(row) for month in sorted(self.manifest) for row in self.manifest[month]["totals"]]
+
+    def report(self, start_day, end_day, project=None):
+        """Returns ``{project: seconds}`` for entries in the day range, from the manifest alone."""
+        totals = {}
+        for name, day, seconds, _ in self.daily_totals():
+            if start_day <= day <= end_day and (project is None or name == project):
+                totals[name] = totals.get(name, 0) + seconds
+        return totals
+
+    def put(self, entry):
+        """Inserts or replaces one entry. A missing ID is assigned here."""
+        if not entry.id:
+            entry.id = new_entry_id()
+        month = month_of(entry)
+        with self._lock:
+            self.load_partitions([month])
+            touched = {month}
+            old_entry = self.entries.get(entry.id)
+            if old_entry is not None and month_of(old_entry) != month:
+                # Moved to another month
+                del self.partitions[month_of(old_entry)][entry.id]
+                touched.add(month_of(old_entry))
+            self.partitions.setdefault(month, {})[entry.id] = entry
+            self.entries[entry.id] = entry
+            for changed in touched:
+                self._write_partition(changed)
+            self._save_manifest()
+        return entry
+
+    def put_many(self, entries):
+        """Inserts or replaces all of ``entries``, rewriting each month they touch once."""
+        entries = list(entries)
+        for entry in entries:
+            if not entry.id:
+                entry.id = new_entry_id()
+        with self._lock:
+            self.load_partitions({month_of(entry) for entry in entries})
+            touched = set()
+            for entry in entries:
+                month = month_of(entry)
+                old_entry = self.entries.get(entry.id)
+                if old_entry is not None and month_of(old_entry) != month:
+                    del self.partitions[month_of(old_entry)][entry.id]
+                    touched.add(month_of(old_entry))
+                self.partitions.setdefault(month, {})[entry.id] = entry
+                self.entries[entry.id] = entry
+                touched.add(month)
+            for month in touched:
+                self._write_partition(month)
+            self._save_manifest()
+        return entries
+
+    def delete(self, entry_id):
+        with self._lock:
+            entry = self.entries.pop(entry_id, None)
+            if entry is None:
+                return False
+            del self.partitions[month_of(entry)][entry_id]
+            self._write_partition(month_of(entry))
+            self._save_manifest()
+        return True
+
+    def sync(self):
+        # Every change is written and fsynced when it is made
+        pass
+
+    def compact(self, background=True):
+        # Partitions are rewritten whole on every change, so there is nothing to fold
+        return None
+
+    def replace_all(self, entries):
+        """Replaces all entries with ``entries``; afterwards every month is loaded."""
+        with self._lock:
+            self._open()
+            # The new months are written over the old ones first, so a failure
+            # part way through leaves every entry in one version or the other;
+            # months without new entries are removed once the manifest is saved
+            old_months = set(self.manifest)
+            self._split(entries)
+            dropped = old_months.difference(self.partitions)
+            for month in dropped:
+                del self.manifest[month]
+            self._save_manifest()
+            for month in dropped:
+                os.remove(self._partition_path(month))
+            self.entries = {}
+            for partition in self.partitions.values():
+                self.entries.update(partition)
+            return list(self.entries.values())
+
+    def close(self):
+        pass
+
+    def _partition_path(self, month):
+        return os.path.join(self.path, month + ".csv")
+
+    def _open(self):
+        # Reads the manifest, or builds it, on first use. Partitions whose size
+        # does not match (a write interrupted before the manifest was saved)
+        # are scanned again.
+        if self.manifest is not None:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        try:
+            with open(self.manifest_path, "r") as file:
+                document = json.load(file)
+            manifest = document["partitions"] if document.get("version") == MANIFEST_VERSION else {}
+        except (OSError, ValueError, KeyError, AttributeError):
+            manifest = {}
+
+        sizes = {name[:-4]: os.path.getsize(os.path.join(self.path, name))
+                 for name in os.listdir(self.path) if name.endswith(".csv")}
+        self.manifest = {month: manifest[month] for month in manifest if month in sizes}
+        stale = [month for month, size in sizes.items()
+                 if month not in self.manifest or self.manifest[month].get("bytes") != size]
+        for month in stale:
+            entries = self._read_partition(month)
+            self.manifest[month] = {"bytes": sizes[month], "totals": partition_totals(entries)}
+
+        if not sizes and os.path.exists(self.csv_path):
+            self._split(read_entries(self.csv_path))
+            self.partitions = {}
+        if stale or self.manifest != manifest:
+            self._save_manifest()
+
+    def _split(self, entries):
+        # Writes entries out by month; all of them become the loaded partitions
+        self.partitions = {}
+        for entry in entries:
+            if not entry.id:
+                entry.id = new_entry_id()
+            self.partitions.setdefault(month_of(entry), {})[entry.id] = entry
+        for month in self.partitions:
+            self._write_partition(month)
+
+    def _read_partition(self, month):
+        path = self._partition_path(month)
+        with open(path, "r", newline="") as file:
+            entries = [TimeEntry.from_row(row) for row in csv.reader(file) if row]
+            self.bytes_read += file.buffer.tell()
+        return entries
+
+    def _write_partition(self, month):
+        # Called with the lock held, for a loaded month
+        entries = list(self.partitions.get(month, {}).values())
+        if not entries:
+            self.partitions.pop(month, None)
+            self.manifest.pop(month, None)
+            if os.path.exists(self._partition_path(month)):
+                os.remove(self._partition_path(month))
+            return
+        size = write_csv(self._partition_path(month), entries)
+        self.bytes_written += size
+        self.manifest[month] = {"bytes": size, "totals": partition_totals(entries)}
+
+    def _save_manifest(self):
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, "w") as file:
+            json.dump({"version": MANIFEST_VERSION, "partitions": self.manifest}, file, sort_keys=True)
+            file.flush()
+            os.fsync(file.fileno())
+            self.bytes_written += file.tell()
+        os.replace(temp_path, self.manifest_path)
@@ -0,0 +1,168 @@
+import io
+import os
+import queue
+import threading
+
+from reports import format_duration
+from startup import profile
+
+# Entry table rows per PDF page, below the page header
+ROWS_PER_PAGE = 40
+# Entry table rows per PDF file. FPDF keeps every page in memory until the
+# document is written, so long tables are split across numbered files.
+ROWS_PER_DOCUMENT = 250 * ROWS_PER_PAGE
+# Entry table columns: (header, width in mm)
+COLUMNS = (("Date", 25), ("Start", 20), ("End", 20), ("Project", 50), ("Note", 75))
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def clip(text, limit):
+    # Table cells do not wrap; cut long names and notes to the column
+    return text if len(text) <= limit else text[:max(0, limit - 3)] + "..."
+
+
+def part_path(path, number):
+    """Returns the file name of part ``number`` (from 1) of the export."""
+    if number == 1:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}-{number}{ext}"
+
+
+def render_pie_chart(totals):
+    """Renders ``{project: seconds}`` as a pie chart and returns the PNG bytes.
+
+    Uses the Agg canvas directly rather than pyplot, so it is safe to call
+    from a worker thread while Tk owns the main one.
+    """
+    Figure = profile.import_module("matplotlib.figure").Figure
+    FigureCanvasAgg = profile.import_module("matplotlib.backends.backend_agg").FigureCanvasAgg
+
+    fig = Figure(figsize=(6, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    # Convert to hours
+    ax.pie([seconds / 3600 for seconds in totals.values()], labels=list(totals), autopct='%1.1f%%')
+    ax.axis('equal')  # Ensure the pie chart is circular
+    ax.set_title('Time Spent on Projects')
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+
+class PdfExport:
+    """Writes the PDF report on a worker thread.
+
+    ``entries`` is a list of TimeEntry records taken on the UI thread; they
+    are never modified in place, so the worker can read them safely. Progress
+    is posted to ``messages`` as ``("progress", fraction)`` and the run ends
+    with one of ``("done", chart_png)``, ``("cancelled", None)`` or
+    ``("error", exception)``. The summary and the first rows go to ``path``;
+    rows beyond ``ROWS_PER_DOCUMENT`` continue in ``report-2.pdf`` and so on,
+    listed in ``paths``. The files are written under temporary names and only
+    renamed into place when all of them are complete.
+    """
+
+    def __init__(self, path, entries, breakdown, title, chart=None):
+        self.path = path
+        self.entries = entries
+        self.breakdown = breakdown
+        self.title = title
+        # Cached chart PNG, rendered by the worker when None
+        self.chart = chart
+        self.paths = []
+        self.messages = queue.Queue()
+        self._cancelled = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def run(self):
+        try:
+            self.write()
+            for path in self.paths:
+                os.replace(path + ".part", path)
+            # Drop the extra parts of an earlier, longer export
+            number = len(self.paths) + 1
+            while os.path.exists(part_path(self.path, number)):
+                os.remove(part_path(self.path, number))
+                number += 1
+            self.messages.put(("done", self.chart))
+        except ExportCancelled:
+            self.messages.put(("cancelled", None))
+        except Exception as e:
+            self.messages.put(("error", e))
+        finally:
+            for path in self.paths:
+                if os.path.exists(path + ".part"):
+                    os.remove(path + ".part")
+
+    def check_cancelled(self):
+        if self._cancelled.is_set():
+            raise ExportCancelled()
+
+    def write(self):
+        """Writes every part to its ``.part`` file, recording them in ``paths``."""
+        FPDF = profile.import_module("fpdf").FPDF
+        totals = self.breakdown.totals()
+        if self.chart is None and totals:
+            self.chart = render_pie_chart(totals)
+        self.check_cancelled()
+
+        # Create the PDF
+        pdf = FPDF()
+        pdf.add_page()
+        pdf.set_font("Courier", size=12)
+        pdf.cell(190, 10, txt=self.title, ln=True, align="C")
+        if self.chart is not None:
+            pdf.image(io.BytesIO(self.chart), x=10, y=25, w=170)
+            pdf.set_xy(10, 200)  # Set the cursor position below the chart
+
+        pdf.cell(190, 10, txt="Total Time Spent on Projects:", ln=True, align="L")
+        for project, seconds in totals.items():
+            pdf.cell(190, 8, txt=f"Project: {project}, Total Time: {format_duration(seconds)}", ln=True)
+
+        if self.breakdown.period is not None:
+            pdf.cell(190, 10, txt="Time Spent per Month:", ln=True, align="L")
+            for project, values in self.breakdown.seconds.items():
+                months = ", ".join(f"{label}: {format_duration(seconds)}"
+                                   for label, seconds in zip(self.breakdown.labels, values) if seconds)
+                pdf.multi_cell(190, 8, txt=f"Project: {project}, {months}")
+
+        # Entries as a table, one page per chunk and one file per
+        # ROWS_PER_DOCUMENT rows. Courier is monospaced, so each column holds
+        # a fixed number of characters.
+        pdf.set_font("Courier", size=8)
+        limits = [int((width - 2) // pdf.get_string_width("M")) for _, width in COLUMNS]
+        paths = self.paths = [self.path]
+        total = len(self.entries)
+        for first in range(0, total, ROWS_PER_PAGE):
+            self.check_cancelled()
+            if first and first % ROWS_PER_DOCUMENT == 0:
+                # Write this part out so its pages can be freed
+                pdf.output(paths[-1] + ".part")
+                paths.append(part_path(self.path, len(paths) + 1))
+                pdf = FPDF()
+                pdf.set_font("Courier", size=8)
+            pdf.add_page()
+            for header, width in COLUMNS:
+                pdf.cell(width, 7, txt=header, border=1)
+            pdf.ln()
+            for entry in self.entries[first:first + ROWS_PER_PAGE]:
+                row = (entry.date, entry.start_time, entry.end_time, entry.project, entry.note)
+                for text, (_, width), limit in zip(row, COLUMNS, limits):
+                    pdf.cell(width, 6, txt=clip(text, limit), border=1)
+                pdf.ln()
+            self.messages.put(("progress", min(first + ROWS_PER_PAGE, total) / total))
+
+        self.check_cancelled()
+        pdf.output(paths[-1] + ".part")
@@ -0,0 +1,298 @@
+"""Headless batch reports over time_entries.csv and binary entry files.
+
+    python -m llamatime report --from 2024-01-01 --to 2024-01-31 [--project NAME]
+        [--group-by day|week|month] [--format json|csv|text] [FILE ...]
+
+Each file is streamed record by record through a generator pipeline, so
+memory use does not depend on its size. Files, and byte-range shards of files larger
+than ``--shard-size``, are aggregated in a process pool and the partial
+results merged. Binary entry files are aggregated in place over their
+memory-mapped columns instead. The totals and their order match the report
+dialog.
+
+This module does not import tkinter and can also be run on its own.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from entries import SECONDS_PER_DAY, TimeEntry, format_day, parse_day
+from entry_file import EntryFile, is_entry_file
+from reports import PERIODS, Breakdown, bucket_label, day_bucket, format_duration, format_report
+from storage import journal_entries
+
+# Files larger than this are split into byte-range shards
+DEFAULT_SHARD_SIZE = 64 * 1024 * 1024
+# Bytes read at a time while counting quotes up to a shard boundary
+SCAN_BLOCK_SIZE = 1024 * 1024
+
+
+def shard_ranges(path, shard_size):
+    """Splits a file into ``(start, end)`` byte ranges of about ``shard_size``.
+
+    Notes can contain newlines inside quotes, so a row can span several
+    lines. A shard only ends at a newline preceded by an even number of
+    quotes, which takes one pass over the file counting them.
+    """
+    size = os.path.getsize(path)
+    if size <= shard_size:
+        return [(0, size)]
+    ranges = []
+    start = 0
+    with open(path, "rb") as file:
+        while start + shard_size < size:
+            file.seek(start)
+            quotes = 0
+            remaining = shard_size
+            while remaining:
+                block = file.read(min(remaining, SCAN_BLOCK_SIZE))
+                quotes += block.count(b'"')
+                remaining -= len(block)
+            # Finish lines until no quoted field is left open
+            while True:
+                line = file.readline()
+                quotes += line.count(b'"')
+                if not line or (line.endswith(b"\n") and quotes % 2 == 0):
+                    break
+            end = file.tell()
+            if end >= size:
+                break
+            ranges.append((start, end))
+            start = end
+    ranges.append((start, size))
+    return ranges
+
+
+def read_records(path, start, end):
+    """Yields ``(offset, record)`` for the CSV records in ``[start, end)``.
+
+    ``start`` and ``end`` are record boundaries from ``shard_ranges()``. A
+    record is one line, or several when a quoted note contains newlines.
+    """
+    with open(path, "rb") as file:
+        file.seek(start)
+        offset = start
+        while offset < end:
+            record = file.readline()
+            if not record:
+                break
+            # An odd number of quotes leaves a quoted field open at the line end
+            while record.count(b'"') % 2:
+                line = file.readline()
+                if not line:
+                    break
+                record += line
+            yield offset, record
+            offset += len(record)
+
+
+def read_entries(records, counts):
+    """Parses ``(offset, record)`` pairs into ``(offset, TimeEntry)`` pairs.
+
+    Malformed rows are skipped and counted in ``counts["skipped"]``.
+    """
+    for offset, record in records:
+        try:
+            for row in csv.reader([record.decode("utf-8")]):
+                if row:
+                    yield offset, TimeEntry.from_row(row)
+        except (ValueError, TypeError, UnicodeDecodeError, csv.Error):
+            counts["skipped"] += 1
+
+
+class PartialReport:
+    """Aggregate for part of one file; partials of the same file can be merged.
+
+    ``first_seen`` holds the offset at which each project first appears,
+    which restores the app's project order after merging.
+    """
+
+    def __init__(self):
+        self.first_seen = {}
+        # Seconds by (project, bucket)
+        self.seconds = {}
+        self.counts = {"rows": 0, "skipped": 0}
+
+    def see(self, name, offset):
+        if self.first_seen.get(name, offset) >= offset:
+            self.first_seen[name] = offset
+
+    def add(self, offset, entry, start_day, end_day, period, project):
+        self.counts["rows"] += 1
+        self.see(entry.project, offset)
+        if project is not None and entry.project != project:
+            return
+        day = entry.start // SECONDS_PER_DAY
+        if not start_day <= day <= end_day:
+            return
+        key = (entry.project, 0 if period is None else day_bucket(day, period))
+        self.seconds[key] = self.seconds.get(key, 0) + entry.seconds
+
+    def merge(self, other):
+        for name, offset in other.first_seen.items():
+            self.see(name, offset)
+        for key, seconds in other.seconds.items():
+            self.seconds[key] = self.seconds.get(key, 0) + seconds
+        for name, count in other.counts.items():
+            self.counts[name] += count
+
+    def breakdown(self, start_day, end_day, period):
+        if period is None:
+            first_bucket, labels = 0, [f"{format_day(start_day)} - {format_day(end_day)}"]
+        else:
+            first_bucket = day_bucket(start_day, period)
+            labels = [bucket_label(bucket, period)
+                      for bucket in range(first_bucket, day_bucket(end_day, period) + 1)]
+        seconds = {}
+        for (name, bucket), value in self.seconds.items():
+            seconds.setdefault(name, [0] * len(labels))[bucket - first_bucket] += value
+        ordered = sorted(seconds, key=lambda name: self.first_seen[name])
+        return Breakdown(period, labels, {name: seconds[name] for name in ordered})
+
+
+def aggregate_shard(path, start, end, start_day, end_day, period, project, skip_ids):
+    """Worker: aggregates the snapshot rows of one byte range."""
+    partial = PartialReport()
+    for offset, entry in read_entries(read_records(path, start, end), partial.counts):
+        if entry.id and entry.id in skip_ids:
+            # Superseded by the journal; still counts towards the project order
+            partial.see(entry.project, offset)
+            continue
+        partial.add(offset, entry, start_day, end_day, period, project)
+    return path, partial
+
+
+def aggregate_entry_file(path, start_day, end_day, period, project, skip_ids):
+    """Worker: aggregates a whole binary entry file from its columns."""
+    partial = PartialReport()
+    with EntryFile(path) as entry_file:
+        # Projects are stored in the order they first appear
+        for position, name in enumerate(entry_file.projects):
+            partial.see(name, position)
+        partial.counts["rows"] = len(entry_file)
+        skip = entry_file.positions_with_ids(skip_ids)
+        for name, day, seconds, _ in entry_file.daily_totals(start_day, end_day, project, skip):
+            key = (name, 0 if period is None else day_bucket(day, period))
+            partial.seconds[key] = partial.seconds.get(key, 0) + seconds
+    return path, partial
+
+
+def build_reports(paths, start_day, end_day, period=None, project=None, jobs=None,
+                  shard_size=DEFAULT_SHARD_SIZE):
+    """Returns ``{path: (Breakdown, counts)}`` for each snapshot file."""
+    journals = {path: journal_entries(path) for path in paths}
+    tasks = []
+    for path in paths:
+        skip_ids = frozenset(journals[path])
+        if is_entry_file(path):
+            tasks.append((aggregate_entry_file, (path, start_day, end_day, period, project, skip_ids)))
+        else:
+            tasks.extend((aggregate_shard, (path, start, end, start_day, end_day, period, project, skip_ids))
+                         for start, end in shard_ranges(path, shard_size))
+
+    partials = {path: PartialReport() for path in paths}
+    if len(tasks) <= 1 or jobs == 1:
+        for worker, task in tasks:
+            path, partial = worker(*task)
+            partials[path].merge(partial)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(worker, *task) for worker, task in tasks]
+            for future in futures:
+                path, partial = future.result()
+                partials[path].merge(partial)
+
+    reports = {}
+    for path in paths:
+        # Journal entries come after the whole snapshot, as when the app loads it
+        offset = os.path.getsize(path)
+        partial = partials[path]
+        for entry in journals[path].values():
+            if entry is not None:
+                partial.add(offset, entry, start_day, end_day, period, project)
+                offset += 1
+        reports[path] = (partial.breakdown(start_day, end_day, period), partial.counts)
+    return reports
+
+
+def write_json(reports, args, out):
+    documents = []
+    for path, (breakdown, counts) in reports.items():
+        projects = []
+        for name, values in breakdown.seconds.items():
+            item = {"project": name, "seconds": sum(values), "total": format_duration(sum(values))}
+            if breakdown.period is not None:
+                item["periods"] = {label: seconds for label, seconds in zip(breakdown.labels, values) if seconds}
+            projects.append(item)
+        documents.append({"file": path, "from": args.from_date, "to": args.to_date, "project": args.project,
+                          "group_by": args.group_by, "projects": projects, "skipped_rows": counts["skipped"]})
+    json.dump(documents, out, indent=2)
+    out.write("\n")
+
+
+def write_csv(reports, args, out):
+    writer = csv.writer(out)
+    writer.writerow(["file", "project", "period", "seconds", "total"])
+    for path, (breakdown, _) in reports.items():
+        for name, values in breakdown.seconds.items():
+            writer.writerow([path, name, "total", sum(values), format_duration(sum(values))])
+            if breakdown.period is not None:
+                for label, seconds in zip(breakdown.labels, values):
+                    if seconds:
+                        writer.writerow([path, name, label, seconds, format_duration(seconds)])
+
+
+def write_text(reports, args, out):
+    for path, (breakdown, _) in reports.items():
+        if len(reports) > 1:
+            out.write(f"== {path}\n")
+        out.write(format_report(breakdown))
+
+
+WRITERS = {"json": write_json, "csv": write_csv, "text": write_text}
+
+
+def add_arguments(parser):
+    parser.add_argument("--from", dest="from_date", required=True, metavar="YYYY-MM-DD")
+    parser.add_argument("--to", dest="to_date", required=True, metavar="YYYY-MM-DD")
+    parser.add_argument("--project", help="only report this project")
+    parser.add_argument("--group-by", choices=[period for period in PERIODS if period],
+                        help="break the totals down by day, week or month")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="json")
+    parser.add_argument("--jobs", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE, metavar="BYTES",
+                        help="split files larger than this into shards")
+    parser.add_argument("files", nargs="*", default=["time_entries.csv"], metavar="FILE")
+
+
+def run(args, parser, out=None):
+    try:
+        start_day = parse_day(args.from_date)
+        end_day = parse_day(args.to_date)
+    except ValueError:
+        parser.error("Invalid date format. Use YYYY-MM-DD.")
+    if end_day < start_day:
+        parser.error("End date must be after start date.")
+    missing = [path for path in args.files if not os.path.exists(path)]
+    if missing:
+        parser.error(f"No such file: {missing[0]}")
+
+    reports = build_reports(args.files, start_day, end_day, args.group_by, args.project,
+                            args.jobs, args.shard_size)
+    out = out or sys.stdout
+    WRITERS[args.format](reports, args, out)
+    out.flush()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="llamatime report", description="Headless time reports.")
+    add_arguments(parser)
+    return run(parser.parse_args(argv), parser)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
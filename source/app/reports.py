@@ -0,0 +1,303 @@
+from array import array
+from collections import OrderedDict
+from datetime import date
+
+from entries import EPOCH_ORDINAL, SECONDS_PER_DAY, format_day
+from startup import profile
+
+# Report breakdowns: None for plain per-project totals
+PERIODS = (None, "day", "week", "month")
+
+# Day number 0 (1970-01-01) is a Thursday; weeks start on Monday
+WEEK_OFFSET = 3
+
+
+def load_numpy():
+    """Returns the numpy module, or None when it is not installed."""
+    try:
+        return profile.import_module("numpy")
+    except ImportError:
+        return None
+
+
+def format_duration(seconds):
+    """Formats seconds as ``"<hours>h <minutes>m"``."""
+    hours, remainder = divmod(int(seconds), 3600)
+    return f"{hours}h {remainder // 60}m"
+
+
+def format_report(breakdown):
+    """Formats a Breakdown as the text shown by the report dialog."""
+    text = ""
+    for project, values in breakdown.seconds.items():
+        text += f"Project: {project}, Total Time: {format_duration(sum(values))}\n"
+        if breakdown.period is not None:
+            for label, seconds in zip(breakdown.labels, values):
+                if seconds:
+                    text += f"    {label}: {format_duration(seconds)}\n"
+    return text
+
+
+def day_bucket(day, period):
+    """Maps a day number to its bucket number for ``period``."""
+    if period == "day":
+        return day
+    if period == "week":
+        return (day + WEEK_OFFSET) // 7
+    if period == "month":
+        day_date = date.fromordinal(day + EPOCH_ORDINAL)
+        return (day_date.year - 1970) * 12 + day_date.month - 1
+    raise ValueError(f"Unknown report period: {period!r}")
+
+
+def bucket_label(bucket, period):
+    """Returns a display label: the day, the Monday of the week, or YYYY-MM."""
+    if period == "day":
+        return format_day(bucket)
+    if period == "week":
+        return format_day(bucket * 7 - WEEK_OFFSET)
+    if period == "month":
+        year, month = divmod(bucket, 12)
+        return f"{1970 + year:04d}-{month + 1:02d}"
+    raise ValueError(f"Unknown report period: {period!r}")
+
+
+class Breakdown:
+    """Seconds per project and time bucket, as returned by ``ReportEngine.breakdown``.
+
+    ``labels`` names the buckets from the first to the last one in the range
+    and ``seconds[project]`` is a list of the same length.
+    """
+
+    def __init__(self, period, labels, seconds):
+        self.period = period
+        self.labels = labels
+        self.seconds = seconds
+
+    def totals(self):
+        return {project: sum(values) for project, values in self.seconds.items()}
+
+
+class ReportEngine:
+    """Columnar copy of the entries for report aggregation.
+
+    Entries are kept as parallel ``array`` columns of start and end epoch
+    seconds and integer project codes, so NumPy can view them without a copy
+    and aggregate with masks and ``bincount``. Removed rows are flagged dead
+    and the columns are compacted once a quarter of them are dead. Without
+    NumPy the same columns are aggregated in a Python loop.
+    """
+
+    # Dead rows tolerated before the columns are compacted
+    COMPACT_MIN = 1024
+
+    def __init__(self, use_numpy=True):
+        self.use_numpy = use_numpy
+        self.starts = array("q")
+        self.ends = array("q")
+        self.codes = array("l")
+        # 1 for rows that hold a current entry, 0 once it is removed
+        self.live = bytearray()
+        # Row of each entry ID in the columns
+        self.rows = {}
+        self.dead = 0
+        # Project names by code and codes by name
+        self.projects = []
+        self.project_codes = {}
+
+    def project_code(self, project):
+        code = self.project_codes.get(project)
+        if code is None:
+            code = self.project_codes[project] = len(self.projects)
+            self.projects.append(project)
+        return code
+
+    def rebuild(self, entries):
+        self.starts = array("q")
+        self.ends = array("q")
+        self.codes = array("l")
+        self.live = bytearray()
+        self.rows = {}
+        self.dead = 0
+        self.projects = []
+        self.project_codes = {}
+        for entry in entries:
+            self.add(entry)
+
+    def add(self, entry):
+        if entry.id in self.rows:
+            self.remove(entry)
+        self.rows[entry.id] = len(self.starts)
+        self.starts.append(entry.start)
+        self.ends.append(entry.end)
+        self.codes.append(self.project_code(entry.project))
+        self.live.append(1)
+
+    def remove(self, entry):
+        row = self.rows.pop(entry.id, None)
+        if row is None:
+            return False
+        self.live[row] = 0
+        self.dead += 1
+        if self.dead >= self.COMPACT_MIN and self.dead * 4 >= len(self.live):
+            self.compact()
+        return True
+
+    def replace(self, old_entry, new_entry):
+        self.remove(old_entry)
+        self.add(new_entry)
+
+    def apply(self, removed, added):
+        for entry in removed:
+            self.remove(entry)
+        for entry in added:
+            self.add(entry)
+
+    def compact(self):
+        keep = [row for row, alive in enumerate(self.live) if alive]
+        self.starts = array("q", (self.starts[row] for row in keep))
+        self.ends = array("q", (self.ends[row] for row in keep))
+        self.codes = array("l", (self.codes[row] for row in keep))
+        self.live = bytearray(b"\x01") * len(keep)
+        position = {row: index for index, row in enumerate(keep)}
+        self.rows = {entry_id: position[row] for entry_id, row in self.rows.items()}
+        self.dead = 0
+
+    def __len__(self):
+        return len(self.rows)
+
+    def totals(self, start_day, end_day, project=None):
+        """Returns ``{project: seconds}`` for entries starting on days ``start_day``..``end_day``."""
+        return self.breakdown(start_day, end_day, None, project).totals()
+
+    def breakdown(self, start_day, end_day, period=None, project=None):
+        """Aggregates the entries in a day range by project and ``period`` bucket.
+
+        ``period`` is one of ``PERIODS``; with None there is a single bucket
+        covering the whole range. Projects appear in the order they were first
+        added.
+        """
+        if period is None:
+            first_bucket, last_bucket = 0, 0
+            labels = [f"{format_day(start_day)} - {format_day(end_day)}"]
+        else:
+            first_bucket, last_bucket = day_bucket(start_day, period), day_bucket(end_day, period)
+            labels = [bucket_label(bucket, period) for bucket in range(first_bucket, last_bucket + 1)]
+        code = self.project_codes.get(project) if project is not None else None
+        if project is not None and code is None:
+            return Breakdown(period, labels, {})
+
+        np = load_numpy() if self.use_numpy else None
+        if np is not None:
+            grid = self._breakdown_numpy(np, start_day, end_day, period, code, first_bucket, len(labels))
+        else:
+            grid = self._breakdown_python(start_day, end_day, period, code, first_bucket, len(labels))
+        seconds = {self.projects[code]: values for code, values in grid}
+        return Breakdown(period, labels, seconds)
+
+    def _breakdown_numpy(self, np, start_day, end_day, period, code, first_bucket, bucket_count):
+        if not self.starts:
+            return []
+        starts = np.frombuffer(self.starts, dtype=np.int64)
+        ends = np.frombuffer(self.ends, dtype=np.int64)
+        codes = np.frombuffer(self.codes, dtype=np.dtype("l"))
+        live = np.frombuffer(self.live, dtype=np.uint8)
+
+        mask = (live != 0) & (starts >= start_day * SECONDS_PER_DAY) & (starts < (end_day + 1) * SECONDS_PER_DAY)
+        if code is not None:
+            mask &= codes == code
+        starts, durations, codes = starts[mask], ends[mask] - starts[mask], codes[mask]
+        if not len(starts):
+            return []
+
+        if period is None:
+            buckets = np.zeros(len(starts), dtype=np.int64)
+        else:
+            days = starts // SECONDS_PER_DAY
+            if period == "day":
+                buckets = days - first_bucket
+            elif period == "week":
+                buckets = (days + WEEK_OFFSET) // 7 - first_bucket
+            else:
+                months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+                buckets = months - first_bucket
+
+        # One bincount over the flattened (project, bucket) grid
+        cells = codes.astype(np.int64) * bucket_count + buckets
+        grid = np.bincount(cells, weights=durations, minlength=len(self.projects) * bucket_count)
+        grid = grid.reshape(len(self.projects), bucket_count)
+        present = np.bincount(codes, minlength=len(self.projects))
+        return [(int(project), [int(value) for value in grid[project]]) for project in np.flatnonzero(present)]
+
+    def _breakdown_python(self, start_day, end_day, period, code, first_bucket, bucket_count):
+        low, high = start_day * SECONDS_PER_DAY, (end_day + 1) * SECONDS_PER_DAY
+        grid = {}
+        buckets = {}
+        for start, end, project, alive in zip(self.starts, self.ends, self.codes, self.live):
+            if not alive or not low <= start < high or (code is not None and project != code):
+                continue
+            values = grid.get(project)
+            if values is None:
+                values = grid[project] = [0] * bucket_count
+            if period is None:
+                bucket = 0
+            else:
+                day = start // SECONDS_PER_DAY
+                bucket = buckets.get(day)
+                if bucket is None:
+                    bucket = buckets[day] = day_bucket(day, period) - first_bucket
+            values[bucket] += end - start
+        return sorted(grid.items())
+
+
+class ReportCache:
+    """LRU cache of report results and rendered charts.
+
+    Keys include the app's data version, so results computed before a change
+    are never returned after it; they simply age out. The cache is bounded
+    both by the number of results and by their approximate total size.
+    """
+
+    def __init__(self, max_items=64, max_bytes=16 * 1024 * 1024):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        # key -> (value, size), least recently used first
+        self.items = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        item = self.items.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        self.items.move_to_end(key)
+        self.hits += 1
+        return item[0]
+
+    def put(self, key, value, size):
+        if size > self.max_bytes:
+            return value
+        old = self.items.pop(key, None)
+        if old is not None:
+            self.size -= old[1]
+        self.items[key] = (value, size)
+        self.size += size
+        while len(self.items) > self.max_items or self.size > self.max_bytes:
+            _, (_, evicted_size) = self.items.popitem(last=False)
+            self.size -= evicted_size
+        return value
+
+    def clear(self):
+        self.items.clear()
+        self.size = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "items": len(self.items), "bytes": self.size}
+
+
+def breakdown_size(breakdown):
+    """Approximate memory used by a Breakdown, for ReportCache accounting."""
+    cells = len(breakdown.labels) * (len(breakdown.seconds) + 1)
+    return 64 * cells + sum(len(project) for project in breakdown.seconds)
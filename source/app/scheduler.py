@@ -0,0 +1,163 @@
+import heapq
+import itertools
+import time
+import traceback
+
+
+class ScheduledEvent:
+    __slots__ = ("due", "callback", "interval", "name", "cancelled")
+
+    def __init__(self, due, callback, interval=None, name=None):
+        self.due = due
+        self.callback = callback
+        # Seconds between repeats, or None for a one-off event
+        self.interval = interval
+        self.name = name
+        self.cancelled = False
+
+
+class Scheduler:
+    """All timed events in one priority queue, run on the caller's event loop.
+
+    Only the earliest event has a wake-up registered with ``call_later``
+    (``root.after`` in the app), so any number of reminders costs one pending
+    callback and no threads; callbacks run on the loop's thread, where Tk
+    calls are safe. Cancelled events are dropped lazily when they reach the
+    top of the heap.
+
+    With a fake ``clock`` and no ``call_later``, tests advance the clock and
+    call ``run_due()`` themselves.
+    """
+
+    def __init__(self, call_later=None, cancel_call=None, clock=time.monotonic):
+        self.call_later = call_later
+        self.cancel_call = cancel_call
+        self.clock = clock
+        # (due, sequence, event); the sequence keeps equal due times in FIFO order
+        self.queue = []
+        self._sequence = itertools.count()
+        self._wakeup = None
+        self._wakeup_due = None
+
+    def schedule(self, delay, callback, interval=None, name=None):
+        """Runs ``callback()`` after ``delay`` seconds, then every ``interval`` seconds if given."""
+        event = ScheduledEvent(self.clock() + delay, callback, interval, name)
+        heapq.heappush(self.queue, (event.due, next(self._sequence), event))
+        self._arm()
+        return event
+
+    def cancel(self, event):
+        if event is not None:
+            event.cancelled = True
+
+    def cancel_named(self, name):
+        for _, _, event in self.queue:
+            if event.name == name:
+                event.cancelled = True
+
+    def pending(self, name=None):
+        return [event for _, _, event in sorted(self.queue)
+                if not event.cancelled and (name is None or event.name == name)]
+
+    def next_due(self):
+        while self.queue and self.queue[0][2].cancelled:
+            heapq.heappop(self.queue)
+        return self.queue[0][0] if self.queue else None
+
+    def run_due(self):
+        """Runs every event that is due, then arms the wake-up for the next one.
+
+        A callback that raises is reported on stderr, as Tk reports errors in
+        its own callbacks, and does not stop the other events.
+        """
+        self._wakeup = None
+        self._wakeup_due = None
+        now = self.clock()
+        while self.queue and self.queue[0][0] <= now:
+            _, _, event = heapq.heappop(self.queue)
+            if event.cancelled:
+                continue
+            if event.interval is not None:
+                # Repeats keep their cadence, but a loop that was blocked for
+                # several intervals fires once rather than catching up
+                event.due += event.interval
+                if event.due <= now:
+                    event.due = now + event.interval
+                heapq.heappush(self.queue, (event.due, next(self._sequence), event))
+            try:
+                event.callback()
+            except Exception:
+                traceback.print_exc()
+        self._arm()
+
+    def _arm(self):
+        due = self.next_due()
+        if self.call_later is None or due == self._wakeup_due:
+            return
+        if self._wakeup is not None:
+            self.cancel_call(self._wakeup)
+            self._wakeup = None
+        self._wakeup_due = due
+        if due is not None:
+            delay = max(0, int((due - self.clock()) * 1000) + 1)
+            self._wakeup = self.call_later(delay, self.run_due)
+
+
+class Pomodoro:
+    """Work/break cycles on a Scheduler.
+
+    ``on_phase(ended, started)`` is called at the end of every phase. After
+    ``cycles`` work phases the break is a long one.
+    """
+
+    def __init__(self, scheduler, on_phase, work=25 * 60, short_break=5 * 60, long_break=15 * 60, cycles=4):
+        self.scheduler = scheduler
+        self.on_phase = on_phase
+        self.durations = {"work": work, "short break": short_break, "long break": long_break}
+        self.cycles = cycles
+        # Current phase, or None when stopped, and the one before it
+        self.phase = None
+        self.previous = None
+        self.completed = 0
+        self.event = None
+
+    def start(self):
+        self.stop()
+        self.completed = 0
+        self._begin("work")
+
+    def stop(self):
+        self.scheduler.cancel(self.event)
+        self.event = None
+        self.phase = None
+        self.previous = None
+
+    def remaining(self):
+        if self.event is None:
+            return None
+        return max(0.0, self.event.due - self.scheduler.clock())
+
+    def snooze(self, delay):
+        """Extends the phase that just ended by ``delay`` seconds, putting off the next one."""
+        if self.previous is None:
+            return
+        self.scheduler.cancel(self.event)
+        if self.previous == "work":
+            self.completed -= 1
+        self.phase, self.previous = self.previous, None
+        self.event = self.scheduler.schedule(delay, self._end, name="pomodoro")
+
+    def _begin(self, phase):
+        self.phase = phase
+        self.event = self.scheduler.schedule(self.durations[phase], self._end, name="pomodoro")
+
+    def _end(self):
+        ended = self.phase
+        if ended == "work":
+            self.completed += 1
+            next_phase = "long break" if self.completed % self.cycles == 0 else "short break"
+        else:
+            next_phase = "work"
+        self._begin(next_phase)
+        self.previous = ended
+        self.on_phase(ended, next_phase)
@@ -0,0 +1,180 @@
+import re
+from array import array
+from bisect import bisect_left, insort
+
+# Words are runs of letters and digits, compared case-insensitively, so a
+# note "Fixed JIRA-1234 for ACME" has the tokens fixed, jira, 1234, for, acme
+TOKEN = re.compile(r"\w+")
+# A query is quoted phrases and bare words
+QUERY_PART = re.compile(r'"([^"]*)"?|(\S+)')
+
+
+def tokenize(text):
+    return TOKEN.findall(text.casefold())
+
+
+def parse_query(query):
+    """Splits a search query into ``(kind, tokens)`` clauses, all of which must match.
+
+    ``word`` matches entries with that word, ``word*`` entries with a word
+    starting with it and ``"some words"`` entries with those words next to
+    each other. A bare word made of several tokens, such as a ticket number
+    "JIRA-1234", is a phrase too; with a trailing ``*`` its last token is a
+    prefix and the others only need to be present.
+    """
+    clauses = []
+    for phrase, word in QUERY_PART.findall(query):
+        if phrase:
+            tokens = tokenize(phrase)
+            if len(tokens) == 1:
+                clauses.append(("term", tokens))
+            elif tokens:
+                clauses.append(("phrase", tokens))
+            continue
+        tokens = tokenize(word)
+        if not tokens:
+            continue
+        if word.endswith("*"):
+            clauses.extend(("term", [token]) for token in tokens[:-1])
+            clauses.append(("prefix", tokens[-1:]))
+        elif len(tokens) == 1:
+            clauses.append(("term", tokens))
+        else:
+            clauses.append(("phrase", tokens))
+    return clauses
+
+
+def phrase_pattern(tokens):
+    """Regex for ``tokens`` as consecutive words of casefolded text."""
+    return re.compile(r"(?<!\w)" + r"\W+".join(re.escape(token) for token in tokens) + r"(?!\w)")
+
+
+class SearchIndex:
+    """Inverted index from the words of entry notes and project names to entries.
+
+    Entries are numbered in the order they are added and every word maps to
+    a compact array of those numbers, so a query reads the postings of its
+    words instead of scanning every note. Prefix queries look the words up in
+    a sorted vocabulary, and phrases are checked against the few entries that
+    have all of their words.
+
+    A removed entry keeps its number, marked dead, until dead numbers
+    outnumber live ones; the postings are then renumbered. An edited entry is
+    a removal and an addition.
+    """
+
+    # Dead entry numbers tolerated before the postings are renumbered
+    COMPACT_MINIMUM = 10000
+
+    def __init__(self):
+        # Entry number -> entry ID, or None once removed
+        self.ids = []
+        self.numbers = {}
+        self.postings = {}
+        # Sorted words, built on the first prefix query
+        self.vocabulary = None
+        self.dead = 0
+
+    def rebuild(self, entries):
+        self.ids = []
+        self.numbers = {}
+        self.postings = {}
+        self.vocabulary = None
+        self.dead = 0
+        for entry in entries:
+            self.add(entry)
+
+    def add(self, entry):
+        number = len(self.ids)
+        self.ids.append(entry.id)
+        self.numbers[entry.id] = number
+        postings = self.postings
+        for token in set(tokenize(entry.note)).union(tokenize(entry.project)):
+            numbers = postings.get(token)
+            if numbers is None:
+                numbers = postings[token] = array("I")
+                if self.vocabulary is not None:
+                    insort(self.vocabulary, token)
+            numbers.append(number)
+
+    def remove(self, entry):
+        number = self.numbers.pop(entry.id, None)
+        if number is None:
+            return False
+        self.ids[number] = None
+        self.dead += 1
+        return True
+
+    def apply(self, removed, added):
+        for entry in removed:
+            self.remove(entry)
+        for entry in added:
+            self.add(entry)
+        if self.dead > max(self.COMPACT_MINIMUM, len(self.numbers)):
+            self.compact()
+
+    def compact(self):
+        """Renumbers the live entries and drops words no entry has any more."""
+        renumbered = {}
+        ids = []
+        for number, entry_id in enumerate(self.ids):
+            if entry_id is not None:
+                renumbered[number] = len(ids)
+                ids.append(entry_id)
+        postings = {}
+        for token, numbers in self.postings.items():
+            live = array("I", (renumbered[number] for number in numbers if number in renumbered))
+            if live:
+                postings[token] = live
+        self.ids = ids
+        self.numbers = {entry_id: number for number, entry_id in enumerate(ids)}
+        self.postings = postings
+        self.vocabulary = None
+        self.dead = 0
+
+    def search(self, query, entries):
+        """Returns the IDs of entries matching ``query``, in the order they were added.
+
+        ``entries`` maps IDs to the indexed entries, for checking phrases.
+        An empty query matches nothing.
+        """
+        clauses = parse_query(query)
+        if not clauses:
+            return []
+        candidates = sorted((self.matches(kind, tokens) for kind, tokens in clauses), key=len)
+        found = set(candidates[0])
+        for numbers in candidates[1:]:
+            if not found:
+                break
+            found.intersection_update(numbers)
+
+        ids = self.ids
+        result = [ids[number] for number in sorted(found) if ids[number] is not None]
+        for pattern in [phrase_pattern(tokens) for kind, tokens in clauses if kind == "phrase"]:
+            result = [entry_id for entry_id in result
+                      if pattern.search(entries[entry_id].note.casefold())
+                      or pattern.search(entries[entry_id].project.casefold())]
+        return result
+
+    def matches(self, kind, tokens):
+        # Entry numbers, dead ones included, that can satisfy one clause
+        if kind == "prefix":
+            if self.vocabulary is None:
+                self.vocabulary = sorted(self.postings)
+            prefix = tokens[0]
+            position = bisect_left(self.vocabulary, prefix)
+            numbers = set()
+            while position < len(self.vocabulary) and self.vocabulary[position].startswith(prefix):
+                numbers.update(self.postings[self.vocabulary[position]])
+                position += 1
+            return numbers
+        if kind == "phrase":
+            lists = sorted((self.postings.get(token, ()) for token in tokens), key=len)
+            numbers = set(lists[0])
+            for other in lists[1:]:
+                numbers.intersection_update(other)
+            return numbers
+        return self.postings.get(tokens[0], ())
+
+    def __len__(self):
+        return len(self.numbers)
@@ -0,0 +1,194 @@
+from bisect import bisect_left, bisect_right
+from operator import attrgetter
+
+# Sortable fields and the direction a first click sorts them in
+FIELDS = {"project": False, "date": False, "duration": True, "total_time": True}
+# What the fields other than total time sort by
+VALUES = {"project": attrgetter("project"), "date": attrgetter("start"), "duration": attrgetter("seconds")}
+
+
+class Descending:
+    """Wraps a string key so that it sorts backwards inside a key tuple."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+def field_key(field, descending):
+    # Getter for one part of a key tuple, ascending unless ``descending``
+    if field not in VALUES:
+        raise ValueError(f"Unknown sort field: {field!r}")
+    value = VALUES[field]
+    if not descending:
+        return value
+    if field == "project":
+        return lambda entry: Descending(entry.project)
+    return lambda entry: -value(entry)
+
+
+class SortedView:
+    """Entry IDs kept in one sort order, e.g. by project, then longest first.
+
+    ``order`` is a sequence of ``(field, descending)`` pairs; ties are broken
+    by start time and then by ID, so every entry has a distinct key and an
+    edit or deletion finds its old place by bisection. Only the IDs are
+    stored: keys are computed from the entries when they are compared, so a
+    view costs one list per order, and saves and deletes are sorted
+    insertions instead of a full re-sort.
+
+    A view whose first field is descending is kept ascending and read
+    backwards, so an order and its reverse share the same IDs (``stored``).
+    Total time orders whole projects and can only come first: the IDs are
+    then kept by project and the projects arranged by their totals when the
+    view is read.
+    """
+
+    # Above this many changes in one batch (and one per 500 IDs), a rebuild beats single inserts
+    REBUILD_THRESHOLD = 64
+
+    def __init__(self, order):
+        order = list(dict(order).items())
+        if any(field == "total_time" for field, _ in order[1:]):
+            raise ValueError("Total time can only be the first sort field")
+        self.order = tuple(order)
+        self.by_total = order[0][0] == "total_time"
+        self.total_descending = False
+        if self.by_total:
+            self.total_descending = order[0][1]
+            order[0] = ("project", False)
+        # Read backwards; the stored order flips every direction instead
+        self.reverse = order[0][1]
+        if self.reverse:
+            order = [(field, not descending) for field, descending in order]
+        if "date" not in dict(order):
+            # Ties go the same way as the first field
+            order.append(("date", False))
+        # The order the IDs are kept in, the same for all ways of reading them
+        self.stored = (self.by_total, tuple(order))
+        getters = [field_key(field, descending) for field, descending in order]
+        self.key = lambda entry: tuple([getter(entry) for getter in getters]) + (entry.id,)
+        self.ids = []
+
+    def rebuild(self, entries):
+        """Sorts the IDs of ``entries`` (ID -> TimeEntry) from scratch."""
+        # One stable sort per field, least significant first, is much faster
+        # than comparing key tuples
+        ordered = sorted(entries.values(), key=attrgetter("id"))
+        for field, descending in reversed(self.stored[1]):
+            ordered.sort(key=VALUES[field], reverse=descending)
+        self.ids = [entry.id for entry in ordered]
+
+    def add(self, entry, entries):
+        key = self.key
+        self.ids.insert(bisect_right(self.ids, key(entry), key=lambda entry_id: key(entries[entry_id])), entry.id)
+
+    def remove(self, entry, lookup):
+        # ``lookup`` maps the IDs in the view to the entries they are sorted by
+        key = self.key
+        position = bisect_left(self.ids, key(entry), key=lambda entry_id: key(lookup(entry_id)))
+        if position < len(self.ids) and self.ids[position] == entry.id:
+            del self.ids[position]
+            return True
+        return False
+
+    def apply(self, removed, added, entries):
+        """Applies a batch of changes that ``entries`` already reflects.
+
+        An edited entry is in both lists, the old version in ``removed``.
+        """
+        count = len(removed) + len(added)
+        if count <= self.REBUILD_THRESHOLD or count * 500 <= len(self.ids):
+            # The IDs not yet removed are still in the place of their old entry
+            stale = {entry.id: entry for entry in removed}
+            lookup = lambda entry_id: stale.get(entry_id) or entries[entry_id]
+            for entry in removed:
+                self.remove(entry, lookup)
+                del stale[entry.id]
+            for entry in added:
+                self.add(entry, entries)
+            return
+
+        self.rebuild(entries)
+
+    def ordered(self, entries, totals=None):
+        """Returns all IDs in this order; ``totals`` maps projects to seconds for total time."""
+        if self.by_total:
+            ids = []
+            for start, end in self.project_blocks(entries, totals):
+                ids.extend(self.ids[start:end])
+            return ids
+        return self.ids[::-1] if self.reverse else self.ids
+
+    def arrange(self, ids, entries, totals=None):
+        """Returns ``ids``, e.g. the result of a filter, in this order."""
+        if len(ids) * 20 < len(self.ids):
+            # Few enough to sort on their own
+            key = self.key
+            if self.by_total:
+                rank = {project: position for position, project in enumerate(self.project_order(totals))}
+                ordered = sorted(ids, key=lambda entry_id: (rank[entries[entry_id].project], key(entries[entry_id])))
+            else:
+                ordered = sorted(ids, key=lambda entry_id: key(entries[entry_id]), reverse=self.reverse)
+            return ordered
+        members = set(ids)
+        return [entry_id for entry_id in self.ordered(entries, totals) if entry_id in members]
+
+    def project_order(self, totals):
+        projects = sorted(totals)
+        projects.sort(key=lambda project: totals[project], reverse=self.total_descending)
+        return projects
+
+    def project_blocks(self, entries, totals):
+        # (start, end) slices of the IDs for each project, in order of their totals;
+        # the IDs are sorted by project first
+        project_of = lambda entry_id: entries[entry_id].project
+        blocks = []
+        for project in self.project_order(totals):
+            start = bisect_left(self.ids, project, key=project_of)
+            end = bisect_right(self.ids, project, key=project_of)
+            if start < end:
+                blocks.append((start, end))
+        return blocks
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class SortedViews:
+    """The sorted views in use, built on first use and kept up to date.
+
+    At most ``limit`` views are kept; the one used least recently goes.
+    """
+
+    def __init__(self, limit=4):
+        self.limit = limit
+        self.views = {}
+
+    def view(self, order, entries):
+        view = SortedView(order)
+        kept = self.views.pop(view.stored, None)
+        if kept is not None:
+            # The same IDs, perhaps read the other way round
+            view.ids = kept.ids
+        else:
+            view.rebuild(entries)
+            if len(self.views) >= self.limit:
+                del self.views[next(iter(self.views))]
+        # Most recently used last
+        self.views[view.stored] = view
+        return view
+
+    def apply(self, removed, added, entries):
+        for view in self.views.values():
+            view.apply(removed, added, entries)
+
+    def clear(self):
+        self.views = {}
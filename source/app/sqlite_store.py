@@ -0,0 +1,239 @@
+import csv
+import os
+import sqlite3
+import threading
+
+from entries import TimeEntry
+from storage import decode_record, new_entry_id
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id TEXT NOT NULL UNIQUE,
+    project TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    start INTEGER NOT NULL,
+    end INTEGER NOT NULL,
+    note TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS entries_day ON entries (day);
+CREATE INDEX IF NOT EXISTS entries_project_day ON entries (project, day);
+"""
+
+# Databases from earlier versions kept a full-text index over notes up to
+# date with triggers; the app searches its in-memory SearchIndex instead
+DROP_NOTES_INDEX = """
+DROP TRIGGER IF EXISTS entries_notes_insert;
+DROP TRIGGER IF EXISTS entries_notes_delete;
+DROP TRIGGER IF EXISTS entries_notes_update;
+"""
+
+UPSERT = """
+INSERT INTO entries (id, project, day, start, end, note) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    project = excluded.project, day = excluded.day, start = excluded.start,
+    end = excluded.end, note = excluded.note
+"""
+
+# Rows per transaction during the CSV migration
+MIGRATION_BATCH = 10000
+
+
+def entry_params(entry):
+    return (entry.id, entry.project, entry.day, entry.start, entry.end, entry.note)
+
+
+class SQLiteStore:
+    """Entry store backed by a SQLite database in WAL mode.
+
+    It has the same interface as ``EntryJournal`` and additionally answers
+    report, filter and total queries from the (day) and (project, day)
+    indexes, so callers can skip their Python loops over all entries.
+    """
+
+    def __init__(self, path="time_entries.db", csv_path="time_entries.csv"):
+        self.path = path
+        self.csv_path = csv_path
+        # TimeEntry records keyed by entry ID, in insertion order
+        self.entries = {}
+
+        self._lock = threading.RLock()
+        self._connection = None
+
+    def load(self):
+        for _ in self.load_chunks():
+            pass
+        return list(self.entries.values())
+
+    def load_chunks(self, chunk_size=5000):
+        """Generator form of load(); see ``EntryJournal.load_chunks``."""
+        with self._lock:
+            self._connect()
+            total = self._connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0] or 1
+
+        # A separate read connection, so the shared one stays free for the UI
+        reader = sqlite3.connect(self.path)
+        try:
+            entries = {}
+            cursor = reader.execute("SELECT id, project, start, end, note FROM entries ORDER BY rowid")
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                chunk = [TimeEntry(project, start, end, note, entry_id) for entry_id, project, start, end, note in rows]
+                for entry in chunk:
+                    entries[entry.id] = entry
+                yield [], chunk, len(entries) / total
+        finally:
+            reader.close()
+        self.entries = entries
+
+    def put(self, entry):
+        if not entry.id:
+            entry.id = new_entry_id()
+        with self._lock:
+            with self._connection:
+                self._connection.execute(UPSERT, entry_params(entry))
+            self.entries[entry.id] = entry
+        return entry
+
+    def put_many(self, entries):
+        """Inserts or replaces all of ``entries`` in one transaction."""
+        entries = list(entries)
+        for entry in entries:
+            if not entry.id:
+                entry.id = new_entry_id()
+        with self._lock:
+            with self._connection:
+                self._connection.executemany(UPSERT, (entry_params(entry) for entry in entries))
+            for entry in entries:
+                self.entries[entry.id] = entry
+        return entries
+
+    def delete(self, entry_id):
+        with self._lock:
+            if self.entries.pop(entry_id, None) is None:
+                return False
+            with self._connection:
+                self._connection.execute("DELETE FROM entries WHERE id = ?", (entry_id,))
+        return True
+
+    def sync(self):
+        # Every put and delete is its own committed transaction
+        pass
+
+    def compact(self, background=True):
+        """Checkpoints the write-ahead log into the database file."""
+        with self._lock:
+            self._connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def replace_all(self, entries):
+        """Replaces all entries with ``entries`` in one transaction."""
+        with self._lock:
+            with self._connection:
+                self._connection.execute("DELETE FROM entries")
+                self._connection.executemany(UPSERT, (entry_params(entry) for entry in entries))
+            return self.load()
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def report(self, start_day, end_day, project=None):
+        """Returns ``{project: seconds}`` for entries in the day range."""
+        query = "SELECT project, SUM(end - start) FROM entries WHERE day BETWEEN ? AND ?"
+        params = [start_day, end_day]
+        if project is not None:
+            query += " AND project = ?"
+            params.append(project)
+        with self._lock:
+            return dict(self._connection.execute(query + " GROUP BY project ORDER BY MIN(rowid)", params))
+
+    def filter_ids(self, project=None, start_day=None, end_day=None):
+        """Returns matching entry IDs in date order (or insertion order for a project filter)."""
+        clauses, params = [], []
+        if project is not None:
+            clauses.append("project = ?")
+            params.append(project)
+        if start_day is not None:
+            clauses.append("day BETWEEN ? AND ?")
+            params += [start_day, end_day]
+        query = "SELECT id FROM entries"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY start, rowid" if start_day is not None else " ORDER BY rowid"
+        with self._lock:
+            return [row[0] for row in self._connection.execute(query, params)]
+
+    def daily_totals(self):
+        """Returns ``(project, day, seconds, count)`` rows for all entries."""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT project, day, SUM(end - start), COUNT(*) FROM entries GROUP BY project, day").fetchall()
+
+    def _connect(self):
+        if self._connection is not None:
+            return
+        if not os.path.exists(self.path):
+            self._migrate_csv()
+        # The connection is shared with background workers; access is serialised by the lock
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+        self._connection.executescript(DROP_NOTES_INDEX)
+        try:
+            self._connection.execute("DROP TABLE IF EXISTS entries_notes")
+        except sqlite3.OperationalError:
+            # An FTS5 table can only be dropped by a SQLite built with FTS5;
+            # without its triggers it is no longer written to
+            pass
+
+    def _migrate_csv(self):
+        # One-time import of time_entries.csv plus its journal, streamed in
+        # batches into a scratch database that only becomes the real one once
+        # complete. A migration that fails part-way is started again next time.
+        if not os.path.exists(self.csv_path):
+            return
+        partial = self.path + ".migrating"
+        for path in (partial, partial + "-journal"):
+            if os.path.exists(path):
+                os.remove(path)
+        connection = sqlite3.connect(partial)
+        try:
+            connection.executescript(SCHEMA)
+            self._copy_csv(connection)
+        finally:
+            connection.close()
+        os.replace(partial, self.path)
+
+    def _copy_csv(self, connection):
+        with open(self.csv_path, "r", newline="") as file:
+            batch = []
+            for row in csv.reader(file):
+                if not row:
+                    continue
+                entry = TimeEntry.from_row(row)
+                if not entry.id:
+                    entry.id = new_entry_id()
+                batch.append(entry_params(entry))
+                if len(batch) >= MIGRATION_BATCH:
+                    with connection:
+                        connection.executemany(UPSERT, batch)
+                    batch = []
+            with connection:
+                connection.executemany(UPSERT, batch)
+
+        for journal_path in (self.csv_path + ".journal.1", self.csv_path + ".journal"):
+            if not os.path.exists(journal_path):
+                continue
+            with open(journal_path, "rb") as file, connection:
+                for line in file:
+                    record = decode_record(line)
+                    if record is None:
+                        break
+                    if record["op"] == "put":
+                        connection.execute(UPSERT, entry_params(TimeEntry.from_row(record["row"])))
+                    elif record["op"] == "del":
+                        connection.execute("DELETE FROM entries WHERE id = ?", (record["id"],))
@@ -0,0 +1,47 @@
+import importlib
+import sys
+import time
+
+
+class StartupProfile:
+    """Cold-start timing: named milestones and the cost of each deferred import."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        # (name, seconds since start) in the order they happened
+        self.marks = []
+        # Seconds spent importing each module loaded through import_module()
+        self.imports = {}
+
+    def mark(self, name):
+        self.marks.append((name, time.perf_counter() - self.started))
+
+    def elapsed(self, name):
+        for mark, seconds in self.marks:
+            if mark == name:
+                return seconds
+        return None
+
+    def import_module(self, name):
+        """Imports ``name`` on first use and records how long it took."""
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        self.imports[name] = time.perf_counter() - start
+        return module
+
+    def report(self):
+        lines = ["Startup timing (since process start of llamatime):"]
+        for name, seconds in self.marks:
+            lines.append(f"  {name:<28}{seconds * 1000:9.1f} ms")
+        if self.imports:
+            lines.append("Deferred imports:")
+            for name, seconds in sorted(self.imports.items(), key=lambda item: -item[1]):
+                lines.append(f"  {name:<28}{seconds * 1000:9.1f} ms")
+        return "\n".join(lines)
+
+
+# Shared by the app so that every module records into the same profile
+profile = StartupProfile()
@@ -0,0 +1,636 @@
+import csv
+import json
+import os
+import threading
+import uuid
+import zlib
+
+from entries import TimeEntry
+from locks import FileLock, same_file
+
+
+def new_entry_id():
+    return uuid.uuid4().hex
+
+
+def open_store(path="time_entries.csv"):
+    """Opens the entry store selected by LLAMATIME_STORAGE ("csv", "sqlite", "binary" or "partitioned").
+
+    Without the variable, an existing SQLite database, binary entry file or
+    partition directory next to ``path`` wins.
+    """
+    backend = os.environ.get("LLAMATIME_STORAGE", "").lower()
+    db_path = os.path.splitext(path)[0] + ".db"
+    bin_path = os.path.splitext(path)[0] + ".bin"
+    partitions_path = os.path.splitext(path)[0]
+    if backend == "sqlite" or (not backend and os.path.exists(db_path)):
+        from sqlite_store import SQLiteStore
+        return SQLiteStore(db_path, csv_path=path)
+    if backend == "binary" or (not backend and os.path.exists(bin_path)):
+        from entry_file import BinaryJournal
+        return BinaryJournal(bin_path, csv_path=path)
+    if backend == "partitioned" or (not backend and os.path.exists(os.path.join(partitions_path, "manifest.json"))):
+        from partitions import PartitionedStore
+        return PartitionedStore(partitions_path, csv_path=path)
+    return EntryJournal(path)
+
+
+def decode_record(line):
+    """Decodes one "<crc32> <json>\\n" journal line, or returns None if it is torn."""
+    if not line.endswith(b"\n"):
+        return None
+    checksum, _, payload = line.rstrip(b"\n").partition(b" ")
+    try:
+        if int(checksum, 16) != zlib.crc32(payload):
+            return None
+        return json.loads(payload)
+    except ValueError:
+        return None
+
+
+def encode_record(record):
+    payload = json.dumps(record, separators=(",", ":")).encode("utf-8")
+    return b"%08x %s\n" % (zlib.crc32(payload), payload)
+
+
+def write_csv(path, entries):
+    """Writes ``entries`` as CSV rows to a temporary file and renames it to ``path``.
+
+    Returns the number of bytes written.
+    """
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", newline="") as file:
+        csv.writer(file).writerows(entry.to_row() for entry in entries)
+        file.flush()
+        os.fsync(file.fileno())
+        size = file.tell()
+    os.replace(temp_path, path)
+    return size
+
+
+def journal_entries(path):
+    """Returns the entries written or deleted by a snapshot's journal.
+
+    The result maps entry ID to the final TimeEntry, or None if the entry was
+    deleted. Unlike ``EntryJournal`` it never truncates a torn journal tail.
+    """
+    changes = {}
+    for journal_path in (path + ".journal.1", path + ".journal"):
+        try:
+            file = open(journal_path, "rb")
+        except FileNotFoundError:
+            continue
+        with file:
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                record = decode_record(line)
+                if record is None:
+                    continue
+                if record["op"] == "put":
+                    entry = TimeEntry.from_row(record["row"])
+                    changes[entry.id] = entry
+                elif record["op"] == "del":
+                    changes[record["id"]] = None
+    return changes
+
+
+class EntryJournal:
+    """Append-only storage for time entries.
+
+    The snapshot file keeps the familiar ``time_entries.csv`` layout with the
+    stable entry ID appended as a sixth column. Every save or delete appends a
+    single record to ``<snapshot>.journal`` so its cost does not depend on the
+    size of the history. The journal is folded back into the snapshot by a
+    background compaction once it grows past ``compact_threshold`` records.
+
+    Several processes can use the same files. Appends, journal rotations and
+    restores take the write lock (``<snapshot>.lock``) for a few system
+    calls; compactions take ``<snapshot>.compact.lock``, which loads share,
+    so the snapshot is not replaced while it is read. A compaction writes
+    its own entries plus every record the others appended, so no process
+    loses another's saves. ``poll_changes()`` reads the journal tail to
+    pick up changes made elsewhere; for the same entry the record appended
+    last wins. Journals are numbered, so a process that missed a whole one,
+    or a restore, reads the snapshot again instead.
+    """
+
+    def __init__(self, path="time_entries.csv", fsync_interval=1.0, compact_threshold=5000):
+        self.path = path
+        self.journal_path = path + ".journal"
+        # Journal being folded into the snapshot by a running compaction
+        self.compacting_path = path + ".journal.1"
+        self.fsync_interval = fsync_interval
+        self.compact_threshold = compact_threshold
+
+        # TimeEntry records keyed by entry ID, in insertion order
+        self.entries = {}
+        self.journal_records = 0
+        # Running totals of file I/O, for diagnostics
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+        self._lock = threading.RLock()
+        self._write_lock = FileLock(path + ".lock")
+        self._compaction_lock = FileLock(path + ".compact.lock")
+        self._journal = None
+        # Read position in the journal, for records other processes append
+        self._tail = None
+        self._tail_number = 0
+        self._dirty = False
+        self._closed = False
+        self._compaction = None
+        self._flush_wakeup = threading.Event()
+        self._flusher = None
+
+    def load(self):
+        """Reads the snapshot and replays the journal tail.
+
+        Returns the entries as a list of TimeEntry records.
+        """
+        for _ in self.load_chunks():
+            pass
+        return list(self.entries.values())
+
+    def load_chunks(self, chunk_size=5000):
+        """Generator form of load() that can run on a worker thread.
+
+        Yields ``(removed, added, progress)`` with ``progress`` between 0 and 1:
+        first the snapshot in chunks of new entries, then the net changes made
+        by the journal tail. ``self.entries`` is only replaced at the end, so
+        the store can be read from another thread while this runs.
+        """
+        self._wait_for_compaction()
+        self._prepare_snapshot()
+        # No other process replaces the snapshot while it is read
+        self._compaction_lock.acquire(shared=True)
+        try:
+            snapshot = self._snapshot_stat()
+            entries = {}
+            upgraded = False
+            for chunk, progress in self._read_snapshot(chunk_size):
+                upgraded = self._assign_ids(chunk) or upgraded
+                entries.update((entry.id, entry) for entry in chunk)
+                yield [], chunk, progress
+
+            # Entries already yielded that a newer snapshot replaced
+            superseded = []
+            if upgraded:
+                # Rows from an older file got fresh IDs. Persisting them rewrites
+                # the snapshot, which takes the exclusive lock; another process
+                # may have done that in between, with IDs of its own to keep.
+                self._compaction_lock.release()
+                self._compaction_lock.acquire()
+                current = self._snapshot_stat()
+                if current is None or not os.path.samestat(snapshot, current):
+                    superseded = list(entries.values())
+                    entries = {}
+                    upgraded = False
+                    for chunk, _ in self._read_snapshot(chunk_size):
+                        upgraded = self._assign_ids(chunk) or upgraded
+                        entries.update((entry.id, entry) for entry in chunk)
+
+            # Entries as they were in the snapshot, for everything the journal touches
+            originals = {}
+            with self._lock, self._write_lock:
+                journal_records = 0
+                for path in (self.compacting_path, self.journal_path):
+                    journal_records += self._replay(path, entries, originals)
+
+                self.entries = entries
+                self.journal_records = journal_records
+                self._open_journal()
+                self._open_tail()
+                if upgraded:
+                    # Persist the fresh IDs right away so that journal records
+                    # written from now on can refer to them.
+                    self._compact_now()
+        finally:
+            self._compaction_lock.release()
+
+        if superseded:
+            yield superseded, list(entries.values()), 1.0
+            return
+        removed, added = self._changes(entries, originals)
+        if removed or added:
+            yield removed, added, 1.0
+
+    def _prepare_snapshot(self):
+        # Called by load_chunks() before it reads the snapshot, without locks
+        pass
+
+    @staticmethod
+    def _assign_ids(chunk):
+        # Gives rows from an older file without IDs fresh ones; returns whether there were any
+        assigned = False
+        for entry in chunk:
+            if not entry.id:
+                entry.id = new_entry_id()
+                assigned = True
+        return assigned
+
+    def _snapshot_stat(self):
+        try:
+            return os.stat(self.path)
+        except FileNotFoundError:
+            return None
+
+    def poll_changes(self):
+        """Applies the saves and deletes other processes made since the last call to ``entries``.
+
+        Returns ``(removed, added)`` like the last chunk of ``load_chunks()``;
+        both are empty, after two ``stat()`` calls, when nothing changed.
+        """
+        with self._lock:
+            if self._tail is None or (same_file(self._tail, self.journal_path)
+                                      and self._tail.tell() == os.fstat(self._tail.fileno()).st_size):
+                return [], []
+            originals = {}
+            with self._write_lock:
+                replayed = self._catch_up(self.entries, originals)
+            if replayed is None:
+                self._resync(originals)
+            else:
+                self.journal_records += replayed
+        return self._changes(self.entries, originals)
+
+    @staticmethod
+    def _changes(entries, originals):
+        removed = [entry for entry_id, entry in originals.items() if entry is not None and entries.get(entry_id) is not entry]
+        added = [entries[entry_id] for entry_id, entry in originals.items() if entry_id in entries and entries[entry_id] is not entry]
+        return removed, added
+
+    def _read_snapshot(self, chunk_size):
+        # Yields (entries, fraction of the file read) from the CSV snapshot
+        chunk = []
+        try:
+            size = os.path.getsize(self.path) or 1
+            with open(self.path, "r", newline="") as file:
+                for row in csv.reader(file):
+                    if not row:
+                        continue
+                    chunk.append(TimeEntry.from_row(row))
+                    if len(chunk) >= chunk_size:
+                        yield chunk, file.buffer.tell() / size
+                        chunk = []
+                self.bytes_read += file.buffer.tell()
+        except FileNotFoundError:
+            pass
+        if chunk:
+            yield chunk, 1.0
+
+    def put(self, entry):
+        """Inserts or replaces one entry. A missing ID is assigned here.
+
+        Stored entries are never modified in place; an edit is a new TimeEntry
+        with the same ID.
+        """
+        if not entry.id:
+            entry.id = new_entry_id()
+        with self._lock:
+            self.entries[entry.id] = entry
+            self._append({"op": "put", "row": entry.to_row()})
+        return entry
+
+    def put_many(self, entries):
+        """Inserts or replaces all of ``entries`` with a single journal write, e.g. for an import."""
+        entries = list(entries)
+        for entry in entries:
+            if not entry.id:
+                entry.id = new_entry_id()
+        with self._lock:
+            for entry in entries:
+                self.entries[entry.id] = entry
+            self._append(*({"op": "put", "row": entry.to_row()} for entry in entries))
+        return entries
+
+    def delete(self, entry_id):
+        with self._lock:
+            if self.entries.pop(entry_id, None) is None:
+                return False
+            self._append({"op": "del", "id": entry_id})
+        return True
+
+    def sync(self):
+        """Flushes buffered journal records and fsyncs them to disk."""
+        with self._lock:
+            if self._journal is not None and self._dirty:
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+                self._dirty = False
+
+    def compact(self, background=True):
+        """Folds the journal into a fresh snapshot file."""
+        with self._lock:
+            if self._journal is None:
+                # Not loaded (or already closed): there is nothing consistent to write
+                return None
+            if self._compaction is not None and self._compaction.is_alive():
+                return self._compaction
+            # Another process compacting or loading; the journal is folded
+            # at a later save instead
+            if not self._compaction_lock.acquire(blocking=False):
+                return None
+            try:
+                with self._write_lock:
+                    entries = self._rotate_journal()
+            except BaseException:
+                self._compaction_lock.release()
+                raise
+        if not background:
+            self._write_snapshot(entries)
+            return None
+        self._compaction = threading.Thread(target=self._write_snapshot, args=(entries,), daemon=True)
+        self._compaction_lock.hand_over(self._compaction)
+        self._compaction.start()
+        return self._compaction
+
+    def replace_all(self, entries):
+        """Replaces all entries with ``entries``, e.g. from a point-in-time backup."""
+        with self._lock:
+            self._wait_for_compaction()
+            with self._compaction_lock, self._write_lock:
+                number = self._current_journal_number() + 1
+                self._close_journal()
+                self.bytes_written += self._write_snapshot_file(self.path, entries)
+                for path in (self.compacting_path, self.journal_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+                # Tells other processes to read everything again
+                with open(self.journal_path, "ab") as file:
+                    file.write(encode_record({"op": "journal", "number": number}))
+                    file.write(encode_record({"op": "reset"}))
+            return self.load()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        self._flush_wakeup.set()
+        self._wait_for_compaction()
+        with self._lock:
+            self._close_journal()
+            if self._tail is not None:
+                self._tail.close()
+                self._tail = None
+            self._write_lock.close()
+            self._compaction_lock.close()
+
+    def _replay(self, path, entries, originals):
+        # Called with the write lock held. A torn record at the end of the
+        # file, from an interrupted write, is cut off so later appends start
+        # from a clean line.
+        try:
+            file = open(path, "rb")
+        except FileNotFoundError:
+            return 0
+        with file:
+            # Records before a restore's reset are already covered by the snapshot
+            replayed = self._read_records(file, entries, originals, reset=False)
+            good_offset = file.tell()
+            truncated = good_offset < file.seek(0, os.SEEK_END)
+        if truncated:
+            with open(path, "r+b") as file:
+                file.truncate(good_offset)
+        return replayed
+
+    def _read_records(self, file, entries, originals, reset=True):
+        # Applies the "<crc32> <json>\n" records from the file position on and
+        # returns how many there were. An unfinished last line is left to be
+        # read again later; a corrupt line, which a process killed while
+        # writing leaves behind, is skipped. Stops before a restore's reset
+        # record and returns None, as the snapshot has to be read again.
+        replayed = 0
+        while True:
+            position = file.tell()
+            line = file.readline()
+            if not line.endswith(b"\n"):
+                file.seek(position)
+                return replayed
+            self.bytes_read += len(line)
+            record = decode_record(line)
+            if record is None:
+                continue
+            if record["op"] == "put":
+                entry = TimeEntry.from_row(record["row"])
+                originals.setdefault(entry.id, entries.get(entry.id))
+                entries[entry.id] = entry
+            elif record["op"] == "del":
+                originals.setdefault(record["id"], entries.get(record["id"]))
+                entries.pop(record["id"], None)
+            elif record["op"] == "reset" and reset:
+                file.seek(position)
+                return None
+            replayed += 1
+
+    def _open_tail(self):
+        # Called with the write lock held, once the journal has been replayed
+        if self._tail is not None:
+            self._tail.close()
+        self._tail = open(self.journal_path, "rb")
+        self._tail_number = self._journal_number(self._tail)
+        self._tail.seek(0, os.SEEK_END)
+
+    def _catch_up(self, entries, originals):
+        # Called with the write lock held. Reads what was appended since the
+        # last call; returns the number of records or None, having applied
+        # only part of the changes, when the snapshot has to be read again
+        tail = self._tail
+        replayed, self._tail, self._tail_number = self._follow(tail, self._tail_number, entries, originals)
+        if self._tail is not tail:
+            tail.close()
+        return replayed
+
+    def _unread_changes(self, entries):
+        # Applies what poll_changes() has not read yet to ``entries``, a copy,
+        # leaving the tail where it is. Returns False if the snapshot has to
+        # be read again instead.
+        position = self._tail.tell()
+        replayed, tail, _ = self._follow(self._tail, self._tail_number, entries, {})
+        if tail is not self._tail:
+            tail.close()
+        self._tail.seek(position)
+        return replayed is not None
+
+    def _follow(self, tail, number, entries, originals):
+        # Reads the records from the position of ``tail`` on, following the
+        # journal when another process's compaction or restore replaced it:
+        # nothing is appended to the old one after that. Returns the number
+        # of records, or None after a restore or when the journal was
+        # replaced more than once, as the records in between are only in the
+        # snapshot now; then the file and journal number it stopped at.
+        # ``tail`` itself is left open.
+        replayed = 0
+        while True:
+            records = self._read_records(tail, entries, originals)
+            if records is None:
+                return None, tail, number
+            replayed += records
+            if same_file(tail, self.journal_path):
+                return replayed, tail, number
+            following = open(self.journal_path, "rb")
+            following_number = self._journal_number(following)
+            if following_number != number + 1:
+                following.close()
+                return None, tail, number
+            if tail is not self._tail:
+                tail.close()
+            tail, number = following, following_number
+
+    def _resync(self, originals):
+        # Reads the snapshot and the journals again and applies the
+        # differences to ``self.entries``, for poll_changes() when catching
+        # up record by record is not possible
+        self._wait_for_compaction()
+        self._compaction_lock.acquire(shared=True)
+        try:
+            with self._write_lock:
+                entries, self.journal_records = self._read_all()
+                self._open_tail()
+        finally:
+            self._compaction_lock.release()
+        current = self.entries
+        for entry_id in set(current).union(entries):
+            entry = entries.get(entry_id)
+            if current.get(entry_id) != entry:
+                originals.setdefault(entry_id, current.get(entry_id))
+                if entry is None:
+                    del current[entry_id]
+                else:
+                    current[entry_id] = entry
+
+    def _read_all(self):
+        # Called with the write lock and the (shared or exclusive) compaction
+        # lock held; returns the entries and the number of journal records
+        entries = {}
+        for chunk, _ in self._read_snapshot(5000):
+            entries.update((entry.id, entry) for entry in chunk)
+        replayed = 0
+        for path in (self.compacting_path, self.journal_path):
+            replayed += self._replay(path, entries, {})
+        return entries, replayed
+
+    @staticmethod
+    def _journal_number(file):
+        # Journals are numbered from their first record on, so that a process
+        # following them notices one it missed; the first journal is number 0
+        position = file.tell()
+        file.seek(0)
+        line = file.readline()
+        file.seek(position)
+        record = decode_record(line) if line.endswith(b"\n") else None
+        return record["number"] if record is not None and record["op"] == "journal" else 0
+
+    def _append(self, *records):
+        # All records go to the journal in one write
+        data = b"".join(encode_record(record) for record in records)
+        with self._write_lock:
+            if not same_file(self._journal, self.journal_path):
+                # Rotated by another process's compaction or restore
+                self._open_journal()
+            size = os.fstat(self._journal.fileno()).st_size
+            # Whether the tail has read every record so far, ending on a complete line
+            caught_up = same_file(self._tail, self.journal_path) and self._tail.tell() == size
+            if size and not caught_up:
+                with open(self.journal_path, "rb") as file:
+                    file.seek(size - 1)
+                    if file.read(1) != b"\n":
+                        # Ends the line a killed process left unfinished
+                        self._journal.write(b"\n")
+            self._journal.write(data)
+            self._journal.flush()
+            if caught_up:
+                # No need to read these records back
+                self._tail.seek(0, os.SEEK_END)
+        self.bytes_written += len(data)
+        self._dirty = True
+        self.journal_records += len(records)
+        self._start_flusher()
+        if self.journal_records >= self.compact_threshold:
+            self.compact()
+
+    def _open_journal(self, number=None):
+        # A new journal gets its number, see _journal_number()
+        self._close_journal()
+        self._journal = open(self.journal_path, "ab")
+        self._closed = False
+        if number is not None:
+            self._journal.write(encode_record({"op": "journal", "number": number}))
+            self._journal.flush()
+
+    def _current_journal_number(self):
+        try:
+            with open(self.journal_path, "rb") as file:
+                return self._journal_number(file)
+        except FileNotFoundError:
+            return 0
+
+    def _close_journal(self):
+        if self._journal is not None:
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._journal.close()
+            self._journal = None
+            self._dirty = False
+
+    def _rotate_journal(self):
+        # Called with all locks held: the live journal becomes the compacting
+        # journal and a fresh one takes new records while the snapshot is written.
+        # The snapshot has the records other processes appended too.
+        entries = dict(self.entries)
+        if not self._unread_changes(entries):
+            entries, _ = self._read_all()
+        number = self._current_journal_number() + 1
+        self._close_journal()
+        if os.path.exists(self.compacting_path):
+            # A previous compaction did not finish; fold both into the next snapshot.
+            with open(self.compacting_path, "ab") as target, open(self.journal_path, "rb") as source:
+                target.write(source.read())
+            os.remove(self.journal_path)
+        elif os.path.exists(self.journal_path):
+            os.replace(self.journal_path, self.compacting_path)
+        self._open_journal(number)
+        self.journal_records = 1
+        return list(entries.values())
+
+    def _compact_now(self):
+        # Called by load_chunks(), which holds the locks, the compaction lock exclusively
+        self._fold_journal(self._rotate_journal())
+
+    def _write_snapshot(self, entries):
+        # Runs with the compaction lock held, and releases it
+        try:
+            self._fold_journal(entries)
+        finally:
+            self._compaction_lock.release()
+
+    def _fold_journal(self, entries):
+        self.bytes_written += self._write_snapshot_file(self.path, entries)
+        # Records in the compacting journal are all part of the new snapshot
+        if os.path.exists(self.compacting_path):
+            os.remove(self.compacting_path)
+
+    def _write_snapshot_file(self, path, entries):
+        # The snapshot format; BinaryJournal overrides it
+        return write_csv(path, entries)
+
+    def _wait_for_compaction(self):
+        compaction = self._compaction
+        if compaction is not None and compaction is not threading.current_thread():
+            compaction.join()
+        self._compaction = None
+
+    def _start_flusher(self):
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        # Group fsyncs: records written within one interval share a single fsync
+        while True:
+            self._flush_wakeup.wait(self.fsync_interval)
+            self._flush_wakeup.clear()
+            self.sync()
+            with self._lock:
+                if self._closed or not self._dirty:
+                    self._flusher = None
+                    return
@@ -0,0 +1,198 @@
+"""Delta sync of time entries between devices through a sync server.
+
+Every entry saved or deleted on this device is stamped with a version
+``[counter, device]`` from a Lamport clock and queued. A sync sends the
+queued changes in compressed batches together with the cursor of the last
+server change this device has seen, and gets back only the changes made
+elsewhere since then, so its cost follows the size of the change and not
+the size of the history.
+
+Conflicts are resolved the same way everywhere: for each entry ID the
+change with the highest version wins, i.e. the later edit, with ties broken
+by device ID. Deletions are changes like any other (tombstones), so all
+devices converge whatever order they sync in. See sync_client.py for the
+HTTP client and sync_server.py for the server side.
+"""
+import json
+import os
+import uuid
+import zlib
+
+from storage import decode_record, encode_record
+
+PROTOCOL_VERSION = 1
+# Local changes sent per request, and server changes asked for per response
+BATCH_SIZE = 500
+
+
+class SyncError(Exception):
+    pass
+
+
+def encode_body(document):
+    return zlib.compress(json.dumps(document, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def decode_body(data, encoding=None):
+    if encoding == "deflate":
+        data = zlib.decompress(data)
+    return json.loads(data)
+
+
+def newer(version, other):
+    """Whether ``version`` beats ``other`` (None for no version at all)."""
+    return other is None or tuple(version) > tuple(other)
+
+
+class SyncState:
+    """This device's side of sync: its ID, clock, cursor, entry versions and queued changes.
+
+    The state is a JSON snapshot at ``path`` plus an append-only journal of
+    "<crc32> <json>" records like the entry journal's, so recording a change
+    costs one appended line; the snapshot is rewritten once the journal
+    grows past ``compact_threshold`` records. Only used on the Tk thread.
+    """
+
+    def __init__(self, path="sync_state.json", compact_threshold=5000):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.compact_threshold = compact_threshold
+        self.device = None
+        self.url = None
+        # Whether the entries that existed before sync was set up have been queued
+        self.seeded = False
+        self.clock = 0
+        self.cursor = 0
+        # Entry ID -> [counter, device] of the change this device has
+        self.versions = {}
+        # Entry ID -> change not yet sent to the server
+        self.pending = {}
+        self.journal_records = 0
+
+    @property
+    def enabled(self):
+        return self.url is not None
+
+    def load(self):
+        try:
+            with open(self.path, "r") as file:
+                snapshot = json.load(file)
+        except FileNotFoundError:
+            snapshot = {}
+        self.device = snapshot.get("device") or uuid.uuid4().hex
+        self.url = snapshot.get("url")
+        self.seeded = snapshot.get("seeded", False)
+        self.clock = snapshot.get("clock", 0)
+        self.cursor = snapshot.get("cursor", 0)
+        self.versions = snapshot.get("versions", {})
+        self.pending = snapshot.get("pending", {})
+        self.journal_records = 0
+        try:
+            with open(self.journal_path, "rb") as file:
+                for line in file:
+                    record = decode_record(line)
+                    if record is None:
+                        break
+                    self._replay(record)
+                    self.journal_records += 1
+        except FileNotFoundError:
+            pass
+        if not snapshot:
+            self.save()
+        return self
+
+    def configure(self, url):
+        self.url = url
+        self._append({"op": "url", "url": url})
+
+    def seed(self, entries):
+        """Queues every existing entry once, when sync is first set up, and saves the snapshot."""
+        self._queue(entries)
+        self.seeded = True
+        self.save()
+
+    def local_change(self, entry_id, entry=None, day=None):
+        """Queues a save of ``entry``, or with no entry the deletion of ``entry_id`` (on ``day``)."""
+        self.clock += 1
+        change = {"id": entry_id, "row": entry.to_row() if entry is not None else None,
+                  "day": entry.day if entry is not None else day, "version": [self.clock, self.device]}
+        self._replay({"op": "local", "change": change})
+        self._append({"op": "local", "change": change})
+
+    def local_changes(self, entries):
+        """Queues saves of ``entries``; for many, e.g. from an import, the snapshot is saved once instead."""
+        if len(entries) < self.compact_threshold:
+            for entry in entries:
+                self.local_change(entry.id, entry)
+            return
+        self._queue(entries)
+        self.save()
+
+    def remote_change(self, change):
+        """Records a change from the server; returns whether it should be applied locally."""
+        self.clock = max(self.clock, change["version"][0])
+        if not newer(change["version"], self.versions.get(change["id"])):
+            return False
+        record = {"op": "remote", "id": change["id"], "version": change["version"]}
+        self._replay(record)
+        self._append(record)
+        return True
+
+    def batch(self, size=BATCH_SIZE):
+        return list(self.pending.values())[:size]
+
+    def acknowledge(self, sent, cursor):
+        """Drops sent changes (unless changed again since) and moves the cursor.
+
+        Changes the server rejected are dropped too: it sends back the change
+        that beat them.
+        """
+        record = {"op": "ack", "sent": [[change["id"], change["version"]] for change in sent], "cursor": cursor}
+        self._replay(record)
+        self._append(record)
+
+    def save(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as file:
+            json.dump({"device": self.device, "url": self.url, "seeded": self.seeded, "clock": self.clock,
+                       "cursor": self.cursor, "versions": self.versions, "pending": self.pending}, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self.journal_records = 0
+
+    def _queue(self, entries):
+        for entry in entries:
+            self.clock += 1
+            self._replay({"op": "local", "change": {"id": entry.id, "row": entry.to_row(), "day": entry.day,
+                                                    "version": [self.clock, self.device]}})
+
+    def _replay(self, record):
+        op = record["op"]
+        if op == "local":
+            change = record["change"]
+            self.clock = max(self.clock, change["version"][0])
+            self.versions[change["id"]] = change["version"]
+            self.pending[change["id"]] = change
+        elif op == "remote":
+            self.clock = max(self.clock, record["version"][0])
+            self.versions[record["id"]] = record["version"]
+            self.pending.pop(record["id"], None)
+        elif op == "ack":
+            for entry_id, version in record["sent"]:
+                change = self.pending.get(entry_id)
+                if change is not None and change["version"] == version:
+                    del self.pending[entry_id]
+            self.cursor = record["cursor"]
+        elif op == "url":
+            self.url = record["url"]
+
+    def _append(self, record):
+        # Called after the record has been applied, so a compaction includes it
+        with open(self.journal_path, "ab") as file:
+            file.write(encode_record(record))
+        self.journal_records += 1
+        if self.journal_records >= self.compact_threshold:
+            self.save()
@@ -0,0 +1,68 @@
+"""HTTP client for the sync protocol in sync.py.
+
+Kept apart from sync.py so that the app only imports http.client once a
+sync actually runs.
+"""
+import http.client
+import socket
+from urllib.parse import urlsplit
+
+from sync import BATCH_SIZE, PROTOCOL_VERSION, SyncError, decode_body, encode_body
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class SyncClient:
+    """Talks to a sync server at ``http://host:port`` or ``unix:/path/to/socket``.
+
+    Safe to use from a worker thread; it keeps no entry state of its own.
+    """
+
+    def __init__(self, url, timeout=30):
+        self.url = url
+        self.timeout = timeout
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def connection(self):
+        parts = urlsplit(self.url)
+        if parts.scheme == "unix":
+            return UnixHTTPConnection(parts.path, self.timeout)
+        if parts.scheme == "http" and parts.hostname:
+            return http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=self.timeout)
+        raise SyncError(f"Unsupported sync server address: {self.url}")
+
+    def exchange(self, device, cursor, changes, limit=BATCH_SIZE):
+        """Sends ``changes`` and returns the server's response.
+
+        The response has the changes other devices made after ``cursor``
+        (at most ``limit``), the new cursor, the IDs of the accepted changes
+        and whether more changes are waiting.
+        """
+        body = encode_body({"protocol": PROTOCOL_VERSION, "device": device, "cursor": cursor,
+                            "changes": changes, "limit": limit})
+        connection = self.connection()
+        try:
+            connection.request("POST", "/sync", body, {"Content-Type": "application/json",
+                                                       "Content-Encoding": "deflate",
+                                                       "Accept-Encoding": "deflate"})
+            response = connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            raise SyncError(f"Could not reach the sync server: {e}")
+        finally:
+            connection.close()
+        self.bytes_sent += len(body)
+        self.bytes_received += len(data)
+        if response.status != 200:
+            raise SyncError(f"The sync server answered {response.status} {response.reason}")
+        return decode_body(data, response.getheader("Content-Encoding"))
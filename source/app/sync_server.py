@@ -0,0 +1,216 @@
+"""Reference sync server for testing sync without a network.
+
+    python -m llamatime sync-server [--host 127.0.0.1] [--port 8765]
+                                    [--unix PATH] [--data sync_server.log]
+
+A small asyncio HTTP server with one endpoint, ``POST /sync``, speaking the
+protocol of sync.py with deflate-compressed JSON bodies. It keeps, for
+every entry ID, the change with the highest version, numbered with a
+sequence number that clients use as their cursor. Accepted changes are
+appended to ``--data`` and replayed on start; once most of them have been
+superseded by later changes to the same entries, the file is rewritten
+with only the latest ones.
+
+This module does not import tkinter and can also be run on its own.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import zlib
+from bisect import bisect_right
+
+from storage import decode_record, encode_record
+from sync import BATCH_SIZE, PROTOCOL_VERSION, decode_body, encode_body, newer
+
+# Requests larger than this are refused
+MAX_BODY = 64 * 1024 * 1024
+# Superseded changes kept before compacting, at least; otherwise one per
+# latest change
+MIN_STALE_CHANGES = 1000
+
+
+class SyncServer:
+    """The server's state and protocol; ``serve()`` puts it on a socket."""
+
+    def __init__(self, path=None):
+        self.path = path
+        # Entry ID -> latest accepted change, with its "seq"
+        self.changes = {}
+        # Sequence numbers and entry IDs in the order they were accepted; an
+        # ID listed again later has moved on and is skipped at its old place
+        self.seqs = []
+        self.ids = []
+        self.seq = 0
+        self._log = None
+        if path is not None:
+            self._replay()
+            self._log = open(path, "ab")
+        self._compact_if_stale()
+
+    def handle(self, request):
+        """Applies a sync request and returns the response document."""
+        if request.get("protocol") != PROTOCOL_VERSION:
+            raise ValueError(f"Unsupported protocol version {request.get('protocol')!r}")
+        accepted = []
+        for change in request.get("changes", []):
+            if newer(change["version"], self.changes.get(change["id"], {}).get("version")):
+                self._accept(change)
+                accepted.append(change["id"])
+        if accepted and self._log is not None:
+            self._log.flush()
+            os.fsync(self._log.fileno())
+        if accepted:
+            self._compact_if_stale()
+
+        # Changes after the cursor, except the ones the client has just sent
+        cursor = request.get("cursor", 0)
+        limit = request.get("limit") or BATCH_SIZE
+        own = set(accepted)
+        changes = []
+        position = bisect_right(self.seqs, cursor)
+        while position < len(self.seqs) and len(changes) < limit:
+            seq, entry_id = self.seqs[position], self.ids[position]
+            change = self.changes[entry_id]
+            if change["seq"] == seq and entry_id not in own:
+                changes.append({key: change[key] for key in ("id", "row", "day", "version")})
+            position += 1
+        more = position < len(self.seqs)
+        return {"cursor": self.seqs[position - 1] if more else self.seq, "accepted": accepted,
+                "changes": changes, "more": more}
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def _accept(self, change):
+        self.seq += 1
+        stored = {"id": change["id"], "row": change.get("row"), "day": change.get("day"),
+                  "version": change["version"], "seq": self.seq}
+        self.changes[change["id"]] = stored
+        self.seqs.append(self.seq)
+        self.ids.append(change["id"])
+        if self._log is not None:
+            self._log.write(encode_record(stored))
+
+    def _compact_if_stale(self):
+        # Drops the superseded changes from the sequence and the log. Cursors
+        # stay valid: the latest changes keep their sequence numbers.
+        stale = len(self.seqs) - len(self.changes)
+        if stale <= max(len(self.changes), MIN_STALE_CHANGES):
+            return
+        latest = sorted(self.changes.values(), key=lambda stored: stored["seq"])
+        self.seqs = [stored["seq"] for stored in latest]
+        self.ids = [stored["id"] for stored in latest]
+        if self._log is not None:
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "wb") as file:
+                file.writelines(encode_record(stored) for stored in latest)
+                file.flush()
+                os.fsync(file.fileno())
+            self._log.close()
+            os.replace(temp_path, self.path)
+            self._log = open(self.path, "ab")
+
+    def _replay(self):
+        try:
+            file = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with file:
+            for line in file:
+                stored = decode_record(line)
+                if stored is None:
+                    break
+                self.seq = stored["seq"]
+                self.changes[stored["id"]] = stored
+                self.seqs.append(stored["seq"])
+                self.ids.append(stored["id"])
+
+    async def handle_connection(self, reader, writer):
+        # Minimal HTTP/1.1 with keep-alive: enough for SyncClient and curl
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, {"error": "Request too large"}, False)
+                    break
+                body = await reader.readexactly(length)
+
+                method, path = request_line.decode("latin-1").split()[:2]
+                compress = "deflate" in headers.get("accept-encoding", "")
+                if (method, path) != ("POST", "/sync"):
+                    await self._respond(writer, 404, {"error": "Not found"}, compress)
+                    continue
+                try:
+                    response = self.handle(decode_body(body, headers.get("content-encoding")))
+                except (ValueError, KeyError, TypeError, zlib.error) as e:
+                    await self._respond(writer, 400, {"error": str(e)}, compress)
+                    continue
+                await self._respond(writer, 200, response, compress)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, document, compress):
+        reasons = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large"}
+        body = encode_body(document) if compress else json.dumps(document).encode("utf-8")
+        head = [f"HTTP/1.1 {status} {reasons[status]}", "Content-Type: application/json",
+                f"Content-Length: {len(body)}"]
+        if compress:
+            head.append("Content-Encoding: deflate")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def serve(self, host="127.0.0.1", port=8765, unix_path=None):
+        if unix_path is not None:
+            server = await asyncio.start_unix_server(self.handle_connection, unix_path)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def add_arguments(parser):
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--data", default="sync_server.log", help="file the accepted changes are kept in")
+
+
+def run(args, parser):
+    server = SyncServer(args.data)
+    where = f"unix:{args.unix}" if args.unix else f"http://{args.host}:{args.port}"
+    print(f"Sync server listening on {where}", file=sys.stderr)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="llamatime sync-server", description="Reference sync server.")
+    add_arguments(parser)
+    return run(parser.parse_args(argv), parser)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+import json
+import os
+import time
+
+
+class ProjectTimer:
+    """One named timer.
+
+    ``elapsed`` is the time counted before the current run and ``resumed`` the
+    monotonic time the current run began, or None while paused. ``started_at``
+    and ``resumed_at`` are the matching wall-clock times, which are what gets
+    persisted: monotonic readings mean nothing after a restart.
+    """
+
+    __slots__ = ("name", "elapsed", "resumed", "started_at", "resumed_at")
+
+    def __init__(self, name, started_at):
+        self.name = name
+        self.elapsed = 0.0
+        self.resumed = None
+        self.started_at = started_at
+        self.resumed_at = None
+
+    @property
+    def running(self):
+        return self.resumed is not None
+
+
+class TimerEngine:
+    """Named timers, one per project, measured with ``time.monotonic()``.
+
+    Wall-clock changes (NTP, DST, manual changes) do not affect the elapsed
+    times. The state is written to ``path`` on every start, pause and stop,
+    so a crash or restart keeps the timers; a timer that was running keeps
+    counting through the time the app was closed. ``clock`` and
+    ``wall_clock`` can be replaced for testing.
+    """
+
+    def __init__(self, path="timers.json", clock=time.monotonic, wall_clock=time.time):
+        self.path = path
+        self.clock = clock
+        self.wall_clock = wall_clock
+        # ProjectTimer by name, in the order they were started
+        self.timers = {}
+
+    def get(self, name):
+        return self.timers.get(name)
+
+    def elapsed(self, name):
+        """Returns the seconds counted by ``name``, or 0 if there is no such timer."""
+        timer = self.timers.get(name)
+        if timer is None:
+            return 0.0
+        if timer.resumed is None:
+            return timer.elapsed
+        return timer.elapsed + self.clock() - timer.resumed
+
+    def running(self):
+        return [timer for timer in self.timers.values() if timer.running]
+
+    def start(self, name):
+        """Starts a new timer, or resumes a paused one."""
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = ProjectTimer(name, self.wall_clock())
+        if not timer.running:
+            timer.resumed = self.clock()
+            timer.resumed_at = self.wall_clock()
+            self.save()
+        return timer
+
+    def pause(self, name):
+        timer = self.timers.get(name)
+        if timer is None or not timer.running:
+            return timer
+        timer.elapsed += self.clock() - timer.resumed
+        timer.resumed = None
+        timer.resumed_at = None
+        self.save()
+        return timer
+
+    def stop(self, name):
+        """Removes the timer and returns ``(started_at, elapsed seconds)``, or None."""
+        if name not in self.timers:
+            return None
+        elapsed = self.elapsed(name)
+        timer = self.timers.pop(name)
+        self.save()
+        return timer.started_at, elapsed
+
+    def save(self):
+        state = [{"name": timer.name, "elapsed": timer.elapsed if not timer.running else self.elapsed(timer.name),
+                  "started_at": timer.started_at, "resumed_at": self.wall_clock() if timer.running else None}
+                 for timer in self.timers.values()]
+        # Written to a temporary file and renamed, so a crash leaves either the old or the new state
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as file:
+            json.dump(state, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+
+    def load(self):
+        try:
+            with open(self.path, "r") as file:
+                state = json.load(file)
+        except FileNotFoundError:
+            return
+        except ValueError:
+            # A damaged state file only loses the timers, never the entries
+            state = []
+
+        now, wall_now = self.clock(), self.wall_clock()
+        self.timers = {}
+        for item in state:
+            timer = self.timers[item["name"]] = ProjectTimer(item["name"], item["started_at"])
+            timer.elapsed = item["elapsed"]
+            if item["resumed_at"] is not None:
+                # Count the time the app was closed, but never a negative amount
+                # if the wall clock went backwards in the meantime
+                timer.elapsed += max(0.0, wall_now - item["resumed_at"])
+                timer.resumed = now
+                timer.resumed_at = wall_now
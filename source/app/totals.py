@@ -0,0 +1,119 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from entries import format_day
+
+
+class ProjectTotals:
+    """Per-project and per-day totals kept up to date as deltas.
+
+    Reads behave like the old ``defaultdict(timedelta)`` of project totals, so
+    ``totals[project]``, ``keys()``, ``values()`` and ``items()`` are O(1) per
+    project. ``add``/``remove`` apply one entry at a time; ``rebuild`` is only
+    needed when the whole entry set is replaced.
+    """
+
+    def __init__(self, check=False):
+        # Seconds and entry counts per project
+        self.seconds = defaultdict(int)
+        self.counts = defaultdict(int)
+        # Seconds per (project, day number)
+        self.daily = defaultdict(int)
+        # When set, every change is compared against a full recompute
+        self.check_mode = check
+
+    def add(self, entry):
+        seconds = entry.seconds
+        self.seconds[entry.project] += seconds
+        self.counts[entry.project] += 1
+        self.daily[(entry.project, entry.day)] += seconds
+
+    def remove(self, entry):
+        seconds = entry.seconds
+        project = entry.project
+        self.seconds[project] -= seconds
+        self.counts[project] -= 1
+        if self.counts[project] <= 0:
+            del self.seconds[project]
+            del self.counts[project]
+
+        day = (project, entry.day)
+        self.daily[day] -= seconds
+        if not self.daily[day]:
+            del self.daily[day]
+
+    def replace(self, old_entry, new_entry):
+        self.remove(old_entry)
+        self.add(new_entry)
+
+    def rebuild(self, entries):
+        self.seconds.clear()
+        self.counts.clear()
+        self.daily.clear()
+        for entry in entries:
+            self.add(entry)
+
+    def load_daily(self, rows):
+        """Replaces the totals with ``(project, day, seconds, count)`` aggregate rows."""
+        self.seconds.clear()
+        self.counts.clear()
+        self.daily.clear()
+        self.add_daily(rows)
+
+    def add_daily(self, rows):
+        """Adds ``(project, day, seconds, count)`` aggregate rows, e.g. for entries not loaded."""
+        for project, day, seconds, count in rows:
+            self.seconds[project] += seconds
+            self.counts[project] += count
+            self.daily[(project, day)] += seconds
+
+    def remove_daily(self, rows):
+        """Takes back rows given to ``add_daily``, e.g. before their entries are added one by one."""
+        for project, day, seconds, count in rows:
+            self.seconds[project] -= seconds
+            self.counts[project] -= count
+            if self.counts[project] <= 0:
+                del self.seconds[project]
+                del self.counts[project]
+            self.daily[(project, day)] -= seconds
+            if not self.daily[(project, day)]:
+                del self.daily[(project, day)]
+
+    def check(self, entries):
+        """Compares the incremental totals with a full recompute.
+
+        Returns a list of ``(project, incremental, recomputed)`` mismatches in
+        seconds; an empty list means the totals can be trusted.
+        """
+        expected = ProjectTotals()
+        expected.rebuild(entries)
+        mismatches = []
+        for project in sorted(set(self.seconds) | set(expected.seconds)):
+            if self.seconds.get(project, 0) != expected.seconds.get(project, 0):
+                mismatches.append((project, self.seconds.get(project, 0), expected.seconds.get(project, 0)))
+        if self.daily != expected.daily and not mismatches:
+            for project, day in sorted(set(self.daily) | set(expected.daily)):
+                if self.daily.get((project, day), 0) != expected.daily.get((project, day), 0):
+                    mismatches.append((f"{project} {format_day(day)}", self.daily.get((project, day), 0), expected.daily.get((project, day), 0)))
+        return mismatches
+
+    def day_total(self, project, day):
+        return timedelta(seconds=self.daily.get((project, day), 0))
+
+    def __getitem__(self, project):
+        return timedelta(seconds=self.seconds.get(project, 0))
+
+    def __contains__(self, project):
+        return project in self.seconds
+
+    def __len__(self):
+        return len(self.seconds)
+
+    def keys(self):
+        return self.seconds.keys()
+
+    def values(self):
+        return [timedelta(seconds=seconds) for seconds in self.seconds.values()]
+
+    def items(self):
+        return [(project, timedelta(seconds=seconds)) for project, seconds in self.seconds.items()]
@@ -0,0 +1,117 @@
+import os
+from collections import deque
+
+from storage import decode_record, encode_record
+
+
+class UndoLog:
+    """Undo and redo stacks of small reversible deltas.
+
+    A command is ``{"label": ..., "changes": [[entry_id, before, after], ...]}``
+    where ``before`` and ``after`` are the entry's CSV rows, or None where
+    the entry did not exist, so undoing or redoing it touches only the
+    entries it changed. At most ``limit`` commands are kept; the oldest one
+    is dropped when another is recorded.
+
+    With a ``path`` the stacks survive restarts: every operation is appended
+    to it as a "<crc32> <json>" record like the entry journal's, and the
+    file is rewritten as one snapshot record once it holds
+    ``compact_threshold`` records.
+    """
+
+    def __init__(self, limit=100, path=None, compact_threshold=1000):
+        self.limit = limit
+        self.path = path
+        self.compact_threshold = compact_threshold
+        self.undo_stack = deque(maxlen=limit)
+        self.redo_stack = []
+        self.records = 0
+
+    def load(self):
+        if self.path is None:
+            return self
+        self.records = 0
+        try:
+            with open(self.path, "rb") as file:
+                for line in file:
+                    record = decode_record(line)
+                    if record is None:
+                        break
+                    self._replay(record)
+                    self.records += 1
+        except FileNotFoundError:
+            pass
+        return self
+
+    def record(self, label, changes):
+        """Records a command from ``(before, after)`` TimeEntry pairs, None for a missing entry."""
+        command = {"label": label,
+                   "changes": [[(after or before).id, before.to_row() if before is not None else None,
+                                after.to_row() if after is not None else None] for before, after in changes]}
+        self._log({"op": "record", "command": command})
+
+    def undo(self):
+        """Takes back the last command, or returns None if there is none.
+
+        Returns ``(label, [(entry_id, current, target), ...])``: the rows to
+        write in order, each with the row it replaces, None for no entry.
+        """
+        if not self.undo_stack:
+            return None
+        command = self.undo_stack[-1]
+        self._log({"op": "undo"})
+        return command["label"], [(entry_id, after, before) for entry_id, before, after in reversed(command["changes"])]
+
+    def redo(self):
+        """Applies the last undone command again; returns the same as ``undo()``."""
+        if not self.redo_stack:
+            return None
+        command = self.redo_stack[-1]
+        self._log({"op": "redo"})
+        return command["label"], [(entry_id, before, after) for entry_id, before, after in command["changes"]]
+
+    def clear(self):
+        if self.undo_stack or self.redo_stack:
+            self._log({"op": "clear"})
+
+    def undo_label(self):
+        return self.undo_stack[-1]["label"] if self.undo_stack else None
+
+    def redo_label(self):
+        return self.redo_stack[-1]["label"] if self.redo_stack else None
+
+    def _replay(self, record):
+        op = record["op"]
+        if op == "record":
+            self.undo_stack.append(record["command"])
+            self.redo_stack = []
+        elif op == "undo" and self.undo_stack:
+            self.redo_stack.append(self.undo_stack.pop())
+        elif op == "redo" and self.redo_stack:
+            self.undo_stack.append(self.redo_stack.pop())
+        elif op == "clear":
+            self.undo_stack.clear()
+            self.redo_stack = []
+        elif op == "snapshot":
+            self.undo_stack = deque(record["undo"], maxlen=self.limit)
+            self.redo_stack = record["redo"][-self.limit:]
+
+    def _log(self, record):
+        self._replay(record)
+        if self.path is None:
+            return
+        if self.records + 1 >= self.compact_threshold:
+            self._save_snapshot()
+            return
+        with open(self.path, "ab") as file:
+            file.write(encode_record(record))
+        self.records += 1
+
+    def _save_snapshot(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "wb") as file:
+            file.write(encode_record({"op": "snapshot", "undo": list(self.undo_stack), "redo": self.redo_stack}))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+        self.records = 1
@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The app's modules import each other by name, as when run from source/app;
+# the app itself runs on the tkinter stubs the benchmarks use
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+sys.path.insert(0, os.path.join(ROOT, "source", "app"))
+
+import tkstub  # noqa: E402
+
+messages = tkstub.install()
+
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    """Returns a function that starts the app in an empty directory and waits until it has loaded."""
+    import llamatime
+
+    monkeypatch.chdir(tmp_path)
+    apps = []
+
+    def make(storage=""):
+        monkeypatch.setenv("LLAMATIME_STORAGE", storage)
+        root = tkstub.Tk()
+        app = llamatime.TimeEntryApp(root)
+        root.run_until(lambda: not app.loading, timeout=30)
+        apps.append(app)
+        return app
+
+    yield make
+    for app in apps:
+        app.store.close()
@@ -0,0 +1,73 @@
+import pytest
+
+from entries import SECONDS_PER_DAY, TimeEntry, format_clock, format_day, parse_clock, parse_day
+
+
+@pytest.mark.parametrize("text, day", [
+    ("1970-01-01", 0),
+    ("1970-01-02", 1),
+    ("1969-12-31", -1),
+    ("2024-02-29", 19782),
+])
+def test_parse_day_accepts(text, day):
+    assert parse_day(text) == day
+    assert format_day(day) == text
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "2024-1-05",
+    "2024-01-5 ",
+    "2024/01/05",
+    "2024-+1-05",
+    "2024--1-05",
+    "2024- 1-05",
+    "+024-01-05",
+    "2024-01-0٥",
+    "2024-00-05",
+    "2024-13-05",
+    "2024-01-00",
+    "2023-02-29",
+    "0000-01-01",
+])
+def test_parse_day_rejects(text):
+    with pytest.raises(ValueError):
+        parse_day(text)
+
+
+@pytest.mark.parametrize("text, seconds", [
+    ("00:00:00", 0),
+    ("00:00:59", 59),
+    ("01:02:03", 3723),
+    ("23:59:59", SECONDS_PER_DAY - 1),
+])
+def test_parse_clock_accepts(text, seconds):
+    assert parse_clock(text) == seconds
+    assert format_clock(seconds) == text
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "1:00:00",
+    "01:00:00 ",
+    "01-00-00",
+    "-1:00:00",
+    "+1:00:00",
+    " 1:00:00",
+    "01:-1:00",
+    "01:00:+0",
+    "1_:00:00",
+    "24:00:00",
+    "12:60:00",
+    "12:00:60",
+])
+def test_parse_clock_rejects(text):
+    with pytest.raises(ValueError):
+        parse_clock(text)
+
+
+def test_parse_entry_rejects_signed_fields():
+    with pytest.raises(ValueError):
+        TimeEntry.parse("Project", "2024-01-05", "-1:00:00", "10:00:00")
+    entry = TimeEntry.parse("Project", "2024-01-05", "09:00:00", "10:00:00")
+    assert entry.end - entry.start == 3600
@@ -0,0 +1,66 @@
+import queue
+
+import pytest
+
+import llamatime
+
+
+class RecordedExport:
+    """Stands in for PdfExport; keeps what would have been exported."""
+
+    runs = []
+
+    def __init__(self, path, entries, breakdown, title, chart=None):
+        self.path = path
+        self.paths = [path]
+        self.entries = entries
+        self.title = title
+        self.messages = queue.Queue()
+        RecordedExport.runs.append(self)
+
+    def start(self):
+        self.messages.put(("cancelled", None))
+
+    def cancel(self):
+        pass
+
+
+@pytest.fixture
+def app(make_app, monkeypatch):
+    monkeypatch.setattr(llamatime, "PdfExport", RecordedExport)
+    RecordedExport.runs = []
+    with open("time_entries.csv", "w") as file:
+        for day in range(1, 29):
+            file.write(f"A,2023-02-{day:02},09:00:00,10:00:00,,a{day}\n")
+            file.write(f"B,2024-03-{day:02},09:00:00,10:00:00,,b{day}\n")
+    return make_app()
+
+
+def export(app):
+    app.export_to_pdf()
+    app.root.run_until(lambda: app.export is None, timeout=30)
+    return RecordedExport.runs[-1]
+
+
+def test_exports_all_dates_by_default(app):
+    # The date fields hold today's date, as the calendar pickers always do
+    assert app.start_date_entry.get() and app.end_date_entry.get()
+    run = export(app)
+    assert len(run.entries) == 56
+    assert run.title == "Project Time Entries 2023-02-01 - 2024-03-28"
+
+
+def test_exports_project_over_all_dates(app):
+    app.filter_combobox.set("B")
+    run = export(app)
+    assert {entry.project for entry in run.entries} == {"B"}
+    assert len(run.entries) == 28
+
+
+def test_exports_date_range_once_all_dates_is_cleared(app):
+    app.export_all_dates.set(False)
+    for field, text in ((app.start_date_entry, "2024-03-05"), (app.end_date_entry, "2024-03-14")):
+        field.delete(0, "end")
+        field.insert(0, text)
+    run = export(app)
+    assert sorted(entry.id for entry in run.entries) == sorted(f"b{day}" for day in range(5, 15))
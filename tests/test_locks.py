@@ -0,0 +1,72 @@
+import threading
+
+import pytest
+
+from locks import FileLock
+
+
+@pytest.fixture
+def lock(tmp_path):
+    lock = FileLock(str(tmp_path / "test.lock"))
+    yield lock
+    lock.close()
+
+
+def test_reentrant_for_the_owner(lock):
+    assert lock.acquire()
+    assert lock.acquire(blocking=False)
+    lock.release()
+    lock.release()
+    assert lock._owner is None
+
+
+def test_other_threads_wait(lock):
+    results = []
+    lock.acquire(shared=True)
+    thread = threading.Thread(target=lambda: results.append(lock.acquire(blocking=False, shared=True)))
+    thread.start()
+    thread.join()
+    assert results == [False]
+
+    acquired = threading.Event()
+
+    def take():
+        with lock:
+            acquired.set()
+
+    thread = threading.Thread(target=take)
+    thread.start()
+    assert not acquired.wait(0.05)
+    lock.release()
+    thread.join()
+    assert acquired.is_set()
+
+
+def test_release_from_another_thread_fails(lock):
+    lock.acquire()
+    errors = []
+
+    def release():
+        try:
+            lock.release()
+        except RuntimeError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=release)
+    thread.start()
+    thread.join()
+    assert len(errors) == 1
+    lock.release()
+
+
+def test_hand_over(lock):
+    lock.acquire()
+    thread = threading.Thread(target=lock.release)
+    lock.hand_over(thread)
+    # No longer re-entrant for the thread that handed it over
+    assert not lock.acquire(blocking=False)
+    thread.start()
+    thread.join()
+    assert lock.acquire(blocking=False)
+    lock.release()
+
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+import partitions
+from entries import TimeEntry
+from partitions import PartitionedStore
+
+
+def entry(project, date, entry_id):
+    return TimeEntry.parse(project, date, "09:00:00", "10:00:00", "", entry_id)
+
+
+def all_entries(path):
+    store = PartitionedStore(path, csv_path=path + ".csv")
+    store.load()
+    store.load_partitions(store.unloaded_months())
+    return {entry_id: entry.project for entry_id, entry in store.entries.items()}
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = str(tmp_path / "time_entries")
+    store = PartitionedStore(path, csv_path=path + ".csv")
+    store.load()
+    store.put_many([entry("Old", f"2024-0{month}-10", f"old{month}") for month in range(1, 5)])
+    return store
+
+
+def test_replace_all_removes_the_months_left_empty(store):
+    restored = store.replace_all([entry("New", "2024-02-11", "new2"), entry("New", "2024-05-11", "new5")])
+    assert sorted(entry.id for entry in restored) == ["new2", "new5"]
+    assert sorted(os.listdir(store.path)) == ["2024-02.csv", "2024-05.csv", "manifest.json"]
+    assert all_entries(store.path) == {"new2": "New", "new5": "New"}
+
+
+def test_replace_all_failing_part_way_keeps_the_history(store, monkeypatch):
+    write_csv = partitions.write_csv
+    writes = []
+
+    def failing_write(path, entries):
+        writes.append(path)
+        if len(writes) == 2:
+            raise OSError("No space left on device")
+        return write_csv(path, entries)
+
+    monkeypatch.setattr(partitions, "write_csv", failing_write)
+    with pytest.raises(OSError):
+        store.replace_all([entry("New", f"2024-0{month}-11", f"new{month}") for month in range(3, 6)])
+
+    # The month written before the failure has the restored entries, the
+    # others still have theirs
+    assert all_entries(store.path) == {"old1": "Old", "old2": "Old", "new3": "New", "old4": "Old"}
@@ -0,0 +1,160 @@
+import pytest
+
+from scheduler import Pomodoro, Scheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeLoop:
+    """Stands in for ``root.after`` and ``root.after_cancel``."""
+
+    def __init__(self):
+        self.pending = {}
+        self.ids = 0
+
+    def call_later(self, delay_ms, callback):
+        self.ids += 1
+        self.pending[self.ids] = (delay_ms, callback)
+        return self.ids
+
+    def cancel_call(self, call_id):
+        del self.pending[call_id]
+
+    def fire(self):
+        """Runs the pending callbacks, as the Tk main loop would once they are due."""
+        pending, self.pending = self.pending, {}
+        for _, callback in pending.values():
+            callback()
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_runs_due_events_in_order(clock):
+    scheduler = Scheduler(clock=clock)
+    ran = []
+    scheduler.schedule(20, lambda: ran.append("second"))
+    scheduler.schedule(10, lambda: ran.append("first"))
+    scheduler.schedule(10, lambda: ran.append("first, scheduled later"))
+    scheduler.schedule(30, lambda: ran.append("not yet"))
+
+    clock.now += 5
+    scheduler.run_due()
+    assert ran == []
+
+    clock.now += 15
+    scheduler.run_due()
+    assert ran == ["first", "first, scheduled later", "second"]
+    assert [event.due for event in scheduler.pending()] == [1030.0]
+
+
+def test_repeating_event_keeps_cadence_without_catching_up(clock):
+    scheduler = Scheduler(clock=clock)
+    ran = []
+    scheduler.schedule(10, lambda: ran.append(clock.now), interval=10)
+
+    clock.now += 10
+    scheduler.run_due()
+    clock.now += 12
+    scheduler.run_due()
+    assert ran == [1010.0, 1022.0]
+    assert scheduler.next_due() == 1030.0
+
+    # Blocked for several intervals: fires once, then every interval from now
+    clock.now += 100
+    scheduler.run_due()
+    assert ran[-1] == 1122.0
+    assert scheduler.next_due() == 1132.0
+
+
+def test_cancelled_events_do_not_run(clock):
+    scheduler = Scheduler(clock=clock)
+    ran = []
+    event = scheduler.schedule(10, lambda: ran.append("cancelled"))
+    scheduler.schedule(10, lambda: ran.append("reminder"), name="reminder")
+    scheduler.schedule(10, lambda: ran.append("kept"))
+    scheduler.cancel(event)
+    scheduler.cancel_named("reminder")
+
+    clock.now += 10
+    scheduler.run_due()
+    assert ran == ["kept"]
+    assert scheduler.next_due() is None
+
+
+def test_failing_callback_does_not_stop_other_events(clock, capsys):
+    loop = FakeLoop()
+    scheduler = Scheduler(loop.call_later, loop.cancel_call, clock=clock)
+    ran = []
+
+    def fail():
+        raise RuntimeError("reminder failed")
+
+    scheduler.schedule(10, fail)
+    scheduler.schedule(10, lambda: ran.append("backup"), interval=60)
+    scheduler.schedule(30, lambda: ran.append("poll"))
+
+    clock.now += 10
+    loop.fire()
+    assert ran == ["backup"]
+    assert "reminder failed" in capsys.readouterr().err
+    # The wake-up for the next event is still armed
+    assert [delay for delay, _ in loop.pending.values()] == [20001]
+
+    clock.now += 20
+    loop.fire()
+    assert ran == ["backup", "poll"]
+    assert [delay for delay, _ in loop.pending.values()] == [40001]
+
+
+def test_repeating_event_that_fails_keeps_repeating(clock, capsys):
+    scheduler = Scheduler(clock=clock)
+    calls = []
+
+    def sync():
+        calls.append(clock.now)
+        raise OSError("server unreachable")
+
+    scheduler.schedule(5, sync, interval=5)
+    for _ in range(3):
+        clock.now += 5
+        scheduler.run_due()
+    assert calls == [1005.0, 1010.0, 1015.0]
+    assert capsys.readouterr().err.count("OSError: server unreachable") == 3
+
+
+def test_only_the_earliest_event_is_armed(clock):
+    loop = FakeLoop()
+    scheduler = Scheduler(loop.call_later, loop.cancel_call, clock=clock)
+    scheduler.schedule(60, lambda: None)
+    scheduler.schedule(30, lambda: None)
+    scheduler.schedule(90, lambda: None)
+    assert [delay for delay, _ in loop.pending.values()] == [30001]
+
+
+def test_pomodoro_cycles_and_long_break(clock):
+    scheduler = Scheduler(clock=clock)
+    phases = []
+    pomodoro = Pomodoro(scheduler, lambda ended, started: phases.append((ended, started)),
+                        work=25, short_break=5, long_break=15, cycles=2)
+    pomodoro.start()
+    for duration in (25, 5, 25):
+        clock.now += duration
+        scheduler.run_due()
+    assert phases == [("work", "short break"), ("short break", "work"), ("work", "long break")]
+    assert pomodoro.remaining() == 15
+
+    pomodoro.snooze(3)
+    assert pomodoro.phase == "work"
+    clock.now += 3
+    scheduler.run_due()
+    assert phases[-1] == ("work", "long break")
+    assert pomodoro.completed == 2
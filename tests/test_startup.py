@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+
+from conftest import ROOT
+
+# Seconds from process start to the first frame allowed on a test machine
+STARTUP_BUDGET = 2.0
+
+# Starts the app as ``llamatime.py --startup-budget SECONDS`` would, on the
+# tkinter stubs so that no display is needed
+SCRIPT = f"""
+import sys
+sys.path[:0] = [{os.path.join(ROOT, "benchmarks")!r}, {os.path.join(ROOT, "source", "app")!r}]
+import tkstub
+tkstub.install()
+import llamatime
+sys.exit(llamatime.main(sys.argv[1:]))
+"""
+
+
+def start(budget, directory):
+    return subprocess.run([sys.executable, "-c", SCRIPT, "--startup-budget", str(budget)],
+                          cwd=directory, capture_output=True, text=True, timeout=60)
+
+
+def test_cold_start_within_budget(tmp_path):
+    result = start(STARTUP_BUDGET, tmp_path)
+    assert "first frame" in result.stderr
+    assert result.returncode == 0, result.stderr
+
+
+def test_cold_start_over_budget_fails(tmp_path):
+    result = start(0.000001, tmp_path)
+    assert result.returncode == 1
+    assert "over the 0.000s budget" in result.stderr
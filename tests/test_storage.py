@@ -0,0 +1,78 @@
+import threading
+import time
+
+import entry_file
+from entries import TimeEntry
+from entry_file import BinaryJournal, EntryFile
+from storage import EntryJournal
+
+
+def test_concurrent_upgrade_keeps_one_set_of_ids(tmp_path):
+    path = str(tmp_path / "time_entries.csv")
+    with open(path, "w") as file:
+        # Rows from an older file, without IDs
+        for day in range(1, 29):
+            file.write(f"Project,2024-02-{day:02},09:00:00,10:00:00\n")
+
+    first = EntryJournal(path)
+    second = EntryJournal(path)
+    seen = {}
+    chunks = first.load_chunks(chunk_size=10)
+    removed, added, _ = next(chunks)
+    seen.update((entry.id, entry) for entry in added)
+    # The second store upgrades the file while the first one is still reading it
+    loader = threading.Thread(target=second.load)
+    loader.start()
+    for removed, added, _ in chunks:
+        for entry in removed:
+            del seen[entry.id]
+        seen.update((entry.id, entry) for entry in added)
+    loader.join()
+
+    assert set(seen) == set(first.entries) == set(second.entries)
+    assert "" not in seen and len(seen) == 28
+    first.close()
+    second.close()
+    with open(path) as file:
+        assert {TimeEntry.from_row(line.rstrip("\n").split(",")).id for line in file} == set(seen)
+
+
+def test_concurrent_first_use_converts_once(tmp_path, monkeypatch):
+    csv_path = str(tmp_path / "time_entries.csv")
+    bin_path = str(tmp_path / "time_entries.bin")
+    with open(csv_path, "w") as file:
+        for day in range(1, 29):
+            file.write(f"Project,2024-02-{day:02},09:00:00,10:00:00,,id{day}\n")
+
+    # Both stores find no binary file; the second one waits for the lock
+    # while the first converts, and then finds it written
+    conversions = []
+    write_entry_file = entry_file.write_entry_file
+    converting = threading.Event()
+    proceed = threading.Event()
+
+    def slow_write(path, entries):
+        conversions.append(path)
+        converting.set()
+        proceed.wait(5)
+        return write_entry_file(path, entries)
+
+    monkeypatch.setattr(entry_file, "write_entry_file", slow_write)
+    first = BinaryJournal(bin_path, csv_path=csv_path)
+    second = BinaryJournal(bin_path, csv_path=csv_path)
+    loader = threading.Thread(target=first.load)
+    loader.start()
+    assert converting.wait(5)
+    other = threading.Thread(target=second.load)
+    other.start()
+    time.sleep(0.1)
+    proceed.set()
+    loader.join()
+    other.join()
+
+    assert conversions == [bin_path]
+    assert set(first.entries) == set(second.entries) == {f"id{day}" for day in range(1, 29)}
+    first.close()
+    second.close()
+    with EntryFile(bin_path) as snapshot:
+        assert len(list(snapshot)) == 28
@@ -0,0 +1,14 @@
+import pytest
+
+import stress
+
+
+@pytest.mark.parametrize("storage", ["csv", "binary"])
+def test_writer_processes_lose_no_updates(storage, capsys):
+    # A small run of benchmarks/stress.py: writer processes saving, editing
+    # and deleting in the same files, compacting under each other all the time
+    status = stress.main(["--processes", "3", "--operations", "300", "--size", "1000",
+                          "--compact-threshold", "20", "--storage", storage])
+    output = capsys.readouterr().out
+    assert status == 0, output
+    assert "OK: no lost updates" in output
@@ -0,0 +1,49 @@
+import sync_server
+from sync import PROTOCOL_VERSION
+from sync_server import SyncServer
+
+
+def change(entry_id, clock, device="a"):
+    return {"id": entry_id, "row": ["Project", "2024-01-05", "09:00:00", "10:00:00", str(clock), entry_id],
+            "day": 19727, "version": [clock, device]}
+
+
+def sync(server, changes=(), cursor=0):
+    return server.handle({"protocol": PROTOCOL_VERSION, "changes": list(changes), "cursor": cursor, "limit": 10000})
+
+
+def test_superseded_changes_are_compacted(tmp_path, monkeypatch):
+    monkeypatch.setattr(sync_server, "MIN_STALE_CHANGES", 10)
+    path = str(tmp_path / "sync_server.log")
+    server = SyncServer(path)
+    for clock in range(1, 21):
+        sync(server, [change(f"e{i}", clock) for i in range(5)])
+    assert server.seq == 100
+    assert len(server.seqs) <= 2 * 5 + 10
+
+    # A client that saw part of the history gets the latest of every entry
+    response = sync(server, cursor=50)
+    assert sorted(c["id"] for c in response["changes"]) == [f"e{i}" for i in range(5)]
+    assert {c["version"][0] for c in response["changes"]} == {20}
+    assert response["cursor"] == 100
+    assert sync(server, cursor=100)["changes"] == []
+    server.close()
+
+    with open(path, "rb") as file:
+        assert len(file.readlines()) == len(server.seqs)
+    restarted = SyncServer(path)
+    assert restarted.seq == 100
+    assert restarted.changes == server.changes
+    assert restarted.seqs == server.seqs
+    sync(restarted, [change("e0", 21)])
+    assert [c["id"] for c in sync(restarted, cursor=100)["changes"]] == ["e0"]
+    assert sync(restarted, cursor=101)["changes"] == []
+    restarted.close()
+
+
+def test_small_logs_are_left_alone(tmp_path):
+    server = SyncServer(str(tmp_path / "sync_server.log"))
+    for clock in range(1, 4):
+        sync(server, [change("e0", clock)])
+    assert server.seqs == [1, 2, 3]
+    server.close()
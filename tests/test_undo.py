@@ -0,0 +1,38 @@
+import glob
+
+from entries import TimeEntry
+
+
+def copies(entry_id):
+    # Rows of the entry across every month file of the partitioned store
+    count = 0
+    for path in glob.glob("time_entries/*.csv"):
+        with open(path) as file:
+            count += sum(1 for line in file if line.rstrip("\n").endswith("," + entry_id))
+    return count
+
+
+def test_undo_across_months_not_loaded(make_app, monkeypatch):
+    monkeypatch.setenv("LLAMATIME_UNDO_HISTORY", "1")
+    with open("time_entries.csv", "w") as file:
+        file.write("Old,2023-01-10,09:00:00,10:00:00,,old\n")
+        for month in range(1, 4):
+            file.write(f"Recent,2024-0{month}-10,09:00:00,10:00:00,,recent{month}\n")
+        file.write("Moved,2024-03-12,09:00:00,10:00:00,,moved\n")
+
+    app = make_app("partitioned")
+    moved = app.entries["moved"]
+    app.commit_entry(TimeEntry.parse("Moved", "2023-01-12", "09:00:00", "10:00:00"), "moved")
+    assert copies("moved") == 1
+    app.store.close()
+
+    # After a restart only the recent months are loaded, not the one the
+    # entry was moved to
+    app = make_app("partitioned")
+    assert "2023-01" not in app.store.loaded_months()
+    app.undo()
+    assert app.entries["moved"].date == moved.date
+    assert copies("moved") == 1
+    app.redo()
+    assert app.entries["moved"].date == "2023-01-12"
+    assert copies("moved") == 1